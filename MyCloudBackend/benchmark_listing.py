@@ -0,0 +1,137 @@
+"""
+Замеры производительности списков файлов. В pytest не входят: время
+зависит от машины, а проверки корректности есть в tests/.
+
+    python benchmark_listing.py serialization --rows 2000
+    python benchmark_listing.py renderers --rows 10000
+    python benchmark_listing.py streaming --rows 10000
+
+Данные создаются у временного пользователя в транзакции, которая в конце
+откатывается, — БД из DJANGO_SETTINGS_MODULE (по умолчанию mycloud.settings)
+не меняется. Чтобы сравнить с прежней реализацией, запустите тот же скрипт
+на коммите до изменения и сравните вывод.
+"""
+import argparse
+import os
+import time
+import tracemalloc
+
+import django
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mycloud.settings')
+django.setup()
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from storage.models import File
+from storage.renderers import MessagePackRenderer, ORJSONRenderer
+from storage.serializers import FileSerializer
+from storage.views import AdminUserListView
+
+User = get_user_model()
+
+NAMES = ['photo.JPG', 'report.pdf', 'archive.tar.gz', 'script.py', 'noext', 'movie.mkv', 'big.png']
+SIZES = [5, 2048, 5 * 1024 * 1024, 11 * 1024 * 1024, 3 * 1024 ** 3]
+
+
+def make_files(user, count):
+    File.objects.bulk_create(
+        File(
+            user=user,
+            original_name=NAMES[i % len(NAMES)],
+            stored_name=f'bench_{user.pk}_{i}',
+            public_link=f'bench{user.pk}x{i}',
+            size=SIZES[i % len(SIZES)],
+            comment=f'comment {i}' if i % 2 else '',
+        )
+        for i in range(count)
+    )
+
+
+def measure(func):
+    """(секунды, число запросов к БД)"""
+    with CaptureQueriesContext(connection) as ctx:
+        started = time.perf_counter()
+        func()
+        elapsed = time.perf_counter() - started
+    return elapsed, len(ctx.captured_queries)
+
+
+def serialization(user, args):
+    """Строк в секунду: FileSerializer по одной записи и списком (many=True)"""
+    make_files(user, args.rows)
+    context = {'request': APIRequestFactory().get('/api/files/')}
+    files = File.objects.filter(user=user).order_by('id')
+
+    per_row, per_row_queries = measure(lambda: [FileSerializer(f, context=context).data for f in files.all()])
+    as_list, as_list_queries = measure(lambda: FileSerializer(files.all(), many=True, context=context).data)
+    print(f"FileSerializer, {args.rows} строк:")
+    print(f"  по записи: {args.rows / per_row:>10,.0f} строк/с, запросов {per_row_queries}")
+    print(f"  списком:   {args.rows / as_list:>10,.0f} строк/с, запросов {as_list_queries}")
+
+
+def renderers(user, args):
+    """Время кодирования и размер ответа списка файлов в JSON, orjson и MessagePack"""
+    make_files(user, args.rows)
+    context = {'request': APIRequestFactory().get('/api/files/')}
+    rows = FileSerializer(File.objects.filter(user=user).order_by('id'), many=True, context=context).data
+    encoders = [('json', JSONRenderer()), ('orjson', ORJSONRenderer()), ('msgpack', MessagePackRenderer())]
+
+    for count in sorted({min(50, args.rows), min(1000, args.rows), args.rows}):
+        data = {'count': count, 'next': None, 'previous': None, 'files': rows[:count]}
+        repeat = max(1, 20000 // count)
+        for name, renderer in encoders:
+            started = time.perf_counter()
+            for _ in range(repeat):
+                body = renderer.render(data)
+            elapsed = (time.perf_counter() - started) / repeat
+            print(f"{count:>6} строк  {name:<8} {elapsed * 1000:8.3f} мс  {len(body):>10,} B")
+
+
+def streaming(user, args):
+    """Пик памяти при потоковой выдаче списка пользователей против размера ответа"""
+    User.objects.bulk_create(
+        User(username=f'bench_{user.pk}_{i}', email=f'bench{i}@example.com', first_name='Имя')
+        for i in range(args.rows)
+    )
+    user.is_staff = True
+    user.save(update_fields=['is_staff'])
+    request = APIRequestFactory().get('/api/admin/users/')
+    force_authenticate(request, user=user)
+    response = AdminUserListView.as_view()(request)
+
+    tracemalloc.start()
+    size = sum(len(part) for part in response.streaming_content)
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"Пользователей {args.rows}, пачка {settings.LISTING_STREAM_CHUNK_SIZE}: "
+          f"ответ {size:,} B, пик памяти {peak:,} B")
+
+
+BENCHMARKS = {
+    'serialization': serialization,
+    'renderers': renderers,
+    'streaming': streaming,
+}
+
+
+def main(args):
+    with transaction.atomic():
+        user = User.objects.create_user(f'benchmark_{os.getpid()}', first_name='Имя', last_name='Фамилия')
+        try:
+            BENCHMARKS[args.benchmark](user, args)
+        finally:
+            # Данные замера не сохраняются
+            transaction.set_rollback(True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Замеры производительности списков файлов")
+    parser.add_argument('benchmark', choices=sorted(BENCHMARKS))
+    parser.add_argument('--rows', type=int, default=2000, help="Сколько записей создать")
+    main(parser.parse_args())
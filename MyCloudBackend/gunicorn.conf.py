@@ -0,0 +1,7 @@
+# Настройки gunicorn, общие для всех способов запуска (параметры командной строки их дополняют)
+
+
+def worker_exit(server, worker):
+    """Перед остановкой воркера записываем накопленные счётчики скачиваний"""
+    from storage import download_counters
+    download_counters.shutdown()
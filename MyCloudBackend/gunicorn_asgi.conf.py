@@ -0,0 +1,19 @@
+# Процесс передачи файлов: gunicorn -c gunicorn_asgi.conf.py
+# Воркеры uvicorn на event loop — медленный клиент не занимает процесс целиком,
+# как синхронный воркер gunicorn.conf.py. nginx направляет сюда скачивание и загрузку.
+import os
+
+wsgi_app = 'mycloud.asgi:application'
+worker_class = 'uvicorn.workers.UvicornWorker'
+bind = os.getenv('GUNICORN_BIND', '0.0.0.0:8001')
+workers = int(os.getenv('GUNICORN_WORKERS', 2))
+# Для воркеров uvicorn это лишь контроль «зависания» процесса, а не длительность передачи
+timeout = 60
+graceful_timeout = 30
+keepalive = 75
+
+
+def worker_exit(server, worker):
+    """Перед остановкой воркера записываем накопленные счётчики скачиваний"""
+    from storage import download_counters
+    download_counters.shutdown()
@@ -0,0 +1,112 @@
+"""
+Нагрузочный тест отдачи файлов медленными клиентами (только стандартная библиотека).
+
+Сравнение синхронных воркеров и воркеров на event loop на одном процессе:
+
+    gunicorn -c gunicorn.conf.py mycloud.wsgi:application --workers 1 --bind 127.0.0.1:8000
+    gunicorn -c gunicorn_asgi.conf.py --workers 1 --bind 127.0.0.1:8001
+
+    python loadtest_transfer.py http://127.0.0.1:8000/api/files/1/download/ --token <access> -c 200
+    python loadtest_transfer.py http://127.0.0.1:8001/api/files/1/download/ --token <access> -c 200
+
+Каждый клиент читает ответ блоками --read-size с паузой --delay и маленьким
+буфером сокета, поэтому сервер не может «сбросить» файл в ядро и освободиться.
+Пиковое число одновременных передач показывает, сколько медленных клиентов
+процесс обслуживает параллельно.
+"""
+import argparse
+import asyncio
+import socket
+import statistics
+import time
+from urllib.parse import urlsplit
+
+
+class Stats:
+    def __init__(self):
+        self.active = 0
+        self.peak = 0
+        self.first_byte = []
+        self.durations = []
+        self.statuses = {}
+        self.errors = 0
+
+    def started(self):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+
+    def finished(self):
+        self.active -= 1
+
+
+async def download(url, args, stats, started_at):
+    parts = urlsplit(url)
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, args.rcvbuf)
+    sock.setblocking(False)
+    loop = asyncio.get_running_loop()
+    writer = None
+    try:
+        await loop.sock_connect(sock, (parts.hostname, parts.port or 80))
+        reader, writer = await asyncio.open_connection(sock=sock)
+        headers = [f'GET {parts.path or "/"}{"?" + parts.query if parts.query else ""} HTTP/1.1',
+                   f'Host: {parts.netloc}', 'Connection: close']
+        if args.token:
+            headers.append(f'Authorization: Bearer {args.token}')
+        writer.write(('\r\n'.join(headers) + '\r\n\r\n').encode())
+        await writer.drain()
+
+        status_line = await reader.readline()
+        stats.first_byte.append(time.perf_counter() - started_at)
+        status = int(status_line.split()[1]) if status_line else 0
+        stats.statuses[status] = stats.statuses.get(status, 0) + 1
+        stats.started()
+        try:
+            while True:
+                chunk = await reader.read(args.read_size)
+                if not chunk:
+                    break
+                await asyncio.sleep(args.delay)
+        finally:
+            stats.finished()
+        stats.durations.append(time.perf_counter() - started_at)
+    except OSError:
+        stats.errors += 1
+    finally:
+        if writer is not None:
+            writer.close()
+        else:
+            sock.close()
+
+
+def percentile(values, fraction):
+    if not values:
+        return 0
+    ordered = sorted(values)
+    return ordered[min(int(len(ordered) * fraction), len(ordered) - 1)]
+
+
+async def main(args):
+    stats = Stats()
+    started_at = time.perf_counter()
+    await asyncio.gather(*(download(args.url, args, stats, started_at) for _ in range(args.concurrency)))
+    total = time.perf_counter() - started_at
+
+    print(f"Клиентов: {args.concurrency}, статусы: {stats.statuses}, ошибок соединения: {stats.errors}")
+    print(f"Общее время: {total:.2f} с")
+    print(f"Пик одновременных передач: {stats.peak}")
+    print(
+        f"Время до первого байта: медиана {statistics.median(stats.first_byte or [0]):.2f} с, "
+        f"p95 {percentile(stats.first_byte, 0.95):.2f} с, максимум {max(stats.first_byte or [0]):.2f} с"
+    )
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Нагрузочный тест скачивания медленными клиентами")
+    parser.add_argument('url')
+    parser.add_argument('--token', help="Access-токен (для /api/files/<id>/download/)")
+    parser.add_argument('-c', '--concurrency', type=int, default=200)
+    parser.add_argument('--read-size', type=int, default=16 * 1024, help="Байт за одно чтение")
+    parser.add_argument('--delay', type=float, default=0.01, help="Пауза между чтениями, секунд")
+    parser.add_argument('--rcvbuf', type=int, default=16 * 1024, help="Буфер приёма сокета клиента")
+    asyncio.run(main(parser.parse_args()))
@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mycloud.settings')
+# Асинхронная передача файлов: маршруты mycloud/asgi_urls.py
+os.environ.setdefault('MYCLOUD_ASGI', '1')
 
 application = get_asgi_application()
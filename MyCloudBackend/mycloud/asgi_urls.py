@@ -0,0 +1,20 @@
+"""
+Маршруты процесса ASGI (mycloud/asgi.py). Скачивание и загрузка файлов —
+асинхронными представлениями (storage/aio.py), остальное — как в mycloud.urls.
+nginx направляет сюда только эти пути, но процесс обслуживает и весь API.
+"""
+from django.urls import include, path
+
+from storage.aio import transfer_view
+from storage.views import DownloadFileView, FileUploadView, PublicDownloadView, UploadPartView
+
+urlpatterns = [
+    path('api/files/upload/', transfer_view(FileUploadView.as_view())),
+    path('api/files/uploads/<uuid:upload_id>/parts/<int:part_number>/', transfer_view(UploadPartView.as_view())),
+    path('api/files/<int:pk>/download/', transfer_view(DownloadFileView.as_view(async_body=True))),
+    path(
+        'api/files/download/public/<str:public_link>/',
+        transfer_view(PublicDownloadView.as_view(async_body=True)),
+    ),
+    path('', include('mycloud.urls')),
+]
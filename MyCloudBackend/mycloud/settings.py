@@ -59,6 +59,14 @@ MIDDLEWARE = [
 
 ROOT_URLCONF = 'mycloud.urls'
 
+# Процесс ASGI (mycloud/asgi.py, gunicorn_asgi.conf.py) передаёт файлы асинхронно.
+# Статику там отдаёт nginx: синхронный WhiteNoise перевёл бы всю цепочку middleware
+# в один общий поток
+ASGI_TRANSFER = os.getenv('MYCLOUD_ASGI') == '1'
+if ASGI_TRANSFER:
+    ROOT_URLCONF = 'mycloud.asgi_urls'
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
@@ -141,17 +149,21 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 # ============================================================
 
 REST_FRAMEWORK = {
+    # Пользователь берётся из claims токена, без выборки User на каждый запрос
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'storage.authentication.StatelessJWTAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    # JSON кодируется orjson; MessagePack — только по Accept: application/msgpack
     'DEFAULT_RENDERER_CLASSES': [
-        'rest_framework.renderers.JSONRenderer',
+        'storage.renderers.ORJSONRenderer',
+        'storage.renderers.MessagePackRenderer',
     ],
     'DEFAULT_PARSER_CLASSES': [
         'rest_framework.parsers.JSONParser',
+        'storage.renderers.MessagePackParser',
         'rest_framework.parsers.MultiPartParser',
         'rest_framework.parsers.FormParser',
     ],
@@ -198,6 +210,7 @@ SIMPLE_JWT = {
     'AUTH_TOKEN_CLASSES': ('rest_framework_simplejwt.tokens.AccessToken',),
     'TOKEN_TYPE_CLAIM': 'token_type',
     'TOKEN_USER_CLASS': 'rest_framework_simplejwt.models.TokenUser',
+    'TOKEN_REFRESH_SERIALIZER': 'storage.serializers.StorageTokenRefreshSerializer',
 
     'JTI_CLAIM': 'jti',
 
@@ -251,6 +264,20 @@ CORS_ALLOW_HEADERS = [
     'x-requested-with',
     'access-control-allow-origin',
     'access-control-allow-credentials',
+    'range',
+    'if-range',
+    'if-none-match',
+    'if-modified-since',
+]
+
+# Заголовки скачивания, доступные фронтенду (докачка, перемотка видео)
+CORS_EXPOSE_HEADERS = [
+    'accept-ranges',
+    'content-range',
+    'content-length',
+    'content-disposition',
+    'etag',
+    'last-modified',
 ]
 
 CORS_ALLOW_METHODS = [
@@ -299,6 +326,56 @@ FILE_UPLOAD_MAX_MEMORY_SIZE = 10 * 1024 * 1024  # 10MB
 DATA_UPLOAD_MAX_MEMORY_SIZE = MAX_FILE_SIZE
 DATA_UPLOAD_MAX_NUMBER_FIELDS = 1000
 
+# Хранилище содержимого файлов: 'local' — MEDIA_ROOT на диске узла,
+# 's3' — S3-совместимое объектное хранилище (нужен boto3), либо путь к своему классу драйвера
+STORAGE_DRIVER = os.getenv('STORAGE_DRIVER', 'local')
+S3_STORAGE = {
+    'bucket': os.getenv('S3_BUCKET', ''),
+    'endpoint_url': os.getenv('S3_ENDPOINT_URL') or None,
+    'region_name': os.getenv('S3_REGION', 'us-east-1'),
+    'access_key': os.getenv('S3_ACCESS_KEY', ''),
+    'secret_key': os.getenv('S3_SECRET_KEY', ''),
+    'prefix': os.getenv('S3_PREFIX', ''),
+}
+# Через сколько секунд проверить содержимое новой загрузки: если транзакция
+# откатилась и записи Blob нет, файл удаляется (storage/blobs.py, prepare())
+BLOB_ORPHAN_CHECK_DELAY = 60 * 60
+# Включать только пока shard_media не перенесла blob из плоского blobs/<sha256>
+# в blobs/ab/cd/<sha256>: тогда при каждом чтении проверяется и плоский путь.
+# После переноса выключить — лишний stat на каждое скачивание не нужен
+BLOB_FLAT_LAYOUT = os.getenv('BLOB_FLAT_LAYOUT', 'False').lower() == 'true'
+
+# Отдача файлов: 'direct' — файл стримит сам Django (разработка, запасной вариант),
+# 'x-accel' — Django проверяет права и отвечает X-Accel-Redirect, файл отдаёт nginx через sendfile
+FILE_DELIVERY_MODE = os.getenv('FILE_DELIVERY_MODE', 'direct')
+X_ACCEL_REDIRECT_PREFIX = '/protected-media/'
+
+# Сколько секунд браузеры и промежуточные кэши могут хранить файлы, скачанные по публичной ссылке
+PUBLIC_DOWNLOAD_MAX_AGE = 60 * 60
+
+# Счётчики скачиваний копятся в памяти воркера и пишутся в БД пачками:
+# раз в DOWNLOAD_COUNTER_FLUSH_INTERVAL секунд (0 — сразу) или при накоплении MAX_PENDING файлов
+DOWNLOAD_COUNTER_FLUSH_INTERVAL = int(os.getenv('DOWNLOAD_COUNTER_FLUSH_INTERVAL', 10))
+DOWNLOAD_COUNTER_MAX_PENDING = 500
+
+# Максимум файлов в одном ZIP-архиве (/api/files/archive/)
+ARCHIVE_MAX_FILES = MAX_FILES_PER_USER
+
+# Сколько секунд ответ списка файлов хранится в кэше (сбрасывается при любом изменении файлов)
+FILE_LIST_CACHE_TIMEOUT = 300
+
+# Админские списки пользователей и файлов отдаются потоком, строки читаются из БД пачками
+LISTING_STREAM_CHUNK_SIZE = 500
+
+# Потоки для чтения файлов при асинхронной отдаче (storage/aio.py): заняты только на время чтения блока
+ASYNC_FILE_IO_THREADS = int(os.getenv('ASYNC_FILE_IO_THREADS', 32))
+
+# Многочастная загрузка (/api/files/uploads/)
+MULTIPART_UPLOAD_PART_SIZE = 8 * 1024 * 1024  # 8MB по умолчанию
+MULTIPART_UPLOAD_MIN_PART_SIZE = 1024 * 1024  # 1MB
+MULTIPART_UPLOAD_MAX_PART_SIZE = 64 * 1024 * 1024  # 64MB
+MULTIPART_UPLOAD_EXPIRY = timedelta(hours=24)
+
 # Allowed file types
 ALLOWED_UPLOAD_EXTENSIONS = [
     # Images
@@ -321,17 +398,97 @@ ALLOWED_UPLOAD_EXTENSIONS = [
 # CACHING
 # ============================================================
 
-CACHES = {
-    'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-        'TIMEOUT': 300,  # 5 minutes
-        'OPTIONS': {
-            'MAX_ENTRIES': 1000,
-            'CULL_FREQUENCY': 3,
+# Сколько секунд права и активность пользователя (для проверки JWT) живут в общем кэше.
+# Изменения через API сбрасывают запись сразу, прочие (Django admin, shell) — не позже этого срока
+AUTH_STATE_CACHE_TIMEOUT = 30
+
+# Bloom-фильтр отозванных refresh-токенов (storage/blacklist.py): большинство
+# обновлений токена обходится без запроса к token_blacklist
+TOKEN_BLOOM_CAPACITY = 100_000
+TOKEN_BLOOM_ERROR_RATE = 0.001
+# Сколько живут в общем кэше записи об отзыве для дочитывания другими воркерами
+TOKEN_BLOOM_ENTRY_TIMEOUT = 24 * 60 * 60
+# Отставание (в записях) и время ожидания пропавшей записи, после которых фильтр строится заново
+TOKEN_BLOOM_SYNC_LIMIT = 1000
+TOKEN_BLOOM_GAP_TIMEOUT = 30
+
+# Очередь фоновых задач в БД (storage/jobs.py, manage.py runworker)
+JOB_WORKER_CONCURRENCY = int(os.getenv('JOB_WORKER_CONCURRENCY', 4))
+# Аренда задачи воркером: продлевается, пока задача выполняется; после падения воркера
+# задача вернётся в очередь не позже этого срока
+JOB_LEASE_SECONDS = 300
+# Как часто воркер продлевает аренду, возвращает задачи упавших воркеров и ставит периодические
+JOB_MAINTENANCE_INTERVAL = 30
+JOB_DEFAULT_MAX_ATTEMPTS = 5
+# Повтор после ошибки: 10 с, 20 с, 40 с… но не реже раза в час
+JOB_RETRY_BASE_DELAY = 10
+JOB_RETRY_MAX_DELAY = 3600
+# Сколько дней хранить выполненные и окончательно упавшие задачи
+JOB_RETENTION_DAYS = 7
+# Периодические задачи: interval — секунд между запусками
+JOB_PERIODIC = {
+    'cleanup_upload_sessions': {
+        'task': 'management.command', 'args': {'name': 'cleanup_upload_sessions'}, 'interval': 60 * 60,
+    },
+    'purge_expired_tokens': {
+        'task': 'management.command', 'args': {'name': 'purge_expired_tokens'}, 'interval': 24 * 60 * 60,
+    },
+    'purge_finished_jobs': {'task': 'jobs.purge_finished', 'interval': 24 * 60 * 60},
+    'evict_thumbnails': {'task': 'thumbnails.evict', 'interval': 60 * 60},
+}
+# Удаление пользователя (storage/deletion.py): файлов в одной задаче-пачке
+USER_PURGE_BATCH_SIZE = 500
+
+# Миниатюры изображений (storage/thumbnails.py): имя размера -> наибольшая сторона в пикселях
+THUMBNAIL_SIZES = {'small': 128, 'medium': 512, 'large': 1024}
+THUMBNAIL_FORMATS = ['webp', 'jpeg']
+THUMBNAIL_QUALITY = 80
+# Процессы Pillow в воркере очереди; 0 — строить в потоке задачи
+THUMBNAIL_PROCESSES = int(os.getenv('THUMBNAIL_PROCESSES', min(os.cpu_count() or 1, 4)))
+THUMBNAIL_TASKS_PER_CHILD = 100
+# Исходники больше этого размера или с большим числом пикселей не обрабатываются
+THUMBNAIL_MAX_SOURCE_SIZE = 50 * 1024 * 1024
+THUMBNAIL_MAX_PIXELS = 60_000_000
+# Общий объём миниатюр в хранилище; сверх него вытесняются давно не запрашиваемые
+THUMBNAIL_CACHE_MAX_BYTES = int(os.getenv('THUMBNAIL_CACHE_MAX_BYTES', 2 * 1024 ** 3))
+# Миниатюра по адресу не меняется — браузер хранит её год без перепроверки
+THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60
+# Как часто обновлять время последнего запроса миниатюры (для вытеснения)
+THUMBNAIL_TOUCH_INTERVAL = 24 * 60 * 60
+# Через сколько секунд клиенту повторить запрос ещё не построенной миниатюры
+THUMBNAIL_RETRY_AFTER = 2
+# Сколько не пытаться снова, если Pillow не смог прочитать исходник
+THUMBNAIL_FAILURE_TIMEOUT = 24 * 60 * 60
+
+# Общий для всех воркеров gunicorn кэш (throttling, поколения кэша — storage/generations.py).
+# Без REDIS_URL — кэш в памяти процесса: годится только для разработки и тестов
+REDIS_URL = os.getenv('REDIS_URL', '')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+            'TIMEOUT': 300,  # 5 minutes
+            'KEY_PREFIX': 'mycloud',
+            'OPTIONS': {
+                'socket_connect_timeout': 1,
+                'socket_timeout': 1,
+            }
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'unique-snowflake',
+            'TIMEOUT': 300,  # 5 minutes
+            'OPTIONS': {
+                'MAX_ENTRIES': 1000,
+                'CULL_FREQUENCY': 3,
+            }
         }
     }
-}
 
 # ============================================================
 # LOGGING CONFIGURATION
@@ -1,4 +1,42 @@
-from django.contrib import admin
-from .models import File
+from django.contrib import admin, messages
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from .models import File, Job, UserPurge, UserStorageUsage
 
 admin.site.register(File)
+admin.site.register(UserStorageUsage)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'name', 'status', 'priority', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+    list_filter = ('status', 'name')
+    search_fields = ('unique_key', 'locked_by')
+    ordering = ('-id',)
+    actions = ['retry']
+
+    @admin.action(description="Повторить выбранные задачи")
+    def retry(self, request, queryset):
+        retried = 0
+        skipped = []
+        for job_id in queryset.exclude(status=Job.RUNNING).values_list('pk', flat=True):
+            try:
+                # По одной: задача с тем же unique_key может уже стоять в очереди (job_unique_active)
+                with transaction.atomic():
+                    retried += Job.objects.filter(pk=job_id).exclude(status=Job.RUNNING).update(
+                        status=Job.QUEUED, attempts=0, run_at=timezone.now(), finished_at=None, last_error=''
+                    )
+            except IntegrityError:
+                skipped.append(job_id)
+        self.message_user(request, f"Поставлено в очередь: {retried}")
+        if skipped:
+            ids = ', '.join(f'#{job_id}' for job_id in skipped)
+            self.message_user(request, f"Пропущены — такая задача уже в очереди: {ids}", messages.WARNING)
+
+
+@admin.register(UserPurge)
+class UserPurgeAdmin(admin.ModelAdmin):
+    list_display = ('id', 'username', 'status', 'removed_files', 'total_files', 'requested_by', 'created_at', 'finished_at')
+    list_filter = ('status',)
+    search_fields = ('username',)
+    ordering = ('-id',)
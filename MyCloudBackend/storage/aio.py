@@ -0,0 +1,72 @@
+"""
+Передача файлов под ASGI (mycloud/asgi.py, gunicorn_asgi.conf.py): один процесс
+на event loop держит тысячи медленных клиентов. Проверки и запросы к БД
+выполняются в пуле потоков, а байты файла отдаются асинхронным итератором —
+поток занят только на время чтения очередного блока с диска или из S3,
+а не всё время, пока клиент принимает ответ.
+"""
+import asyncio
+import functools
+from concurrent.futures import ThreadPoolExecutor
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+
+_executor = None
+
+
+def _file_io_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(settings.ASYNC_FILE_IO_THREADS, thread_name_prefix='file-io')
+    return _executor
+
+
+def _with_connections(func, *args, **kwargs):
+    # Потоки пула не видят request_started/finished — соединения с БД обслуживаем сами
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_thread(func, *args, **kwargs):
+    """
+    Синхронный код (ORM, DRF) в пуле потоков. thread_sensitive=False: иначе
+    все вызовы процесса выстроятся в очередь к одному общему потоку.
+    """
+    return await sync_to_async(_with_connections, thread_sensitive=False)(func, *args, **kwargs)
+
+
+async def aiter_blocking(iterator):
+    """
+    Асинхронный итератор над блокирующим (генератор драйвера хранилища):
+    каждый блок читается в пуле file-io, пока event loop обслуживает других клиентов.
+    """
+    loop = asyncio.get_running_loop()
+    executor = _file_io_executor()
+    sentinel = object()
+    try:
+        while True:
+            chunk = await loop.run_in_executor(executor, next, iterator, sentinel)
+            if chunk is sentinel:
+                break
+            yield chunk
+    finally:
+        # Клиент отключился или всё отдано — закрываем файл в том же пуле
+        close = getattr(iterator, 'close', None)
+        if close is not None:
+            await loop.run_in_executor(executor, close)
+
+
+def transfer_view(view):
+    """
+    Асинхронная обёртка над представлением DRF (DRF не поддерживает async-обработчики).
+    Под ASGI тело запроса уже принято event loop'ом до вызова представления,
+    поэтому поток из пула не ждёт медленного клиента ни при загрузке, ни при скачивании.
+    """
+    @functools.wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        return await run_in_thread(view, request, *args, **kwargs)
+    return wrapper
@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class StorageConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'storage'
+
+    def ready(self):
+        # Регистрация фоновых задач (storage/jobs.py)
+        from . import tasks  # noqa: F401
@@ -0,0 +1,73 @@
+import os
+import zipfile
+
+# Уже сжатые форматы кладём в архив без повторного сжатия
+STORED_EXTENSIONS = {
+    '.jpg', '.jpeg', '.png', '.gif', '.webp',
+    '.mp3', '.ogg', '.mp4', '.avi', '.mkv', '.mov',
+    '.zip', '.rar', '.7z', '.gz', '.bz2', '.xz',
+    '.docx', '.xlsx', '.pptx', '.odt', '.ods', '.odp', '.pdf',
+}
+
+
+class _StreamSink:
+    """
+    Неперематываемый приёмник для ZipFile: копит записанные байты до следующего
+    drain(). ZipFile сам переходит в потоковый режим (data descriptor после данных).
+    """
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def unique_arcname(name, used):
+    """Имя внутри архива без разделителей пути и без повторов: 'a.txt', 'a (1).txt'"""
+    name = name.replace('/', '_').replace('\\', '_') or 'file'
+    base, ext = os.path.splitext(name)
+    candidate, index = name, 1
+    while candidate in used:
+        candidate = f"{base} ({index}){ext}"
+        index += 1
+    used.add(candidate)
+    return candidate
+
+
+def stream_zip(entries, storage):
+    """
+    Генератор байтов ZIP-архива. entries — итерируемое (arcname, key, size, modified_at),
+    содержимое читается драйвером хранилища storage.
+    Память постоянна: в буфере не больше одного блока, временного архива нет.
+    Файлы больше 4 ГБ и архивы больше 4 ГБ пишутся в формате ZIP64.
+    """
+    sink = _StreamSink()
+    with zipfile.ZipFile(sink, mode='w', allowZip64=True) as archive:
+        for arcname, key, size, modified_at in entries:
+            info = zipfile.ZipInfo(arcname, date_time=modified_at.timetuple()[:6])
+            info.file_size = size
+            if os.path.splitext(arcname)[1].lower() in STORED_EXTENSIONS:
+                info.compress_type = zipfile.ZIP_STORED
+            else:
+                info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+
+            with archive.open(info, mode='w') as target:
+                for chunk in storage.read(key):
+                    target.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            yield sink.drain()
+    # Центральный каталог пишется при закрытии архива
+    yield sink.drain()
@@ -0,0 +1,49 @@
+from django.contrib.auth import get_user_model
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .tokens import CLAIM_FIELDS, VERSION_CLAIM, auth_state
+
+User = get_user_model()
+
+
+def claims_user(user_id, validated_token):
+    """
+    Экземпляр User из claims без запроса к БД. Остальные поля отложены
+    (как у .only()): обращение к ним догрузит их из БД.
+    """
+    data = {'id': user_id, **{field: validated_token[field] for field in CLAIM_FIELDS}}
+    concrete = [f.attname for f in User._meta.concrete_fields if f.attname in data]
+    return User.from_db(DEFAULT_DB_ALIAS, concrete, [data[name] for name in concrete])
+
+
+class StatelessJWTAuthentication(JWTAuthentication):
+    """
+    Пользователь собирается из подписанных claims; вместо выборки User —
+    проверка состояния в общем кэше (деактивация, смена пароля или прав).
+    Токены, выданные до появления claims, проверяются по БД, как раньше.
+    """
+
+    def get_user(self, validated_token):
+        if VERSION_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = int(validated_token[api_settings.USER_ID_CLAIM])
+        except (KeyError, TypeError, ValueError):
+            raise InvalidToken("В токене нет идентификатора пользователя")
+
+        state = auth_state(user_id)
+        if state is None:
+            raise AuthenticationFailed("Пользователь не найден", code='user_not_found')
+        if not state['is_active']:
+            raise AuthenticationFailed("Пользователь деактивирован", code='user_inactive')
+        if state[VERSION_CLAIM] != validated_token[VERSION_CLAIM]:
+            raise AuthenticationFailed("Токен отозван", code='token_revoked')
+        if any(state[field] != validated_token.get(field) for field in CLAIM_FIELDS):
+            # Права изменились — клиент получит новые claims через refresh
+            raise AuthenticationFailed("Данные пользователя изменились, обновите токен", code='token_stale')
+
+        return claims_user(user_id, validated_token)
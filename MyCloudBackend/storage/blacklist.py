@@ -0,0 +1,158 @@
+"""
+Bloom-фильтр отозванных refresh-токенов (token_blacklist) в памяти процесса.
+Если jti нет в фильтре, токен точно не в blacklist и запрос к БД не нужен;
+при попадании (в том числе ложном) проверка идёт в БД, как раньше.
+
+Фильтр строится из БД при первом обращении в процессе. Новые отзывы
+публикуются в общем кэше: счётчик-поколение 'token_blacklist'
+(storage/generations.py) и запись jti под каждым номером. Перед проверкой
+воркер дочитывает записи после своего номера — отзыв в одном воркере
+виден остальным со следующего запроса.
+
+Без общего кэша (LocMemCache у каждого процесса, без REDIS_URL) отзывы
+в другие воркеры не доходят, поэтому фильтр не используется и каждая
+проверка идёт в БД.
+"""
+import hashlib
+import logging
+import math
+import threading
+import time
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+from . import generations
+from .generations import cache_is_shared
+
+logger = logging.getLogger(__name__)
+
+NAMESPACE = 'token_blacklist'
+
+
+def _entry_key(number):
+    return f'{NAMESPACE}:{number}'
+
+
+class BloomFilter:
+    """Битовый массив и k хешей (двойное хеширование одного blake2b)"""
+
+    def __init__(self, capacity, error_rate):
+        capacity = max(int(capacity), 1)
+        self.size = max(int(-capacity * math.log(error_rate) / math.log(2) ** 2), 8)
+        self.hashes = max(round(self.size / capacity * math.log(2)), 1)
+        self.capacity = capacity
+        self.count = 0
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, value):
+        digest = hashlib.blake2b(value.encode(), digest_size=16).digest()
+        first, second = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((first + i * second) % self.size for i in range(self.hashes))
+
+    def add(self, value):
+        for position in self._positions(value):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+
+    def __contains__(self, value):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(value))
+
+
+class BlacklistFilter:
+    """
+    Фильтр одного процесса. number — последняя применённая запись общего кэша;
+    пока записи не дочитаны (вытеснены или ещё не записаны), might_contain()
+    отвечает True и проверка идёт в БД.
+    """
+
+    def __init__(self, using='default'):
+        self.using = using
+        self.bloom = None
+        self.number = None
+        self.gap_since = None
+        self.lock = threading.Lock()
+
+    def rebuild(self):
+        # Номер читается до выборки: отзывы во время загрузки дочитаются из кэша
+        number = generations.generation(NAMESPACE, self.using)
+        jtis = (
+            BlacklistedToken.objects.filter(token__expires_at__gt=aware_utcnow())
+            .values_list('token__jti', flat=True)
+        )
+        count = jtis.count()
+        bloom = BloomFilter(max(settings.TOKEN_BLOOM_CAPACITY, count * 2), settings.TOKEN_BLOOM_ERROR_RATE)
+        for jti in jtis.iterator(chunk_size=settings.LISTING_STREAM_CHUNK_SIZE):
+            bloom.add(jti)
+        self.bloom, self.number, self.gap_since = bloom, number, None
+        logger.info(f"Bloom-фильтр blacklist построен: {count} токенов, {len(bloom.bits)} байт")
+
+    def sync(self):
+        """Дочитывает отзывы других воркеров; True — фильтр полон"""
+        current = generations.generation(NAMESPACE, self.using)
+        if (self.bloom is None or current < self.number
+                or current - self.number > settings.TOKEN_BLOOM_SYNC_LIMIT
+                or self.bloom.count > self.bloom.capacity):
+            # Первое обращение, сброс кэша, сильное отставание или переполнение
+            self.rebuild()
+            current = generations.generation(NAMESPACE, self.using)
+        if current == self.number:
+            return True
+
+        numbers = range(self.number + 1, current + 1)
+        entries = caches[self.using].get_many([_entry_key(number) for number in numbers])
+        for number in numbers:
+            jti = entries.get(_entry_key(number))
+            if jti is None:
+                # Запись ещё не сохранена отозвавшим воркером или уже вытеснена
+                if self.gap_since is None:
+                    self.gap_since = time.monotonic()
+                elif time.monotonic() - self.gap_since > settings.TOKEN_BLOOM_GAP_TIMEOUT:
+                    self.rebuild()
+                    return self.sync()
+                return False
+            self.bloom.add(jti)
+            self.number, self.gap_since = number, None
+        return True
+
+    def might_contain(self, jti):
+        if not cache_is_shared(self.using):
+            # Отзывы из других процессов сюда не доходят — без фильтра
+            return True
+        try:
+            with self.lock:
+                return not self.sync() or jti in self.bloom
+        except Exception as e:
+            # Кэш недоступен — проверяем по БД
+            logger.warning(f"Bloom-фильтр blacklist недоступен: {str(e)}")
+            return True
+
+    def _publish(self, jti):
+        try:
+            number = generations.bump(NAMESPACE, self.using)
+            caches[self.using].set(_entry_key(number), jti, settings.TOKEN_BLOOM_ENTRY_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"Не удалось опубликовать отзыв токена {jti}: {str(e)}")
+
+    def publish(self, jti):
+        """
+        Публикация — после фиксации транзакции: воркер, построивший фильтр по БД
+        до появления записи, ещё не видел и номер, и дочитает её из кэша.
+        """
+        with self.lock:
+            if self.bloom is not None:
+                self.bloom.add(jti)
+        transaction.on_commit(lambda: self._publish(jti))
+
+
+blacklist_filter = BlacklistFilter()
+
+
+def might_be_blacklisted(jti):
+    return blacklist_filter.might_contain(jti)
+
+
+def publish_blacklisted(jti):
+    blacklist_filter.publish(jti)
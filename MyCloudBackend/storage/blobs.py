@@ -0,0 +1,151 @@
+import os
+import uuid
+import hashlib
+import logging
+from collections import Counter
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from . import jobs, paths, thumbnails
+from .drivers import get_driver
+from .models import Blob
+
+logger = logging.getLogger(__name__)
+
+
+def new_temp_path():
+    """
+    Путь для временного файла внутри MEDIA_ROOT: та же файловая система,
+    что и у blobs/, поэтому перенос в хранилище — это атомарный rename.
+    """
+    tmp_dir = paths.media_path('.tmp')
+    os.makedirs(tmp_dir, exist_ok=True)
+    return os.path.join(tmp_dir, uuid.uuid4().hex)
+
+
+def hash_file(path):
+    """SHA-256 и размер существующего файла"""
+    with open(path, 'rb') as f:
+        digest = hashlib.file_digest(f, 'sha256')
+        return digest.hexdigest(), f.tell()
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Не удалось удалить файл {path}: {str(e)}")
+
+
+def lock_content(sha256):
+    """
+    Блокирует содержимое sha256 до конца транзакции: store() и remove_blob_files()
+    одного и того же содержимого не пересекаются. В PostgreSQL — advisory-блокировка
+    (строки Blob может ещё не быть); SQLite и так выполняет записи по одной.
+    """
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(hashtext(%s))', [sha256])
+
+
+def prepare(source_path, sha256):
+    """
+    Вызывается до транзакции, в которой будет store(). Если содержимого ещё нет
+    в хранилище, ставит отложенную проверку: откатись транзакция после переноса
+    файла в хранилище — файл без записи Blob удалит remove_blob_files().
+    Задача ставится вне транзакции, поэтому откат её не отменяет.
+
+    В удалённое хранилище (S3) содержимое загружается здесь же, под итоговым
+    ключом sha256: store() в транзакции найдёт его и только увеличит счётчик,
+    блокировка не держится на время загрузки. source_path остаётся на месте.
+    """
+    storage = get_driver()
+    if storage.exists(paths.blob_relative_path(sha256)):
+        return
+    if settings.BLOB_FLAT_LAYOUT and storage.exists(paths.flat_blob_relative_path(sha256)):
+        return
+    jobs.enqueue('blobs.remove_files', {'blob_ids': [sha256]}, delay=settings.BLOB_ORPHAN_CHECK_DELAY)
+    if not storage.is_local:
+        with open(source_path, 'rb') as source:
+            storage.write(paths.blob_relative_path(sha256), source)
+
+
+@transaction.atomic
+def store(source_path, sha256, size):
+    """
+    Кладёт файл source_path в хранилище под ключом sha256 и увеличивает счётчик
+    ссылок. Если содержимое уже в хранилище, исходный файл просто удаляется.
+    Вызывающий код обязан привязать возвращённый Blob к записи File.
+    """
+    lock_content(sha256)
+    blob, _ = Blob.objects.select_for_update().get_or_create(
+        sha256=sha256, defaults={'size': size}
+    )
+    Blob.objects.filter(pk=blob.pk).update(ref_count=F('ref_count') + 1)
+
+    # Наличие проверяем под блокировкой: содержимого может не оказаться, если прошлый
+    # перенос не удался или его только что удалил remove_blob_files() после отката.
+    # Удалённое хранилище содержимое уже получило в prepare(), перенос здесь — запасной путь
+    if not get_driver().exists(blob.current_relative_path()):
+        get_driver().save_file(source_path, blob.relative_path)
+    else:
+        _unlink_quietly(source_path)
+        logger.debug(f"Содержимое {sha256} уже в хранилище")
+
+    blob.refresh_from_db(fields=['ref_count'])
+    return blob
+
+
+def release(blob_ids):
+    """
+    Уменьшает счётчики ссылок (id может повторяться — по одному на удалённый File).
+    Blob без ссылок удаляется из БД, а его файл — после коммита транзакции.
+    """
+    counts = Counter(blob_id for blob_id in blob_ids if blob_id)
+    if not counts:
+        return
+    with transaction.atomic():
+        # Одинаковый порядок блокировок в параллельных удалениях — без взаимных блокировок
+        for blob_id, count in sorted(counts.items()):
+            Blob.objects.filter(pk=blob_id).update(ref_count=Greatest(F('ref_count') - count, 0))
+        purge_orphans(counts.keys())
+
+
+def purge_orphans(blob_ids=None):
+    """
+    Удаляет blob без ссылок (все или только из blob_ids). Файлы из хранилища
+    удаляет фоновая задача, поставленная в той же транзакции.
+    """
+    orphans = Blob.objects.filter(ref_count__lte=0, files__isnull=True)
+    if blob_ids is not None:
+        orphans = orphans.filter(pk__in=list(blob_ids))
+    with transaction.atomic():
+        orphaned = list(orphans.values_list('pk', flat=True))
+        if orphaned:
+            Blob.objects.filter(pk__in=orphaned, ref_count__lte=0).delete()
+            jobs.enqueue('blobs.remove_files', {'blob_ids': orphaned})
+    return len(orphaned)
+
+
+def remove_blob_files(blob_ids):
+    """
+    Удаляет содержимое blob без записи в БД. Под блокировкой содержимого:
+    загрузка того же содержимого в незавершённой транзакции либо уже
+    зафиксирована (blob ожил — файл нужен), либо дождётся удаления и сохранит файл заново.
+    """
+    with transaction.atomic():
+        # Блокировки в одном порядке — параллельные задачи не заблокируют друг друга
+        for blob_id in sorted(set(blob_ids)):
+            lock_content(blob_id)
+        revived = set(Blob.objects.filter(pk__in=blob_ids).values_list('pk', flat=True))
+        keys = []
+        for blob_id in blob_ids:
+            if blob_id not in revived:
+                keys += [paths.blob_relative_path(blob_id), paths.flat_blob_relative_path(blob_id)]
+                keys += thumbnails.blob_keys(blob_id)
+        if keys:
+            get_driver().delete_many(keys)
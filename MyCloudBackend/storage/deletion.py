@@ -0,0 +1,174 @@
+"""
+Удаление файлов и пользователей.
+
+Пользователь удаляется в два этапа. В запросе администратора schedule() только
+деактивирует учётную запись и создаёт UserPurge — транзакция короткая при любом
+числе файлов. Дальше работают фоновые задачи (storage/jobs.py): 'users.purge'
+делит файлы пользователя на диапазоны id по USER_PURGE_BATCH_SIZE, а задачи
+'users.purge_batch' удаляют каждый диапазон в своей транзакции и выполняются
+воркерами параллельно. Каждый шаг можно повторить: упавшая пачка
+перезапускается очередью, повторный запрос на удаление заново раскладывает
+оставшиеся файлы. Когда файлов не осталось, удаляется сам пользователь.
+"""
+import logging
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from . import blobs, jobs, listing_cache, usage
+from .models import File, Job, UploadSession, UserPurge
+from .multipart import remove_parts_dir
+from .tokens import invalidate_auth_state
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+# Удаление пользователей не должно задерживать задачи, которых ждут в интерфейсе
+PURGE_PRIORITY = -10
+
+
+@transaction.atomic
+def delete_file_records(files):
+    """
+    Удаляет записи File и освобождает их содержимое: общие blob — через счётчик
+    ссылок, старые файлы без blob — сразу с диска. Возвращает число удалённых файлов.
+    """
+    # Строки блокируются до удаления: параллельное удаление тех же файлов ждёт
+    # и уже не находит их, поэтому счётчики и ref_count уменьшаются один раз
+    rows = list(
+        files.select_for_update(of=('self',))
+        .values_list('pk', 'blob_id', 'stored_name', 'user_id', 'size')
+    )
+    File.objects.filter(pk__in=[row[0] for row in rows]).delete()
+    blobs.release(row[1] for row in rows)
+    usage.files_removed((user_id, size) for _, _, _, user_id, size in rows)
+    listing_cache.invalidate(user_id for _, _, _, user_id, _ in rows)
+
+    # Содержимое из хранилища удаляет воркер — ответ не ждёт диска или S3
+    legacy_keys = [stored_name for _, blob_id, stored_name, _, _ in rows if not blob_id]
+    if legacy_keys:
+        jobs.enqueue('storage.delete_keys', {'keys': legacy_keys})
+    return len(rows)
+
+
+@transaction.atomic
+def schedule(user, requested_by=''):
+    """
+    Ставит пользователя в очередь на удаление и возвращает UserPurge.
+    Повторный вызов для того же пользователя возобновляет удаление.
+    """
+    purge, created = UserPurge.objects.get_or_create(
+        user=user,
+        defaults={
+            'deleted_user_id': user.pk,
+            'username': user.username,
+            'requested_by': requested_by,
+            'total_files': usage.get(user).file_count,
+        },
+    )
+    if created:
+        # Вход и обновление токенов запрещены сразу, не дожидаясь удаления файлов
+        User.objects.filter(pk=user.pk).update(is_active=False)
+        invalidate_auth_state(user.pk)
+    jobs.enqueue('users.purge', {'purge_id': purge.pk}, priority=PURGE_PRIORITY,
+                 unique_key=f'purge:{purge.pk}')
+    return purge
+
+
+def plan(purge_id):
+    """Раскладывает оставшиеся файлы пользователя на пачки по диапазонам id"""
+    purge = UserPurge.objects.filter(pk=purge_id).first()
+    if purge is None or purge.status == UserPurge.DONE:
+        return 0
+    UserPurge.objects.filter(pk=purge_id, status=UserPurge.PENDING).update(status=UserPurge.RUNNING)
+
+    batch_size = settings.USER_PURGE_BATCH_SIZE
+    pks = (
+        File.objects.filter(user_id=purge.deleted_user_id)
+        .order_by('pk').values_list('pk', flat=True)
+    )
+    batches = 0
+    chunk = []
+    for pk in pks.iterator(chunk_size=batch_size):
+        chunk.append(pk)
+        if len(chunk) == batch_size:
+            _enqueue_batch(purge_id, chunk)
+            batches += 1
+            chunk = []
+    if chunk:
+        _enqueue_batch(purge_id, chunk)
+        batches += 1
+
+    if not batches:
+        finish_if_done(purge_id)
+    logger.info(f"Удаление пользователя {purge.username}: поставлено пачек {batches}")
+    return batches
+
+
+def _enqueue_batch(purge_id, pks):
+    # Пачка с той же границей, ещё не выполненная, повторно не ставится
+    jobs.enqueue('users.purge_batch', {'purge_id': purge_id, 'first_pk': pks[0], 'last_pk': pks[-1]},
+                 priority=PURGE_PRIORITY, unique_key=f'purge:{purge_id}:{pks[0]}')
+
+
+def purge_batch(purge_id, first_pk, last_pk):
+    """Удаляет файлы пользователя с id в [first_pk, last_pk]"""
+    purge = UserPurge.objects.filter(pk=purge_id).first()
+    if purge is None:
+        return 0
+    with transaction.atomic():
+        removed = delete_file_records(
+            File.objects.filter(user_id=purge.deleted_user_id, pk__gte=first_pk, pk__lte=last_pk)
+        )
+        if removed:
+            UserPurge.objects.filter(pk=purge_id).update(removed_files=F('removed_files') + removed)
+    finish_if_done(purge_id)
+    return removed
+
+
+def finish_if_done(purge_id):
+    """Удаляет пользователя, когда его файлов не осталось. True — удаление завершено"""
+    with transaction.atomic():
+        # Блокировка строки: последние пачки, завершившиеся одновременно, не удалят пользователя дважды
+        purge = UserPurge.objects.select_for_update().filter(pk=purge_id).first()
+        if purge is None or purge.status == UserPurge.DONE:
+            return purge is not None
+        if File.objects.filter(user_id=purge.deleted_user_id).exists():
+            return False
+
+        parts_dirs = [
+            session.get_parts_dir()
+            for session in UploadSession.objects.filter(user_id=purge.deleted_user_id)
+        ]
+        User.objects.filter(pk=purge.deleted_user_id).delete()
+        UserPurge.objects.filter(pk=purge_id).update(status=UserPurge.DONE, finished_at=timezone.now())
+        transaction.on_commit(lambda: [remove_parts_dir(path) for path in parts_dirs])
+    logger.info(f"Пользователь {purge.username} удалён (запрошено {purge.requested_by})")
+    return True
+
+
+def status(purge):
+    """Прогресс удаления для админского эндпоинта"""
+    remaining = failed_batches = 0
+    if purge.status != UserPurge.DONE:
+        remaining = File.objects.filter(user_id=purge.deleted_user_id).count()
+        # Пачки, исчерпавшие попытки: удаление встанет, пока их не перезапустят
+        failed_batches = Job.objects.filter(
+            name='users.purge_batch', status=Job.FAILED, args__purge_id=purge.pk
+        ).count()
+    return {
+        'id': purge.pk,
+        'user_id': purge.deleted_user_id,
+        'username': purge.username,
+        'requested_by': purge.requested_by,
+        'status': purge.status,
+        'total_files': purge.total_files,
+        'removed_files': purge.removed_files,
+        'remaining_files': remaining,
+        'failed_batches': failed_batches,
+        'created_at': purge.created_at.isoformat(),
+        'finished_at': purge.finished_at.isoformat() if purge.finished_at else None,
+    }
@@ -0,0 +1,134 @@
+import atexit
+import logging
+import threading
+from collections import Counter
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Case, DateTimeField, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+from . import listing_cache
+
+logger = logging.getLogger(__name__)
+
+# Накопленные в этом процессе скачивания: file_id -> количество и время последнего
+_lock = threading.Lock()
+_counts = Counter()
+_last_seen = {}
+_flusher = None
+_stop = threading.Event()
+
+
+def record(file_ids):
+    """
+    Учитывает скачивание файлов без обращения к БД. Накопленное сбрасывается
+    фоновым потоком раз в DOWNLOAD_COUNTER_FLUSH_INTERVAL секунд, при переполнении
+    буфера и при завершении процесса. Интервал 0 — запись сразу (разработка, тесты).
+    """
+    if isinstance(file_ids, int):
+        file_ids = [file_ids]
+    now = timezone.now()
+    with _lock:
+        for file_id in file_ids:
+            _counts[file_id] += 1
+            _last_seen[file_id] = now
+        pending = len(_counts)
+
+    if settings.DOWNLOAD_COUNTER_FLUSH_INTERVAL <= 0 or pending >= settings.DOWNLOAD_COUNTER_MAX_PENDING:
+        flush()
+    else:
+        _ensure_flusher()
+
+
+def pending():
+    """Ещё не записанные в БД скачивания: {file_id: count}"""
+    with _lock:
+        return dict(_counts)
+
+
+def flush():
+    """
+    Записывает накопленное одним UPDATE на пачку файлов. Счётчик увеличивается
+    на дельту (F-выражение), поэтому воркеры не затирают друг друга; last_download
+    только растёт. Возвращает число обновлённых записей.
+    """
+    from .models import File
+
+    with _lock:
+        if not _counts:
+            return 0
+        counts, last_seen = dict(_counts), dict(_last_seen)
+        _counts.clear()
+        _last_seen.clear()
+
+    updated = 0
+    ids = list(counts)
+    batch_size = settings.DOWNLOAD_COUNTER_MAX_PENDING
+    try:
+        for offset in range(0, len(ids), batch_size):
+            batch = ids[offset:offset + batch_size]
+            increment = Case(
+                *[When(pk=pk, then=Value(counts[pk])) for pk in batch],
+                output_field=IntegerField()
+            )
+            seen = Case(
+                *[When(pk=pk, then=Value(last_seen[pk])) for pk in batch],
+                output_field=DateTimeField()
+            )
+            updated += File.objects.filter(pk__in=batch).update(
+                download_count=F('download_count') + increment,
+                last_download=Greatest(Coalesce(F('last_download'), seen), seen)
+            )
+            # last_download виден в списке файлов — сбрасываем кэш списков владельцев
+            listing_cache.invalidate(File.objects.filter(pk__in=batch).values_list('user_id', flat=True).distinct())
+            # Записанная пачка не должна вернуться в буфер при ошибке на следующей
+            for pk in batch:
+                counts.pop(pk)
+    except Exception as e:
+        logger.error(f"Не удалось записать счётчики скачиваний: {str(e)}")
+        _restore(counts, last_seen)
+        raise
+    return updated
+
+
+def _restore(counts, last_seen):
+    """Возвращает незаписанные дельты в буфер, чтобы не потерять их"""
+    with _lock:
+        for pk, count in counts.items():
+            _counts[pk] += count
+            _last_seen[pk] = max(_last_seen.get(pk, last_seen[pk]), last_seen[pk])
+
+
+def _run_flusher():
+    while not _stop.wait(settings.DOWNLOAD_COUNTER_FLUSH_INTERVAL):
+        close_old_connections()
+        try:
+            flush()
+        except Exception:
+            pass
+    connection.close()
+
+
+def _ensure_flusher():
+    global _flusher
+    if _flusher is not None and _flusher.is_alive():
+        return
+    with _lock:
+        if _flusher is not None and _flusher.is_alive():
+            return
+        _stop.clear()
+        _flusher = threading.Thread(target=_run_flusher, name='download-counters', daemon=True)
+        _flusher.start()
+
+
+def shutdown():
+    """Останавливает фоновый поток и сбрасывает остаток (atexit, worker_exit gunicorn)"""
+    _stop.set()
+    try:
+        flush()
+    except Exception:
+        pass
+
+
+atexit.register(shutdown)
@@ -0,0 +1,248 @@
+import uuid
+import mimetypes
+from urllib.parse import quote
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import content_disposition_header, http_date, parse_http_date_safe
+
+from . import paths
+from .aio import aiter_blocking
+from .drivers import get_driver
+
+# Больше диапазонов в одном запросе не обслуживаем — отдаём файл целиком
+MAX_RANGES = 16
+# Типы, которые по ?inline=1 открываются в браузере (видео с перемоткой, аудио, картинки, PDF)
+INLINE_PREFIXES = ('video/', 'audio/', 'image/', 'application/pdf', 'text/plain')
+
+
+class RangeNotSatisfiable(Exception):
+    """Ни один из запрошенных диапазонов не пересекается с файлом"""
+
+
+def parse_range_header(header, size):
+    """
+    Разбирает заголовок Range (RFC 9110, 14.2). Возвращает список пар (start, end)
+    включительно, None — если заголовок нужно проигнорировать и отдать файл целиком.
+    """
+    units, _, spec = header.partition('=')
+    if units.strip().lower() != 'bytes' or not spec:
+        return None
+
+    ranges = []
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        first, dash, last = part.partition('-')
+        if not dash:
+            return None
+        first, last = first.strip(), last.strip()
+        try:
+            if not first:
+                # Суффикс: последние N байт
+                length = int(last)
+                if length <= 0:
+                    continue
+                start, end = max(size - length, 0), size - 1
+            else:
+                start = int(first)
+                end = int(last) if last else size - 1
+                if start > end:
+                    return None
+                end = min(end, size - 1)
+        except ValueError:
+            return None
+        if start < 0:
+            return None
+        if start < size:
+            ranges.append((start, end))
+
+    if not ranges:
+        raise RangeNotSatisfiable()
+    if len(ranges) > MAX_RANGES:
+        return None
+    return _coalesce(ranges)
+
+
+def _coalesce(ranges):
+    """Сливает пересекающиеся диапазоны; непересекающиеся остаются в исходном порядке"""
+    ordered = sorted(ranges)
+    if all(prev[1] + 1 < cur[0] for prev, cur in zip(ordered, ordered[1:])):
+        return ranges
+    merged = [ordered[0]]
+    for start, end in ordered[1:]:
+        last_start, last_end = merged[-1]
+        if start <= last_end + 1:
+            merged[-1] = (last_start, max(last_end, end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def file_validators(file_obj):
+    """
+    ETag и Last-Modified (timestamp) без обращения к диску: содержимое записи File
+    не меняется после загрузки. Для blob ETag — хэш содержимого, для старых файлов —
+    размер и время загрузки.
+    """
+    last_modified = int(file_obj.uploaded_at.timestamp())
+    if file_obj.blob_id:
+        return f'"{file_obj.blob_id}"', last_modified
+    return f'"{file_obj.size:x}-{last_modified:x}"', last_modified
+
+
+def _set_cache_headers(response, file_obj, public):
+    etag, last_modified = file_validators(file_obj)
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    if public:
+        # Публичные ссылки могут держать промежуточные кэши
+        response['Cache-Control'] = f'public, max-age={settings.PUBLIC_DOWNLOAD_MAX_AGE}'
+    else:
+        # Личные файлы — только в кэше браузера и с обязательной перепроверкой
+        response['Cache-Control'] = 'private, no-cache'
+
+
+def conditional_response(request, file_obj, public=False):
+    """
+    304 Not Modified (или 412) по If-None-Match / If-Modified-Since / If-Match,
+    если клиентская копия актуальна; иначе None. Файл при этом не открывается.
+    """
+    etag, last_modified = file_validators(file_obj)
+    headers = HttpResponse()
+    _set_cache_headers(headers, file_obj, public)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified, response=headers)
+    return None if response is headers else response
+
+
+def _if_range_matches(request, etag, last_modified):
+    """If-Range: диапазон отдаём, только если представление не изменилось"""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if_range = if_range.strip()
+    if if_range.startswith('W/'):
+        return False
+    if if_range.startswith('"'):
+        return if_range == etag
+    if_range_date = parse_http_date_safe(if_range)
+    return if_range_date is not None and if_range_date == last_modified
+
+
+def _iter_ranges(storage, key, ranges, parts=None):
+    """Читает диапазоны ранжированным чтением драйвера; parts — заголовки частей multipart/byteranges"""
+    for index, (start, end) in enumerate(ranges):
+        if parts is not None:
+            yield parts[index]
+        yield from storage.read(key, start, end)
+        if parts is not None:
+            yield b'\r\n'
+    if parts is not None:
+        yield parts[-1]
+
+
+def delivery_offloaded():
+    """Файлы отдаёт nginx (X-Accel-Redirect), а не воркер Django; возможно только для локального хранилища"""
+    return settings.FILE_DELIVERY_MODE == 'x-accel' and get_driver().is_local
+
+
+def _content_type(file_obj):
+    return (
+        file_obj.mime_type
+        or mimetypes.guess_type(file_obj.original_name)[0]
+        or 'application/octet-stream'
+    )
+
+
+def _as_attachment(request, content_type):
+    return not (request.GET.get('inline') and content_type.startswith(INLINE_PREFIXES))
+
+
+def accel_redirect_response(request, file_obj, public=False):
+    """
+    Пустой ответ с X-Accel-Redirect на internal-location nginx. Файл с диска
+    Django не трогает: sendfile, Range и If-Range обрабатывает nginx.
+    """
+    content_type = _content_type(file_obj)
+    relative_path = paths.file_relative_path(file_obj)
+    response = HttpResponse(content_type=content_type)
+    response['X-Accel-Redirect'] = settings.X_ACCEL_REDIRECT_PREFIX + quote(relative_path)
+    response['Content-Disposition'] = content_disposition_header(
+        _as_attachment(request, content_type), file_obj.original_name
+    )
+    _set_cache_headers(response, file_obj, public)
+    return response
+
+
+def file_response(request, file_obj, public=False, asynchronous=False):
+    """
+    Ответ со содержимым файла с поддержкой Range/If-Range: 200 целиком,
+    206 для одного или нескольких диапазонов, 416 для недостижимых.
+    В режиме x-accel передача файла поручается nginx. Если содержимого нет
+    в хранилище — FileNotFoundError. asynchronous=True — тело отдаётся
+    асинхронным итератором (под ASGI, см. storage/aio.py).
+    """
+    if delivery_offloaded():
+        return accel_redirect_response(request, file_obj, public)
+
+    storage = get_driver()
+    key = paths.file_relative_path(file_obj)
+    size = storage.stat(key).size
+    etag, last_modified = file_validators(file_obj)
+    content_type = _content_type(file_obj)
+    as_attachment = _as_attachment(request, content_type)
+
+    ranges = None
+    range_header = request.META.get('HTTP_RANGE')
+    if range_header and _if_range_matches(request, etag, last_modified):
+        try:
+            ranges = parse_range_header(range_header, size)
+        except RangeNotSatisfiable:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            response['Accept-Ranges'] = 'bytes'
+            return response
+
+    # Синхронный итератор ASGI-обработчик Django прочитал бы в память целиком
+    body = aiter_blocking if asynchronous else iter
+
+    if not ranges and asynchronous:
+        response = StreamingHttpResponse(body(storage.read(key)), content_type=content_type)
+        response['Content-Length'] = size
+    elif not ranges:
+        response = FileResponse(
+            storage.open(key),
+            as_attachment=as_attachment,
+            filename=file_obj.original_name,
+            content_type=content_type
+        )
+        response['Content-Length'] = size
+    elif len(ranges) == 1:
+        start, end = ranges[0]
+        response = StreamingHttpResponse(body(_iter_ranges(storage, key, ranges)), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+        response['Content-Length'] = end - start + 1
+    else:
+        boundary = uuid.uuid4().hex
+        parts = [
+            (
+                f'--{boundary}\r\nContent-Type: {content_type}\r\n'
+                f'Content-Range: bytes {start}-{end}/{size}\r\n\r\n'
+            ).encode('ascii')
+            for start, end in ranges
+        ]
+        parts.append(f'--{boundary}--\r\n'.encode('ascii'))
+        length = sum(len(p) for p in parts) + sum(end - start + 1 + 2 for start, end in ranges)
+        response = StreamingHttpResponse(
+            body(_iter_ranges(storage, key, ranges, parts)),
+            status=206,
+            content_type=f'multipart/byteranges; boundary={boundary}'
+        )
+        response['Content-Length'] = length
+
+    if ranges or asynchronous:
+        response['Content-Disposition'] = content_disposition_header(as_attachment, file_obj.original_name)
+    response['Accept-Ranges'] = 'bytes'
+    _set_cache_headers(response, file_obj, public)
+    return response
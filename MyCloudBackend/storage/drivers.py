@@ -0,0 +1,247 @@
+import os
+import shutil
+import logging
+from abc import ABC, abstractmethod
+from collections import namedtuple
+from datetime import datetime, timezone as dt_timezone
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+
+from . import paths
+
+logger = logging.getLogger(__name__)
+
+# Размер блока при чтении содержимого
+READ_CHUNK_SIZE = 64 * 1024
+
+# Результат stat(): размер в байтах и время изменения (aware datetime)
+StorageStat = namedtuple('StorageStat', ['size', 'modified_at'])
+
+
+class StorageDriver(ABC):
+    """
+    Хранилище содержимого файлов. Ключ — путь относительно корня хранилища
+    (например, blobs/ab/cd/<sha256>), его выдаёт storage.paths.
+    Отсутствующий объект: read/open/stat бросают FileNotFoundError, delete молча пропускает.
+    """
+
+    @abstractmethod
+    def save_file(self, source_path, key):
+        """Переносит готовый локальный файл (из MEDIA_ROOT/.tmp) в хранилище; source_path после этого не существует"""
+
+    @abstractmethod
+    def write(self, key, stream):
+        """Потоково записывает содержимое из файлоподобного stream под ключом key"""
+
+    @abstractmethod
+    def open(self, key):
+        """Файлоподобный объект для последовательного чтения"""
+
+    @abstractmethod
+    def read(self, key, start=0, end=None):
+        """Генератор блоков байт [start, end] включительно (end=None — до конца)"""
+
+    @abstractmethod
+    def stat(self, key):
+        """Размер и время изменения объекта (StorageStat)"""
+
+    def exists(self, key):
+        try:
+            self.stat(key)
+        except FileNotFoundError:
+            return False
+        return True
+
+    @abstractmethod
+    def delete(self, key):
+        """Удаляет объект; отсутствующий пропускается"""
+
+    def delete_many(self, keys):
+        for key in keys:
+            self.delete(key)
+
+    def local_path(self, key):
+        """Путь на локальном диске или None, если хранилище не локальное (тогда нет X-Accel-Redirect)"""
+        return None
+
+    @property
+    def is_local(self):
+        return self.local_path('') is not None
+
+
+class LocalStorageDriver(StorageDriver):
+    """Файлы в MEDIA_ROOT на диске этого узла"""
+
+    def local_path(self, key):
+        return paths.media_path(key)
+
+    def save_file(self, source_path, key):
+        path = self.local_path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(source_path, path)
+
+    def write(self, key, stream):
+        from .blobs import new_temp_path
+        temp_path = new_temp_path()
+        try:
+            with open(temp_path, 'wb') as destination:
+                shutil.copyfileobj(stream, destination, READ_CHUNK_SIZE)
+            self.save_file(temp_path, key)
+        except BaseException:
+            if os.path.exists(temp_path):
+                os.unlink(temp_path)
+            raise
+
+    def open(self, key):
+        return open(self.local_path(key), 'rb')
+
+    def read(self, key, start=0, end=None):
+        with self.open(key) as f:
+            f.seek(start)
+            remaining = None if end is None else end - start + 1
+            while remaining is None or remaining > 0:
+                size = READ_CHUNK_SIZE if remaining is None else min(READ_CHUNK_SIZE, remaining)
+                chunk = f.read(size)
+                if not chunk:
+                    break
+                if remaining is not None:
+                    remaining -= len(chunk)
+                yield chunk
+
+    def stat(self, key):
+        st = os.stat(self.local_path(key))
+        return StorageStat(st.st_size, datetime.fromtimestamp(st.st_mtime, tz=dt_timezone.utc))
+
+    def exists(self, key):
+        return os.path.exists(self.local_path(key))
+
+    def delete(self, key):
+        try:
+            os.unlink(self.local_path(key))
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Не удалось удалить файл {key}: {str(e)}")
+
+
+class S3StorageDriver(StorageDriver):
+    """
+    S3-совместимое объектное хранилище (AWS S3, MinIO, Yandex Object Storage).
+    Настройки — settings.S3_STORAGE; нужен пакет boto3.
+    """
+
+    # Лимит DeleteObjects на один запрос
+    DELETE_BATCH_SIZE = 1000
+
+    def __init__(self, options=None):
+        options = dict(settings.S3_STORAGE if options is None else options)
+        try:
+            import boto3
+            from botocore.config import Config
+        except ImportError:
+            raise ImproperlyConfigured("Для STORAGE_DRIVER='s3' установите boto3")
+        if not options.get('bucket'):
+            raise ImproperlyConfigured("Не задан S3_STORAGE['bucket']")
+        self.bucket = options['bucket']
+        self.prefix = options.get('prefix', '')
+        self.client = boto3.client(
+            's3',
+            endpoint_url=options.get('endpoint_url'),
+            region_name=options.get('region_name'),
+            aws_access_key_id=options.get('access_key') or None,
+            aws_secret_access_key=options.get('secret_key') or None,
+            config=Config(retries={'max_attempts': 3, 'mode': 'standard'})
+        )
+
+    def _key(self, key):
+        return self.prefix + key.replace(os.sep, '/')
+
+    @staticmethod
+    def _is_missing(error):
+        code = error.response.get('Error', {}).get('Code')
+        return code in ('404', 'NoSuchKey', 'NotFound')
+
+    def save_file(self, source_path, key):
+        # upload_file сам переходит на multipart upload для больших файлов
+        self.client.upload_file(source_path, self.bucket, self._key(key))
+        os.unlink(source_path)
+
+    def write(self, key, stream):
+        self.client.upload_fileobj(stream, self.bucket, self._key(key))
+
+    def _get(self, key, byte_range=None):
+        from botocore.exceptions import ClientError
+        kwargs = {'Bucket': self.bucket, 'Key': self._key(key)}
+        if byte_range:
+            kwargs['Range'] = byte_range
+        try:
+            return self.client.get_object(**kwargs)['Body']
+        except ClientError as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key)
+            raise
+
+    def open(self, key):
+        return self._get(key)
+
+    def read(self, key, start=0, end=None):
+        byte_range = None
+        if start or end is not None:
+            byte_range = f"bytes={start}-{'' if end is None else end}"
+        body = self._get(key, byte_range)
+        try:
+            yield from body.iter_chunks(READ_CHUNK_SIZE)
+        finally:
+            body.close()
+
+    def stat(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            head = self.client.head_object(Bucket=self.bucket, Key=self._key(key))
+        except ClientError as e:
+            if self._is_missing(e):
+                raise FileNotFoundError(key)
+            raise
+        return StorageStat(head['ContentLength'], head['LastModified'])
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self._key(key))
+
+    def delete_many(self, keys):
+        keys = [self._key(key) for key in keys]
+        for offset in range(0, len(keys), self.DELETE_BATCH_SIZE):
+            batch = keys[offset:offset + self.DELETE_BATCH_SIZE]
+            response = self.client.delete_objects(
+                Bucket=self.bucket,
+                Delete={'Objects': [{'Key': key} for key in batch], 'Quiet': True}
+            )
+            for error in response.get('Errors', []):
+                logger.warning(f"Не удалось удалить объект {error.get('Key')}: {error.get('Message')}")
+
+
+DRIVERS = {
+    'local': LocalStorageDriver,
+    's3': S3StorageDriver,
+}
+
+_driver = None
+
+
+def get_driver():
+    """Драйвер, выбранный settings.STORAGE_DRIVER: 'local', 's3' или путь к классу"""
+    global _driver
+    if _driver is None:
+        name = settings.STORAGE_DRIVER
+        driver_class = DRIVERS.get(name) or import_string(name)
+        _driver = driver_class()
+    return _driver
+
+
+@receiver(setting_changed)
+def _reset_driver(setting, **kwargs):
+    global _driver
+    if setting in ('STORAGE_DRIVER', 'S3_STORAGE'):
+        _driver = None
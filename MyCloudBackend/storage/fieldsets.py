@@ -0,0 +1,65 @@
+class FieldsetError(Exception):
+    """В ?fields= или ?exclude= указано неизвестное поле"""
+
+    def __init__(self, message, code='INVALID_FIELDS'):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+def _split(value):
+    return [name.strip() for name in value.split(',') if name.strip()]
+
+
+def requested_fields(request, serializer_class):
+    """
+    Поля ответа по ?fields=a,b или ?exclude=c (порядок — как в Meta.fields).
+    None — параметров нет, нужны все поля.
+    """
+    available = list(serializer_class.Meta.fields)
+    fields_param = request.query_params.get('fields')
+    exclude_param = request.query_params.get('exclude')
+    if not fields_param and not exclude_param:
+        return None
+
+    selected = set(_split(fields_param)) if fields_param else set(available)
+    excluded = set(_split(exclude_param)) if exclude_param else set()
+    unknown = (selected | excluded) - set(available)
+    if unknown:
+        raise FieldsetError(f"Неизвестные поля: {', '.join(sorted(unknown))}")
+    return [name for name in available if name in selected and name not in excluded]
+
+
+def needed_columns(serializer_class, fields):
+    """
+    Столбцы модели для .only() по Meta.field_columns (поле ответа -> столбцы).
+    Столбцы вида 'user__username' требуют select_related('user').
+    """
+    columns = {'pk'}
+    mapping = serializer_class.Meta.field_columns
+    for name in fields:
+        columns.update(mapping.get(name, ()))
+    return columns
+
+
+def restrict(queryset, serializer_class, fields, *extra):
+    """
+    .only() по выбранным полям (плюс extra — например, поле сортировки).
+    Связи из столбцов вида 'user__username' подтягиваются select_related.
+    """
+    columns = needed_columns(serializer_class, fields) | set(extra)
+    relations = {column.split('__')[0] for column in columns if '__' in column}
+    if relations:
+        queryset = queryset.select_related(*relations)
+    return queryset.only(*columns)
+
+
+class SparseFieldsMixin:
+    """Оставляет в сериализаторе только поля из context['fields'], если он задан"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fields = self.context.get('fields')
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
@@ -0,0 +1,77 @@
+"""
+Инвалидация кэша через поколения. Ключи пространства имён (например,
+f'files:{user_id}') хранятся с version=<текущее поколение>; bump() увеличивает
+поколение — старые записи больше не читаются и сами истекают по TTL.
+Поколение лежит в общем кэше, поэтому сброс виден всем воркерам сразу —
+если кэш действительно общий (см. cache_is_shared()).
+"""
+import time
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+
+# Поколение живёт дольше любых записей, которые им помечены
+GENERATION_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def _cache(using):
+    return caches[using]
+
+
+def cache_is_shared(using='default'):
+    """Кэш общий для всех процессов (Redis, БД, файлы), а не память одного процесса"""
+    return not isinstance(caches[using], (LocMemCache, DummyCache))
+
+
+def _generation_key(namespace):
+    return f'gen:{namespace}'
+
+
+def generation(namespace, using='default'):
+    """Текущее поколение пространства имён"""
+    cache = _cache(using)
+    key = _generation_key(namespace)
+    value = cache.get(key)
+    if value is None:
+        # Поколение вытеснено или ещё не заводилось: начинаем с метки времени,
+        # чтобы не совпасть с поколением, под которым могли остаться старые записи
+        cache.add(key, time.time_ns() // 1000, GENERATION_TIMEOUT)
+        value = cache.get(key)
+    return value
+
+
+def bump(namespace, using='default'):
+    """Сбрасывает все записи пространства имён (атомарно для всех воркеров)"""
+    cache = _cache(using)
+    key = _generation_key(namespace)
+    try:
+        return cache.incr(key)
+    except ValueError:
+        # Ключа нет — любое новое поколение отличается от прежних записей
+        generation(namespace, using)
+        return cache.incr(key)
+
+
+def get(namespace, key, default=None, using='default', version=None):
+    """Запись текущего поколения (или переданного version — см. generation())"""
+    version = generation(namespace, using) if version is None else version
+    return _cache(using).get(f'{namespace}:{key}', default, version=version)
+
+
+def set(namespace, key, value, timeout=None, using='default', version=None):
+    """
+    Сохраняет запись. Если поколение прочитано до вычисления value, передайте его
+    в version: иначе данные, посчитанные до bump(), попадут в новое поколение.
+    """
+    version = generation(namespace, using) if version is None else version
+    _cache(using).set(f'{namespace}:{key}', value, timeout, version=version)
+
+
+def get_or_set(namespace, key, compute, timeout=None, using='default'):
+    """Значение из кэша или compute(), сохранённое под поколением, прочитанным до вычисления"""
+    version = generation(namespace, using)
+    value = get(namespace, key, using=using, version=version)
+    if value is None:
+        value = compute()
+        set(namespace, key, value, timeout, using=using, version=version)
+    return value
@@ -0,0 +1,50 @@
+"""
+Построение миниатюр средствами Pillow. Модуль не импортирует Django:
+render() выполняется в отдельных процессах пула (storage/thumbnails.py),
+которые запускаются через spawn и не настраивают Django.
+"""
+from io import BytesIO
+from PIL import Image, ImageOps
+
+# Имя формата в Pillow и параметры сохранения
+SAVE_OPTIONS = {
+    'webp': ('WEBP', {'method': 4}),
+    'jpeg': ('JPEG', {'optimize': True, 'progressive': True}),
+}
+
+
+def _flatten(image):
+    """JPEG без прозрачности: накладываем на белый фон"""
+    background = Image.new('RGB', image.size, (255, 255, 255))
+    background.paste(image, mask=image.getchannel('A'))
+    return background
+
+
+def render(source, sizes, formats, quality, max_pixels):
+    """
+    Миниатюры всех размеров и форматов за одно декодирование исходника.
+    source — путь к файлу или байты; sizes — {имя: сторона в пикселях}.
+    Возвращает {(имя, формат): байты}.
+    """
+    Image.MAX_IMAGE_PIXELS = max_pixels
+    if isinstance(source, bytes):
+        source = BytesIO(source)
+    results = {}
+    with Image.open(source) as image:
+        largest = max(sizes.values())
+        # JPEG декодируется сразу в уменьшенном масштабе (DCT scaling) — в разы быстрее
+        image.draft(None, (largest * 2, largest * 2))
+        image = ImageOps.exif_transpose(image)
+        has_alpha = image.mode in ('RGBA', 'LA', 'PA') or 'transparency' in image.info
+        image = image.convert('RGBA' if has_alpha else 'RGB')
+
+        # От большего размера к меньшему: каждый следующий уменьшается из предыдущего
+        for name, side in sorted(sizes.items(), key=lambda item: -item[1]):
+            image.thumbnail((side, side), Image.Resampling.LANCZOS, reducing_gap=3.0)
+            for fmt in formats:
+                pillow_format, options = SAVE_OPTIONS[fmt]
+                frame = _flatten(image) if has_alpha and fmt == 'jpeg' else image
+                buffer = BytesIO()
+                frame.save(buffer, pillow_format, quality=quality, **options)
+                results[(name, fmt)] = buffer.getvalue()
+    return results
@@ -0,0 +1,207 @@
+"""
+Очередь фоновых задач в БД без внешнего брокера. Задачи — строки Job:
+enqueue() в транзакции представления фиксируется вместе с его изменениями,
+воркеры (manage.py runworker) забирают готовые задачи через
+SELECT ... FOR UPDATE SKIP LOCKED и не мешают друг другу.
+
+Задача захватывается на JOB_LEASE_SECONDS; воркер продлевает аренду, пока
+выполняет её. Если воркер упал, задача по истечении аренды возвращается
+в очередь. Ошибка — повтор с экспоненциальной задержкой, после max_attempts
+попыток задача остаётся в статусе failed.
+"""
+import logging
+import random
+import traceback
+from datetime import timedelta
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Count, F, Min
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Зарегистрированные задачи: имя -> функция(**args)
+TASKS = {}
+
+
+def task(name):
+    """Регистрирует функцию как задачу с именем name (аргументы — JSON-совместимые)"""
+    def decorator(func):
+        TASKS[name] = func
+        return func
+    return decorator
+
+
+def enqueue(name, args=None, *, priority=0, run_at=None, delay=None, unique_key=None, max_attempts=None):
+    """
+    Ставит задачу в очередь и сразу возвращает Job. run_at/delay — отложенный запуск.
+    С unique_key дубликат активной задачи не создаётся (вернётся несохранённый Job).
+    """
+    if name not in TASKS:
+        raise ValueError(f"Неизвестная задача: {name}")
+    if run_at is None:
+        run_at = timezone.now() + timedelta(seconds=delay or 0)
+    job = Job(
+        name=name,
+        args=args or {},
+        priority=priority,
+        run_at=run_at,
+        unique_key=unique_key,
+        max_attempts=max_attempts or settings.JOB_DEFAULT_MAX_ATTEMPTS,
+    )
+    if unique_key is None:
+        job.save()
+    else:
+        Job.objects.bulk_create([job], ignore_conflicts=True)
+    return job
+
+
+def claim(worker_id, limit=1):
+    """Забирает до limit готовых задач (по приоритету, затем по времени запуска)"""
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    with transaction.atomic():
+        ids = list(
+            Job.objects.select_for_update(skip_locked=True)
+            .filter(status=Job.QUEUED, run_at__lte=now)
+            .order_by('-priority', 'run_at', 'id')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            Job.objects.filter(pk__in=ids).update(
+                status=Job.RUNNING,
+                attempts=F('attempts') + 1,
+                locked_by=worker_id,
+                locked_until=now + timedelta(seconds=settings.JOB_LEASE_SECONDS),
+                started_at=now,
+            )
+    return ids
+
+
+def retry_delay(attempts):
+    """Экспоненциальная задержка перед повтором со случайным разбросом ±20%"""
+    delay = min(settings.JOB_RETRY_BASE_DELAY * 2 ** (attempts - 1), settings.JOB_RETRY_MAX_DELAY)
+    return delay * random.uniform(0.8, 1.2)
+
+
+def _finish(job, worker_id, **fields):
+    # Аренда могла истечь и задачу забрал другой воркер — тогда результат не записываем
+    return Job.objects.filter(pk=job.pk, status=Job.RUNNING, locked_by=worker_id).update(
+        locked_by='', locked_until=None, **fields
+    )
+
+
+def run_job(job_id, worker_id):
+    """
+    Выполняет захваченную задачу и записывает результат. Вызывается в потоке
+    или процессе пула runworker. True — задача выполнена успешно.
+    """
+    close_old_connections()
+    try:
+        job = Job.objects.get(pk=job_id)
+        try:
+            func = TASKS[job.name]
+            func(**job.args)
+        except Exception as e:
+            now = timezone.now()
+            error = traceback.format_exc()
+            if job.attempts < job.max_attempts:
+                delay = retry_delay(job.attempts)
+                _finish(job, worker_id, status=Job.QUEUED, last_error=error,
+                        run_at=now + timedelta(seconds=delay))
+                logger.warning(f"Задача {job} упала (попытка {job.attempts}), повтор через {delay:.0f} с: {str(e)}")
+            else:
+                _finish(job, worker_id, status=Job.FAILED, last_error=error, finished_at=now)
+                logger.error(f"Задача {job} не выполнена после {job.attempts} попыток: {str(e)}")
+            return False
+        _finish(job, worker_id, status=Job.DONE, last_error='', finished_at=timezone.now())
+        return True
+    finally:
+        close_old_connections()
+
+
+def heartbeat(worker_id):
+    """Продлевает аренду задач, которые воркер ещё выполняет"""
+    return Job.objects.filter(status=Job.RUNNING, locked_by=worker_id).update(
+        locked_until=timezone.now() + timedelta(seconds=settings.JOB_LEASE_SECONDS)
+    )
+
+
+def requeue_stale():
+    """Задачи упавших воркеров (аренда истекла) — обратно в очередь или в failed"""
+    now = timezone.now()
+    stale = Job.objects.filter(status=Job.RUNNING, locked_until__lt=now)
+    error = "Воркер не завершил задачу до истечения аренды"
+    failed = stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, locked_by='', locked_until=None, finished_at=now, last_error=error
+    )
+    requeued = stale.update(status=Job.QUEUED, locked_by='', locked_until=None, run_at=now, last_error=error)
+    if failed or requeued:
+        logger.warning(f"Задачи с истёкшей арендой: возвращено в очередь {requeued}, отмечено failed {failed}")
+    return requeued + failed
+
+
+def ensure_periodic():
+    """
+    Ставит следующий запуск периодических задач (settings.JOB_PERIODIC), если его
+    ещё нет. Запуск — через interval после предыдущего; несколько воркеров
+    не создадут дубликатов благодаря unique_key.
+    """
+    now = timezone.now()
+    for key, spec in settings.JOB_PERIODIC.items():
+        unique_key = f'periodic:{key}'
+        last = (
+            Job.objects.filter(unique_key=unique_key)
+            .order_by('-run_at').values_list('status', 'run_at').first()
+        )
+        if last is not None and last[0] in (Job.QUEUED, Job.RUNNING):
+            continue
+        run_at = now if last is None else max(now, last[1] + timedelta(seconds=spec['interval']))
+        enqueue(spec['task'], spec.get('args'), priority=spec.get('priority', 0),
+                run_at=run_at, unique_key=unique_key)
+
+
+def run_pending(worker_id='inline', limit=None):
+    """Выполняет готовые задачи в текущем потоке (тесты, разовый запуск). Возвращает их число"""
+    count = 0
+    while limit is None or count < limit:
+        ids = claim(worker_id)
+        if not ids:
+            break
+        run_job(ids[0], worker_id)
+        count += 1
+    return count
+
+
+def purge_finished():
+    """Удаляет выполненные и окончательно упавшие задачи старше JOB_RETENTION_DAYS"""
+    cutoff = timezone.now() - timedelta(days=settings.JOB_RETENTION_DAYS)
+    deleted, _ = Job.objects.filter(status__in=[Job.DONE, Job.FAILED], finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def queue_stats():
+    """Глубина очереди для админки: по статусам и по именам задач"""
+    now = timezone.now()
+    active = Job.objects.filter(status__in=[Job.QUEUED, Job.RUNNING, Job.FAILED])
+    by_name = {}
+    totals = {Job.QUEUED: 0, Job.RUNNING: 0, Job.FAILED: 0}
+    for row in active.values('name', 'status').annotate(count=Count('id')).order_by('name'):
+        by_name.setdefault(row['name'], {}).update({row['status']: row['count']})
+        totals[row['status']] += row['count']
+
+    ready = Job.objects.filter(status=Job.QUEUED, run_at__lte=now)
+    ready_count = ready.count()
+    oldest = ready.aggregate(oldest=Min('run_at'))['oldest']
+    return {
+        'queued': totals[Job.QUEUED],
+        'ready': ready_count,
+        'scheduled': totals[Job.QUEUED] - ready_count,
+        'running': totals[Job.RUNNING],
+        'failed': totals[Job.FAILED],
+        'oldest_ready_seconds': round((now - oldest).total_seconds(), 1) if oldest else 0,
+        'by_name': by_name,
+    }
@@ -0,0 +1,64 @@
+"""
+Кэш ответа списка файлов (FileListView) по пользователю, странице и сортировке.
+Записи помечены поколением f'files:{user_id}' (storage/generations.py):
+любое изменение файлов пользователя сбрасывает весь его кэш списка.
+
+Без общего кэша (LocMemCache у каждого процесса, без REDIS_URL) сброс поколения
+в одном воркере не виден остальным, поэтому кэш и ETag не используются
+и каждый запрос читает список из БД.
+"""
+import hashlib
+from django.conf import settings
+from django.db import transaction
+
+from . import generations
+from .generations import cache_is_shared
+
+
+def namespace(user_id):
+    return f'files:{user_id}'
+
+
+def invalidate(user_ids):
+    """
+    Сбрасывает кэш списков после фиксации транзакции: раньше другой воркер мог бы
+    прочитать ещё старые данные и сохранить их под новым поколением.
+    """
+    for user_id in set(user_ids):
+        transaction.on_commit(lambda user_id=user_id: generations.bump(namespace(user_id)))
+
+
+def _key(request):
+    # Хост входит в ключ: в ответе абсолютные ссылки (next, public_url)
+    params = sorted(request.query_params.lists())
+    return hashlib.sha1(repr((request.get_host(), request.is_secure(), params)).encode()).hexdigest()
+
+
+class FileListCache:
+    """Поколение читается один раз на запрос — до выборки из БД"""
+
+    def __init__(self, request, user_id):
+        self.namespace = namespace(user_id)
+        self.key = _key(request)
+        self.enabled = cache_is_shared()
+        self.version = generations.generation(self.namespace) if self.enabled else None
+
+    def etag(self, media_type):
+        """
+        ETag не требует сериализации: содержимое однозначно задано поколением
+        и параметрами запроса. Формат ответа (JSON/MessagePack) тоже учитывается.
+        None — кэш выключен, ETag не выдаётся.
+        """
+        if not self.enabled:
+            return None
+        digest = hashlib.sha1(f'{self.version}:{self.key}:{media_type}'.encode()).hexdigest()
+        return f'"{digest}"'
+
+    def get(self):
+        if not self.enabled:
+            return None
+        return generations.get(self.namespace, self.key, version=self.version)
+
+    def set(self, data):
+        if self.enabled:
+            generations.set(self.namespace, self.key, data, settings.FILE_LIST_CACHE_TIMEOUT, version=self.version)
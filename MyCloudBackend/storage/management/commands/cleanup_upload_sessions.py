@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from storage.models import UploadSession
+from storage.multipart import remove_parts_dir
+
+
+class Command(BaseCommand):
+    help = "Удаляет просроченные сессии многочастной загрузки вместе с принятыми частями"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Только показать, что будет удалено")
+
+    def handle(self, *args, **options):
+        expired = UploadSession.objects.filter(expires_at__lte=timezone.now())
+        removed = 0
+        for session in expired.iterator():
+            if not options['dry_run']:
+                remove_parts_dir(session.get_parts_dir())
+                session.delete()
+            removed += 1
+        self.stdout.write(self.style.SUCCESS(f"Просроченных сессий: {removed}"))
@@ -0,0 +1,92 @@
+import os
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from storage import blobs
+from storage.models import Blob, File
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит файлы из плоского MEDIA_ROOT/<stored_name> в хранилище blob по SHA-256. "
+        "Повторный запуск продолжает с необработанных файлов."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Сколько записей File читать за раз")
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать, ничего не менять")
+        parser.add_argument(
+            '--recount', action='store_true',
+            help="Пересчитать ref_count по таблице File и удалить blob без ссылок"
+        )
+
+    def handle(self, *args, **options):
+        if options['recount']:
+            self.recount(options['dry_run'])
+            return
+
+        migrated = missing = 0
+        last_id = 0
+        while True:
+            batch = list(
+                File.objects.filter(blob__isnull=True, id__gt=last_id)
+                .order_by('id')
+                .only('id', 'stored_name', 'blob', 'file_path')[:options['batch_size']]
+            )
+            if not batch:
+                break
+            last_id = batch[-1].id
+
+            for file_obj in batch:
+                legacy_path = file_obj.get_file_path()
+                if not os.path.exists(legacy_path):
+                    missing += 1
+                    self.stderr.write(f"Файл не найден на диске: {legacy_path}")
+                    continue
+                if options['dry_run']:
+                    migrated += 1
+                    continue
+                self.migrate_file(file_obj.id, legacy_path)
+                migrated += 1
+
+        verb = "Будет перенесено" if options['dry_run'] else "Перенесено"
+        self.stdout.write(self.style.SUCCESS(f"{verb} файлов: {migrated}, не найдено на диске: {missing}"))
+
+    def migrate_file(self, file_id, legacy_path):
+        sha256, size = blobs.hash_file(legacy_path)
+        # Сначала переименовываем во временный файл: при дубликате store() удалит его,
+        # а при ошибке исходный файл можно восстановить
+        temp_path = blobs.new_temp_path()
+        os.replace(legacy_path, temp_path)
+        try:
+            blobs.prepare(temp_path, sha256)
+            with transaction.atomic():
+                blob = blobs.store(temp_path, sha256, size)
+                File.objects.filter(pk=file_id).update(blob=blob, file_path=blob.current_relative_path())
+        except Exception:
+            if os.path.exists(temp_path):
+                os.replace(temp_path, legacy_path)
+            raise
+
+    def recount(self, dry_run):
+        actual = dict(
+            File.objects.filter(blob__isnull=False)
+            .values_list('blob_id')
+            .annotate(refs=Count('id'))
+        )
+        fixed = 0
+        for blob in Blob.objects.all().iterator():
+            refs = actual.get(blob.sha256, 0)
+            if blob.ref_count != refs:
+                fixed += 1
+                if not dry_run:
+                    Blob.objects.filter(pk=blob.pk).update(ref_count=refs)
+
+        if dry_run:
+            orphaned = sum(1 for sha256 in Blob.objects.values_list('pk', flat=True) if not actual.get(sha256))
+        else:
+            orphaned = blobs.purge_orphans()
+        self.stdout.write(self.style.SUCCESS(
+            f"Исправлено счётчиков: {fixed}, blob без ссылок: {orphaned}"
+        ))
@@ -0,0 +1,45 @@
+import time
+from django.core.management.base import BaseCommand
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.utils import aware_utcnow
+
+
+class Command(BaseCommand):
+    help = (
+        "Удаляет истёкшие refresh-токены из token_blacklist пачками по первичному ключу. "
+        "В отличие от flushexpiredtokens не держит долгую транзакцию и не собирает "
+        "все строки в память. Можно запускать на живом сервисе (например, из cron)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000, help="Сколько строк просматривать за пачку")
+        parser.add_argument('--pause', type=float, default=0, help="Пауза между пачками, секунд")
+        parser.add_argument(
+            '--full', action='store_true',
+            help="Просмотреть всю таблицу (по умолчанию — до первой пачки без истёкших токенов)",
+        )
+
+    def handle(self, *args, **options):
+        now = aware_utcnow()
+        deleted = last_pk = 0
+        while True:
+            # Обход по первичному ключу — индексный просмотр, без индекса на expires_at.
+            # Срок жизни токенов одинаков, поэтому истёкшие лежат в начале таблицы
+            rows = list(
+                OutstandingToken.objects.filter(pk__gt=last_pk).order_by('pk')
+                .values_list('pk', 'expires_at')[:options['batch_size']]
+            )
+            if not rows:
+                break
+            last_pk = rows[-1][0]
+            expired = [pk for pk, expires_at in rows if expires_at <= now]
+            if not expired and not options['full']:
+                break
+            if expired:
+                BlacklistedToken.objects.filter(token_id__in=expired).delete()
+                OutstandingToken.objects.filter(pk__in=expired).delete()
+                deleted += len(expired)
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        self.stdout.write(self.style.SUCCESS(f"Удалено истёкших токенов: {deleted}"))
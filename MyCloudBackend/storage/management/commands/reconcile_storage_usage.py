@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from storage import usage
+from storage.models import File, UserStorageUsage
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        "Сверяет счётчики UserStorageUsage (число файлов и объём) с таблицей File "
+        "и исправляет расхождения. Можно запускать на живом сервисе."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user-id', type=int, help="Сверить только одного пользователя")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Сколько пользователей сверять за пачку")
+        parser.add_argument('--dry-run', action='store_true', help="Только показать расхождения")
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user_id']:
+            users = users.filter(pk=options['user_id'])
+
+        checked = fixed = 0
+        last_pk = 0
+        while True:
+            batch = list(users.filter(pk__gt=last_pk).values_list('pk', flat=True)[:options['batch_size']])
+            if not batch:
+                break
+            last_pk = batch[-1]
+            checked += len(batch)
+
+            # Быстрая сверка пачкой; подозрительных пересчитываем под блокировкой строки
+            for user_id in self.suspects(batch):
+                result = usage.reconcile(user_id, dry_run=options['dry_run'])
+                if result is not None:
+                    fixed += 1
+                    self.stdout.write(f"Пользователь {user_id}: {result[0]} -> {result[1]}")
+
+        verb = "Найдено расхождений" if options['dry_run'] else "Исправлено"
+        self.stdout.write(self.style.SUCCESS(f"Проверено пользователей: {checked}. {verb}: {fixed}"))
+
+    def suspects(self, user_ids):
+        actual = {
+            row['user']: (row['file_count'], row['total_size'] or 0)
+            for row in File.objects.filter(user__in=user_ids).values('user')
+            .annotate(file_count=Count('id'), total_size=Sum('size'))
+        }
+        stored = {
+            row[0]: row[1:]
+            for row in UserStorageUsage.objects.filter(user__in=user_ids)
+            .values_list('user', 'file_count', 'total_size')
+        }
+        return [
+            user_id for user_id in user_ids
+            if stored.get(user_id) != actual.get(user_id, (0, 0))
+        ]
@@ -0,0 +1,94 @@
+import os
+import signal
+import socket
+import threading
+import time
+import django
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from storage import jobs
+
+
+def _init_process():
+    # При запуске через spawn (не Linux) дочерний процесс настраивает Django сам
+    django.setup()
+
+
+class Command(BaseCommand):
+    help = (
+        "Воркер очереди фоновых задач (storage/jobs.py). Несколько воркеров "
+        "на разных машинах не мешают друг другу: задачи забираются через SKIP LOCKED."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=settings.JOB_WORKER_CONCURRENCY,
+            help="Сколько задач выполнять одновременно",
+        )
+        parser.add_argument(
+            '--pool', choices=['thread', 'process'], default='thread',
+            help="thread — для задач, ждущих диск/сеть; process — для задач, нагружающих CPU",
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Пауза при пустой очереди, секунд")
+        parser.add_argument('--burst', action='store_true', help="Выполнить готовые задачи и выйти")
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        concurrency = max(options['concurrency'], 1)
+        stop = threading.Event()
+        # SIGTERM/SIGINT: новые задачи не берём, начатые доводим до конца
+        previous = {
+            signum: signal.signal(signum, lambda *_: stop.set())
+            for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+
+        if options['pool'] == 'process':
+            # Открытые соединения с БД не должны достаться дочерним процессам
+            connections.close_all()
+            executor = ProcessPoolExecutor(concurrency, initializer=_init_process)
+        else:
+            executor = ThreadPoolExecutor(concurrency, thread_name_prefix='job')
+
+        self.stdout.write(f"Воркер {worker_id}: {options['pool']} x {concurrency}")
+        processed = 0
+        running = set()
+        last_maintenance = None
+        try:
+            while not stop.is_set():
+                close_old_connections()
+                now = time.monotonic()
+                if last_maintenance is None or now - last_maintenance >= settings.JOB_MAINTENANCE_INTERVAL:
+                    jobs.heartbeat(worker_id)
+                    jobs.requeue_stale()
+                    if not options['burst']:
+                        jobs.ensure_periodic()
+                    last_maintenance = now
+
+                finished = {future for future in running if future.done()}
+                for future in finished:
+                    processed += 1
+                    if future.exception() is not None:
+                        self.stderr.write(f"Ошибка воркера: {future.exception()}")
+                running -= finished
+
+                claimed = jobs.claim(worker_id, concurrency - len(running))
+                for job_id in claimed:
+                    running.add(executor.submit(jobs.run_job, job_id, worker_id))
+
+                if options['burst'] and not claimed and not running:
+                    break
+                if len(running) >= concurrency or (running and not claimed):
+                    wait(running, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                elif not claimed:
+                    stop.wait(options['poll_interval'])
+        finally:
+            # Начатые задачи доводим до конца; иначе они вернутся в очередь по истечении аренды
+            executor.shutdown(wait=True)
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+        processed += len(running)
+        self.stdout.write(self.style.SUCCESS(f"Воркер {worker_id} остановлен, выполнено задач: {processed}"))
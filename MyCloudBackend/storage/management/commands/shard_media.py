@@ -0,0 +1,125 @@
+import os
+import re
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat
+
+from storage import blobs, paths
+from storage.drivers import get_driver
+from storage.models import Blob, File
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+
+class Command(BaseCommand):
+    help = (
+        "Переносит blob из плоского blobs/<sha256> в blobs/ab/cd/<sha256>. Работает на живом "
+        "сервисе: каждый blob переносится под блокировкой своей строки. Повторный запуск "
+        "продолжает с оставшихся файлов. Старые файлы uploads/<stored_name> без blob эта "
+        "команда не трогает — сначала запустите migrate_to_blobs, она пишет сразу в шарды. "
+        "На время переноса включите BLOB_FLAT_LAYOUT, после — выключите."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help="Сколько файлов переносить за пачку")
+        parser.add_argument('--pause', type=float, default=0, help="Пауза между пачками, секунд")
+        parser.add_argument('--dry-run', action='store_true', help="Только посчитать, ничего не менять")
+
+    def handle(self, *args, **options):
+        if not get_driver().is_local:
+            raise CommandError("Плоская раскладка бывает только у локального хранилища (STORAGE_DRIVER='local')")
+
+        without_blob = File.objects.filter(blob__isnull=True).count()
+        if without_blob:
+            self.stderr.write(self.style.WARNING(
+                f"Файлов без blob: {without_blob}. Их переносит migrate_to_blobs — запустите её до shard_media"
+            ))
+        if not settings.BLOB_FLAT_LAYOUT:
+            self.stderr.write(self.style.WARNING(
+                "BLOB_FLAT_LAYOUT выключен: ещё не перенесённые blob недоступны до конца переноса"
+            ))
+
+        if options['dry_run']:
+            pending = sum(1 for _ in self.flat_blobs())
+            self.stdout.write(self.style.SUCCESS(f"Будет перенесено blob: {pending}"))
+            return
+
+        # Файлы без записи Blob не трогаем и не выбираем повторно
+        self.skipped = set()
+        moved = 0
+        while True:
+            batch = [sha256 for sha256, _ in zip(self.flat_blobs(), range(options['batch_size']))]
+            if not batch:
+                break
+            for sha256 in batch:
+                if self.move(sha256):
+                    moved += 1
+                else:
+                    self.skipped.add(sha256)
+            self.stdout.write(f"Перенесено: {moved}")
+            if options['pause']:
+                time.sleep(options['pause'])
+
+        repaired = self.repair()
+        self.stdout.write(self.style.SUCCESS(
+            f"Перенесено blob: {moved}, без записи в БД (пропущено): {len(self.skipped)}, "
+            f"исправлено путей: {repaired}"
+        ))
+        if not self.skipped and settings.BLOB_FLAT_LAYOUT:
+            self.stdout.write("Плоских blob не осталось, BLOB_FLAT_LAYOUT можно выключить")
+
+    def flat_blobs(self):
+        """Плоские blob, ещё лежащие прямо в blobs/ (подкаталоги шардов пропускаются)"""
+        blob_dir = paths.media_path(paths.BLOB_DIR)
+        if not os.path.isdir(blob_dir):
+            return
+        skipped = getattr(self, 'skipped', set())
+        with os.scandir(blob_dir) as entries:
+            for entry in entries:
+                if entry.is_file() and SHA256_RE.match(entry.name) and entry.name not in skipped:
+                    yield entry.name
+
+    def move(self, sha256):
+        flat_path = paths.media_path(paths.flat_blob_relative_path(sha256))
+        relative_path = paths.blob_relative_path(sha256)
+        sharded_path = paths.media_path(relative_path)
+        moved = False
+        try:
+            with transaction.atomic():
+                # Та же блокировка, что и в blobs.store(): загрузка дубликата ждёт переноса
+                blobs.lock_content(sha256)
+                if not Blob.objects.select_for_update().filter(pk=sha256).exists():
+                    self.stderr.write(f"Нет записи Blob для {flat_path}, файл оставлен на месте")
+                    return False
+                File.objects.filter(blob_id=sha256).update(file_path=relative_path)
+                os.makedirs(os.path.dirname(sharded_path), exist_ok=True)
+                os.replace(flat_path, sharded_path)
+                moved = True
+        except Exception:
+            if moved and os.path.exists(sharded_path):
+                os.replace(sharded_path, flat_path)
+            raise
+        return True
+
+    def repair(self):
+        """
+        Если процесс упал между переносом файла и коммитом, file_path остался плоским,
+        а файл уже в шарде — дописываем пути.
+        """
+        repaired = 0
+        stale = (
+            File.objects.filter(blob__isnull=False, file_path=Concat(Value(paths.BLOB_DIR + '/'), F('blob_id')))
+            .values_list('blob_id', flat=True)
+            .distinct()
+        )
+        for sha256 in list(stale):
+            if os.path.exists(paths.media_path(paths.flat_blob_relative_path(sha256))):
+                continue
+            if os.path.exists(paths.media_path(paths.blob_relative_path(sha256))):
+                repaired += File.objects.filter(blob_id=sha256).update(
+                    file_path=paths.blob_relative_path(sha256)
+                )
+        return repaired
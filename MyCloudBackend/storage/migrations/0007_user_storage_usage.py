@@ -0,0 +1,48 @@
+# Generated by Django 5.2.4 on 2026-10-18 06:55
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def fill_usage(apps, schema_editor):
+    """Начальные счётчики для уже существующих пользователей"""
+    File = apps.get_model('storage', 'File')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    UserStorageUsage = apps.get_model('storage', 'UserStorageUsage')
+    totals = {
+        row['user']: row
+        for row in File.objects.values('user').annotate(file_count=Count('id'), total_size=Sum('size'))
+    }
+    UserStorageUsage.objects.bulk_create(
+        (
+            UserStorageUsage(
+                user_id=user_id,
+                file_count=totals.get(user_id, {}).get('file_count', 0),
+                total_size=totals.get(user_id, {}).get('total_size') or 0,
+            )
+            for user_id in User.objects.values_list('pk', flat=True).iterator()
+        ),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('storage', '0006_file_composite_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserStorageUsage',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='storage_usage', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('file_count', models.IntegerField(default=0)),
+                ('total_size', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(fill_usage, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0008_job'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='UserPurge',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('deleted_user_id', models.IntegerField(db_index=True)),
+                ('username', models.CharField(max_length=150)),
+                ('requested_by', models.CharField(blank=True, max_length=150)),
+                ('status', models.CharField(choices=[('pending', 'Ожидает'), ('running', 'Выполняется'), ('done', 'Завершено')], default='pending', max_length=10)),
+                ('total_files', models.IntegerField(default=0)),
+                ('removed_files', models.IntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('finished_at', models.DateTimeField(blank=True, null=True)),
+                ('user', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='purge', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.4 on 2026-10-18 07:38
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0009_userpurge'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Thumbnail',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('size', models.CharField(max_length=10)),
+                ('format', models.CharField(max_length=10)),
+                ('bytes', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('accessed_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('blob', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='thumbnails', to='storage.blob')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['accessed_at'], name='thumbnail_accessed_idx')],
+                'constraints': [models.UniqueConstraint(fields=('blob', 'size', 'format'), name='thumbnail_unique')],
+            },
+        ),
+    ]
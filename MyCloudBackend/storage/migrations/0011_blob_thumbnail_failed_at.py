@@ -0,0 +1,18 @@
+# Generated by Django 5.2.4 on 2026-10-18 08:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('storage', '0010_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blob',
+            name='thumbnail_failed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
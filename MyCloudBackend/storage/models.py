@@ -1,13 +1,55 @@
+from django.conf import settings
 from django.contrib.auth.models import User
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 import uuid
 import mimetypes
-from django.conf import settings
 import os
 
+from . import paths
+
+
+class Blob(models.Model):
+    """Содержимое файла, адресуемое по SHA-256. Один blob может разделяться несколькими File"""
+    sha256 = models.CharField(max_length=64, primary_key=True)
+    size = models.BigIntegerField()
+    ref_count = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    # Pillow не смог прочитать содержимое (storage/thumbnails.py): до истечения
+    # THUMBNAIL_FAILURE_TIMEOUT миниатюры не строятся
+    thumbnail_failed_at = models.DateTimeField(null=True, blank=True)
+
+    @property
+    def relative_path(self):
+        return paths.blob_relative_path(self.sha256)
+
+    def current_relative_path(self):
+        """
+        Где файл лежит сейчас. Пока shard_media не закончила перенос
+        (BLOB_FLAT_LAYOUT = True), blob может быть ещё в плоском blobs/<sha256>;
+        после переноса диск не проверяется.
+        """
+        if not settings.BLOB_FLAT_LAYOUT:
+            return self.relative_path
+        from .drivers import get_driver
+        storage = get_driver()
+        flat_path = paths.flat_blob_relative_path(self.sha256)
+        # Плоская раскладка бывает только на локальном диске
+        if storage.is_local and storage.exists(flat_path):
+            return flat_path
+        return self.relative_path
+
+    def get_path(self):
+        return paths.media_path(self.current_relative_path())
+
+    def __str__(self):
+        return f"{self.sha256} ({self.ref_count} refs)"
+
 
 class File(models.Model):
-    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    # Отдельный индекс по user_id не нужен: его заменяют составные индексы ниже
+    user = models.ForeignKey(User, on_delete=models.CASCADE, db_index=False)
     original_name = models.CharField(max_length=255)
     stored_name = models.CharField(max_length=255, unique=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -21,12 +63,23 @@ class File(models.Model):
         unique=True
     )
     file_path = models.CharField(max_length=255)
+    blob = models.ForeignKey(Blob, on_delete=models.PROTECT, null=True, blank=True, related_name='files')
 
     # Дополнительные поля согласно требованиям
     mime_type = models.CharField(max_length=100, blank=True)
     download_count = models.IntegerField(default=0)
     is_public = models.BooleanField(default=False)
 
+    class Meta:
+        indexes = [
+            # Список файлов пользователя: фильтр по user и keyset-сортировка (поле, id)
+            # в обе стороны без отдельной сортировки
+            models.Index(fields=['user', 'uploaded_at', 'id'], name='file_user_uploaded_idx'),
+            models.Index(fields=['user', 'original_name', 'id'], name='file_user_name_idx'),
+            # Покрывает и Sum/Count по size для статистики пользователя (index-only scan)
+            models.Index(fields=['user', 'size', 'id'], name='file_user_size_idx'),
+        ]
+
     def save(self, *args, **kwargs):
         if not self.public_link:
             self.public_link = uuid.uuid4().hex
@@ -35,10 +88,180 @@ class File(models.Model):
         super().save(*args, **kwargs)
 
     def get_file_path(self):
-        return os.path.join(settings.MEDIA_ROOT, self.file_path)
+        """Физический путь к содержимому: общий blob или (для старых файлов) MEDIA_ROOT/stored_name"""
+        return paths.resolve(self)
 
     def get_public_url(self):
         return f"/api/files/public/{self.public_link}/"
 
     def __str__(self):
         return f"{self.original_name} ({self.user.username})"
+
+
+class UserStorageUsage(models.Model):
+    """
+    Число файлов и занятый объём пользователя. Меняется в той же транзакции,
+    что и записи File (см. storage/usage.py), сверяется командой reconcile_storage_usage.
+    """
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='storage_usage')
+    file_count = models.IntegerField(default=0)
+    total_size = models.BigIntegerField(default=0)
+
+    def __str__(self):
+        return f"{self.user_id}: {self.file_count} файлов, {self.total_size} bytes"
+
+
+class UploadSession(models.Model):
+    """Сессия многочастной (возобновляемой) загрузки файла"""
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='upload_sessions')
+    original_name = models.CharField(max_length=255)
+    total_size = models.BigIntegerField()
+    part_size = models.BigIntegerField()
+    comment = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    @property
+    def part_count(self):
+        return max(1, -(-self.total_size // self.part_size))
+
+    def expected_part_size(self, number):
+        """Ожидаемый размер части: все части полные, кроме последней"""
+        if number < self.part_count:
+            return self.part_size
+        return self.total_size - self.part_size * (self.part_count - 1)
+
+    def get_parts_dir(self):
+        return paths.media_path(os.path.join('.parts', self.id.hex))
+
+    def get_part_path(self, number):
+        return os.path.join(self.get_parts_dir(), f"{number:05d}.part")
+
+    def __str__(self):
+        return f"{self.original_name} ({self.user.username}, {self.id.hex})"
+
+
+class UploadPart(models.Model):
+    """Принятая часть многочастной загрузки"""
+    session = models.ForeignKey(UploadSession, on_delete=models.CASCADE, related_name='parts')
+    number = models.PositiveIntegerField()
+    size = models.BigIntegerField()
+    received_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('session', 'number')
+        ordering = ['number']
+
+    def __str__(self):
+        return f"{self.session_id.hex} #{self.number}"
+
+
+class Job(models.Model):
+    """
+    Фоновая задача (storage/jobs.py). Выполняется командой runworker;
+    поставленная в транзакции задача видна воркерам только после её фиксации.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'В очереди'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Выполнена'),
+        (FAILED, 'Ошибка'),
+    ]
+
+    name = models.CharField(max_length=100)
+    args = models.JSONField(default=dict, blank=True)
+    # Больше — раньше
+    priority = models.SmallIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    run_at = models.DateTimeField(default=timezone.now)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=5)
+    # Не больше одной активной задачи с таким ключом (периодические задачи, дедупликация)
+    unique_key = models.CharField(max_length=200, null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Выборка готовых задач воркером: только строки в очереди, уже в порядке выдачи
+            models.Index(
+                fields=['-priority', 'run_at', 'id'], condition=Q(status='queued'), name='job_queued_idx'
+            ),
+            # Поиск задач упавших воркеров (истёкшая аренда)
+            models.Index(fields=['locked_until'], condition=Q(status='running'), name='job_lease_idx'),
+            models.Index(fields=['status', 'finished_at'], name='job_finished_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['unique_key'], condition=Q(status__in=['queued', 'running']), name='job_unique_active'
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+
+class UserPurge(models.Model):
+    """
+    Отложенное удаление пользователя (storage/deletion.py). Запись создаётся
+    в запросе администратора, файлы и сама учётная запись удаляются фоновыми
+    задачами пачками; после удаления пользователя запись остаётся как отчёт.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    STATUS_CHOICES = [
+        (PENDING, 'Ожидает'),
+        (RUNNING, 'Выполняется'),
+        (DONE, 'Завершено'),
+    ]
+
+    user = models.OneToOneField(
+        User, null=True, blank=True, on_delete=models.SET_NULL, related_name='purge'
+    )
+    # id и имя сохраняются после удаления пользователя
+    deleted_user_id = models.IntegerField(db_index=True)
+    username = models.CharField(max_length=150)
+    requested_by = models.CharField(max_length=150, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    total_files = models.IntegerField(default=0)
+    removed_files = models.IntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return f"Удаление {self.username} ({self.status})"
+
+
+class Thumbnail(models.Model):
+    """
+    Миниатюра содержимого blob (storage/thumbnails.py) — одна на размер и формат,
+    общая для всех File с этим blob. accessed_at — для вытеснения давно не
+    запрашиваемых при превышении THUMBNAIL_CACHE_MAX_BYTES.
+    """
+    blob = models.ForeignKey(Blob, on_delete=models.CASCADE, related_name='thumbnails')
+    size = models.CharField(max_length=10)
+    format = models.CharField(max_length=10)
+    bytes = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    accessed_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['blob', 'size', 'format'], name='thumbnail_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['accessed_at'], name='thumbnail_accessed_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.blob_id} {self.size}.{self.format}"
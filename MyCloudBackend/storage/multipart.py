@@ -0,0 +1,103 @@
+import os
+import shutil
+import logging
+import tempfile
+
+logger = logging.getLogger(__name__)
+
+# Размер блока при чтении тела запроса
+STREAM_CHUNK_SIZE = 64 * 1024
+
+
+class PartSizeError(Exception):
+    """Размер принятой части не совпадает с ожидаемым"""
+
+
+def write_part(stream, path, expected_size):
+    """
+    Потоково записывает часть из тела запроса во временный файл и атомарно
+    переименовывает его. Лишние байты прерывают запись сразу, не дожидаясь конца тела.
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Уникальное имя: одну и ту же часть могут одновременно писать потоки одного процесса
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=os.path.basename(path) + '.', suffix='.tmp')
+    written = 0
+    try:
+        with os.fdopen(fd, 'wb') as destination:
+            while True:
+                chunk = stream.read(STREAM_CHUNK_SIZE)
+                if not chunk:
+                    break
+                written += len(chunk)
+                if written > expected_size:
+                    raise PartSizeError(f"part exceeds {expected_size} bytes")
+                destination.write(chunk)
+        if written != expected_size:
+            raise PartSizeError(f"expected {expected_size} bytes, got {written}")
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+def _copy_range(src_fd, dst_fd, count):
+    """
+    Копирует count байт средствами ядра: copy_file_range (reflink на XFS/Btrfs),
+    затем sendfile, и только в крайнем случае через буфер в Python.
+    """
+    copy_file_range = getattr(os, 'copy_file_range', None)
+    if copy_file_range is not None:
+        try:
+            while count > 0:
+                copied = copy_file_range(src_fd, dst_fd, count)
+                if copied == 0:
+                    break
+                count -= copied
+            return count
+        except OSError:
+            pass
+    sendfile = getattr(os, 'sendfile', None)
+    if sendfile is not None:
+        try:
+            offset = os.lseek(src_fd, 0, os.SEEK_CUR)
+            while count > 0:
+                sent = sendfile(dst_fd, src_fd, offset, count)
+                if sent == 0:
+                    break
+                offset += sent
+                count -= sent
+            return count
+        except OSError:
+            pass
+    return count
+
+
+def assemble_parts(part_paths, destination_path):
+    """Склеивает части в итоговый файл, возвращает его размер"""
+    total = 0
+    with open(destination_path, 'wb', buffering=0) as destination:
+        for part_path in part_paths:
+            with open(part_path, 'rb') as source:
+                size = os.fstat(source.fileno()).st_size
+                remaining = _copy_range(source.fileno(), destination.fileno(), size)
+                if remaining:
+                    # Ядро не смогло скопировать (например, другая ФС) — докопируем остаток
+                    source.seek(size - remaining)
+                    os.lseek(destination.fileno(), 0, os.SEEK_END)
+                    shutil.copyfileobj(source, destination, STREAM_CHUNK_SIZE)
+                total += size
+    return total
+
+
+def remove_parts_dir(path):
+    """Удаляет каталог с частями, ошибки только логируются"""
+    try:
+        shutil.rmtree(path)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        logger.warning(f"Не удалось удалить каталог частей {path}: {str(e)}")
@@ -0,0 +1,121 @@
+import json
+import base64
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.utils.urls import replace_query_param
+
+
+class PaginationError(Exception):
+    """Некорректный курсор, сортировка или размер страницы"""
+
+    def __init__(self, message, code):
+        super().__init__(message)
+        self.message = message
+        self.code = code
+
+
+class KeysetPagination:
+    """
+    Постраничная выдача по курсору (keyset): страница выбирается условием
+    (поле, id) > (значение, id) по индексу, а не OFFSET, поэтому стоимость
+    не зависит от глубины. Сортировка — только по полям из ordering_fields,
+    при равенстве значений порядок задаёт id.
+    """
+    ordering_fields = ('uploaded_at', 'original_name', 'size')
+    default_ordering = '-uploaded_at'
+    max_page_size = 200
+    cursor_param = 'cursor'
+    page_size_param = 'page_size'
+
+    def __init__(self, request):
+        self.request = request
+        self.ordering = request.query_params.get('ordering') or self.default_ordering
+        self.field = self.ordering.lstrip('-')
+        self.descending = self.ordering.startswith('-')
+        if self.field not in self.ordering_fields:
+            raise PaginationError(
+                f"Сортировка возможна по полям: {', '.join(self.ordering_fields)}",
+                'INVALID_ORDERING'
+            )
+        self.page_size = self._page_size()
+        self.cursor = self._decode(request.query_params.get(self.cursor_param))
+        self.next_cursor = self.previous_cursor = None
+
+    def _page_size(self):
+        value = self.request.query_params.get(self.page_size_param)
+        if not value:
+            return settings.REST_FRAMEWORK.get('PAGE_SIZE', 50)
+        try:
+            size = int(value)
+        except ValueError:
+            raise PaginationError("Некорректный размер страницы", 'INVALID_PAGE_SIZE')
+        if size < 1:
+            raise PaginationError("Некорректный размер страницы", 'INVALID_PAGE_SIZE')
+        return min(size, self.max_page_size)
+
+    def _decode(self, raw):
+        if not raw:
+            return None
+        try:
+            data = json.loads(base64.urlsafe_b64decode(raw.encode('ascii')))
+            value, pk, reverse = data['v'], int(data['id']), bool(data['r'])
+            if data['o'] != self.ordering:
+                raise ValueError('ordering changed')
+            if self.field == 'uploaded_at':
+                value = datetime.fromisoformat(value)
+            elif self.field == 'size':
+                value = int(value)
+            elif not isinstance(value, str):
+                raise ValueError('bad value')
+        except (ValueError, TypeError, KeyError, UnicodeEncodeError, json.JSONDecodeError):
+            raise PaginationError("Некорректный курсор", 'INVALID_CURSOR')
+        return value, pk, reverse
+
+    def _encode(self, obj, reverse):
+        value = getattr(obj, self.field)
+        if isinstance(value, datetime):
+            value = value.isoformat()
+        data = {'o': self.ordering, 'v': value, 'id': obj.pk, 'r': reverse}
+        return base64.urlsafe_b64encode(json.dumps(data, separators=(',', ':')).encode()).decode('ascii')
+
+    def paginate(self, queryset):
+        """Записи текущей страницы в порядке сортировки"""
+        reverse = bool(self.cursor and self.cursor[2])
+        # Назад по списку — та же выборка в обратном порядке
+        descending = self.descending != reverse
+        prefix = '-' if descending else ''
+        queryset = queryset.order_by(f'{prefix}{self.field}', f'{prefix}id')
+
+        if self.cursor:
+            value, pk, _ = self.cursor
+            op = 'lt' if descending else 'gt'
+            # Первое условие — диапазон по индексу, второе отсекает уже выданное при равных значениях
+            queryset = queryset.filter(**{f'{self.field}__{op}e': value}).filter(
+                Q(**{f'{self.field}__{op}': value}) | Q(**{f'id__{op}': pk})
+            )
+
+        rows = list(queryset[:self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+
+        if rows:
+            if has_more or reverse:
+                self.next_cursor = self._encode(rows[-1], reverse=False)
+            if self.cursor and (has_more or not reverse):
+                self.previous_cursor = self._encode(rows[0], reverse=True)
+        return rows
+
+    def _link(self, cursor):
+        if cursor is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_param, cursor)
+
+    def get_next_link(self):
+        return self._link(self.next_cursor)
+
+    def get_previous_link(self):
+        return self._link(self.previous_cursor)
@@ -0,0 +1,53 @@
+import os
+from django.conf import settings
+
+# Содержимое раскладывается по подкаталогам ab/cd/ — в одном каталоге не больше
+# нескольких тысяч записей даже при миллионах файлов
+BLOB_DIR = 'blobs'
+SHARD_LEVELS = 2
+SHARD_WIDTH = 2
+
+
+def shard(name):
+    """'abcdef…' -> 'ab/cd/abcdef…'. name — hex-хэш, поэтому каталоги заполняются равномерно"""
+    parts = [name[i * SHARD_WIDTH:(i + 1) * SHARD_WIDTH] for i in range(SHARD_LEVELS)]
+    return os.path.join(*parts, name)
+
+
+def blob_relative_path(sha256):
+    """Путь blob относительно MEDIA_ROOT: blobs/ab/cd/<sha256>"""
+    return os.path.join(BLOB_DIR, shard(sha256))
+
+
+def flat_blob_relative_path(sha256):
+    """Прежний плоский путь blobs/<sha256> — до миграции командой shard_media (см. BLOB_FLAT_LAYOUT)"""
+    return os.path.join(BLOB_DIR, sha256)
+
+
+def media_path(relative_path):
+    return os.path.join(settings.MEDIA_ROOT, relative_path)
+
+
+def file_relative_path(file_obj):
+    """
+    Путь содержимого записи File относительно MEDIA_ROOT. Для blob — сохранённый
+    в file_path (его обновляет shard_media при переносе), для старых файлов без
+    blob — плоский MEDIA_ROOT/<stored_name>.
+    """
+    if file_obj.blob_id:
+        return file_obj.file_path or blob_relative_path(file_obj.blob_id)
+    return file_obj.stored_name
+
+
+def resolve(file_obj):
+    """Абсолютный путь к содержимому записи File — единственное место, где он вычисляется"""
+    return media_path(file_relative_path(file_obj))
+
+
+THUMBNAIL_DIR = 'thumbs'
+THUMBNAIL_EXTENSIONS = {'webp': 'webp', 'jpeg': 'jpg'}
+
+
+def thumbnail_relative_path(sha256, size, fmt):
+    """Миниатюра blob: thumbs/ab/cd/<sha256>/<size>.<ext> — общая для всех его копий"""
+    return os.path.join(THUMBNAIL_DIR, shard(sha256), f'{size}.{THUMBNAIL_EXTENSIONS[fmt]}')
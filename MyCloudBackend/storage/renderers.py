@@ -0,0 +1,58 @@
+import msgpack
+import orjson
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Даты отдаются кодировщику DRF — формат тот же, что у стандартного JSONRenderer
+JSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+_drf_encoder = JSONEncoder()
+
+
+def _default(value):
+    """Типы, которых нет в orjson/msgpack (Decimal, ленивые строки, даты), — как в DRF"""
+    return _drf_encoder.default(value)
+
+
+def dumps(data, option=JSON_OPTIONS):
+    """JSON в байтах: компактно, без экранирования кириллицы"""
+    return orjson.dumps(data, default=_default, option=option)
+
+
+class ORJSONRenderer(JSONRenderer):
+    """JSONRenderer на orjson: тот же вывод, кодирование в разы быстрее"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        option = JSON_OPTIONS
+        # orjson умеет только отступ в 2 пробела
+        if self.get_indent(accepted_media_type or '', renderer_context or {}):
+            option |= orjson.OPT_INDENT_2
+        return dumps(data, option)
+
+
+class MessagePackRenderer(BaseRenderer):
+    """application/msgpack для нативного клиента синхронизации (по заголовку Accept)"""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
+
+
+class MessagePackParser(BaseParser):
+    """Тело запроса в MessagePack (Content-Type: application/msgpack)"""
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError, msgpack.ExtraData, msgpack.FormatError, msgpack.StackError) as e:
+            raise ParseError(f"Ошибка разбора MessagePack: {str(e)}")
@@ -1,10 +1,16 @@
+import os
 import re
 from rest_framework import serializers
-from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.exceptions import AuthenticationFailed
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
 from django.contrib.auth import get_user_model
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import prefetch_related_objects
 from .models import File
+from .fieldsets import SparseFieldsMixin
+from .tokens import VERSION_CLAIM, StorageRefreshToken, token_version, user_claims
 
 # Подключаем модель пользователя (стандартная или кастомная)
 User = get_user_model()
@@ -14,6 +20,7 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
     """
     Кастомный сериализатор для включения данных пользователя в ответ при логине
     """
+    token_class = StorageRefreshToken
     
     def validate(self, attrs):
         data = super().validate(attrs)
@@ -38,8 +45,140 @@ class CustomTokenObtainPairSerializer(TokenObtainPairSerializer):
         
         return data
 
+# ==== Обновление токенов со свежими claims пользователя ====
+class StorageTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    При обновлении claims (права, активность) перечитываются из БД, поэтому
+    новые права попадают в токены не позже чем через один refresh.
+    После смены пароля старые refresh-токены не принимаются.
+    """
+    token_class = StorageRefreshToken
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs['refresh'])
+        user = User.objects.filter(pk=refresh.payload.get(api_settings.USER_ID_CLAIM)).first()
+        if user is None or not user.is_active:
+            raise AuthenticationFailed(self.error_messages['no_active_account'], 'no_active_account')
+        if VERSION_CLAIM in refresh.payload and refresh[VERSION_CLAIM] != token_version(user):
+            raise AuthenticationFailed("Токен отозван", 'token_revoked')
+        for claim, value in user_claims(user).items():
+            refresh[claim] = value
+
+        data = {'access': str(refresh.access_token)}
+        if api_settings.ROTATE_REFRESH_TOKENS:
+            if api_settings.BLACKLIST_AFTER_ROTATION:
+                refresh.blacklist()
+            refresh.set_jti()
+            refresh.set_exp()
+            refresh.set_iat()
+            refresh.outstand()
+            data['refresh'] = str(refresh)
+        return data
+
 # ==== Улучшенный сериализатор для файлов ====
-class FileSerializer(serializers.ModelSerializer):
+# Таблицы строятся один раз при импорте, а не на каждую запись
+FILE_TYPE_MAPPING = {
+    '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.gif': 'image',
+    '.bmp': 'image', '.svg': 'image', '.webp': 'image', '.ico': 'image',
+    '.pdf': 'document', '.doc': 'document', '.docx': 'document',
+    '.txt': 'document', '.rtf': 'document', '.odt': 'document',
+    '.md': 'document', '.tex': 'document',
+    '.xls': 'spreadsheet', '.xlsx': 'spreadsheet', '.csv': 'spreadsheet',
+    '.ods': 'spreadsheet',
+    '.ppt': 'presentation', '.pptx': 'presentation', '.odp': 'presentation',
+    '.mp4': 'video', '.avi': 'video', '.mkv': 'video', '.mov': 'video',
+    '.wmv': 'video', '.flv': 'video', '.webm': 'video', '.m4v': 'video',
+    '.mp3': 'audio', '.wav': 'audio', '.flac': 'audio', '.aac': 'audio',
+    '.ogg': 'audio', '.wma': 'audio', '.m4a': 'audio',
+    '.zip': 'archive', '.rar': 'archive', '.7z': 'archive', '.tar': 'archive',
+    '.gz': 'archive', '.bz2': 'archive', '.xz': 'archive',
+    '.py': 'code', '.js': 'code', '.html': 'code', '.css': 'code',
+    '.json': 'code', '.xml': 'code', '.sql': 'code', '.php': 'code',
+    '.java': 'code', '.cpp': 'code', '.c': 'code', '.h': 'code',
+    '.exe': 'executable', '.msi': 'executable', '.deb': 'executable',
+    '.rpm': 'executable', '.dmg': 'executable', '.pkg': 'executable',
+}
+PREVIEWABLE_TYPES = frozenset(['image', 'document', 'code'])
+PREVIEW_MAX_SIZE = 10 * 1024 * 1024  # До 10MB
+PUBLIC_DOWNLOAD_PATH = '/api/files/download/public/'
+USER_FIELDS = frozenset(['user_username', 'user_full_name'])
+
+
+def file_type_for(name):
+    """Тип файла по расширению"""
+    return FILE_TYPE_MAPPING.get(os.path.splitext(name.lower())[1], 'file')
+
+
+def format_size(size):
+    """Размер в читаемом виде"""
+    if size < 1024:
+        return f"{size} B"
+    elif size < 1024 * 1024:
+        return f"{size / 1024:.1f} KB"
+    elif size < 1024 * 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    else:
+        return f"{size / (1024 * 1024 * 1024):.1f} GB"
+
+
+class FileListSerializer(serializers.ListSerializer):
+    """
+    Быстрый путь для списков: словари собираются напрямую, без обхода полей DRF
+    на каждую запись. Результат совпадает с FileSerializer.to_representation.
+    Запросы к БД — только выборка самого queryset (user подтягивается select_related).
+    Считаются только поля, оставленные в self.child (см. SparseFieldsMixin).
+    """
+
+    def to_representation(self, data):
+        # upload_date у модели нет — DRF его пропускает, пропускаем и здесь
+        names = [name for name in self.child.fields if name != 'upload_date']
+        with_user = not USER_FIELDS.isdisjoint(names)
+
+        if hasattr(data, 'all'):
+            files = data.all()
+            if with_user and not files.query.select_related:
+                files = files.select_related('user')
+        else:
+            # Уже выбранная страница: владельцы догружаются одним запросом
+            files = list(data)
+            if with_user:
+                prefetch_related_objects(files, 'user')
+
+        request = self.context.get('request')
+        public_base = None
+        if 'public_url' in names:
+            public_base = request.build_absolute_uri(PUBLIC_DOWNLOAD_PATH) if request else PUBLIC_DOWNLOAD_PATH
+        format_datetime = self.child.fields['last_download'].to_representation if 'last_download' in names else None
+        user_names = {}
+
+        def names_of(user):
+            cached = user_names.get(user.pk)
+            if cached is None:
+                cached = user_names[user.pk] = (user.username, user.get_full_name() or user.username)
+            return cached
+
+        getters = {
+            'id': lambda obj: obj.pk,
+            'original_name': lambda obj: obj.original_name,
+            'stored_name': lambda obj: obj.stored_name,
+            'size': lambda obj: obj.size,
+            'formatted_size': lambda obj: format_size(obj.size),
+            'file_type': lambda obj: file_type_for(obj.original_name),
+            'can_preview': lambda obj: (
+                file_type_for(obj.original_name) in PREVIEWABLE_TYPES and obj.size < PREVIEW_MAX_SIZE
+            ),
+            'comment': lambda obj: obj.comment,
+            'last_download': lambda obj: format_datetime(obj.last_download) if obj.last_download else None,
+            'public_url': lambda obj: f'{public_base}{obj.public_link}/',
+            'user_id': lambda obj: obj.user_id,
+            'user_username': lambda obj: names_of(obj.user)[0],
+            'user_full_name': lambda obj: names_of(obj.user)[1],
+        }
+        row = [(name, getters[name]) for name in names]
+        return [{name: getter(obj) for name, getter in row} for obj in files]
+
+
+class FileSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     upload_date = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True)
     last_download = serializers.DateTimeField(format="%Y-%m-%d %H:%M:%S", read_only=True, allow_null=True)
     public_url = serializers.SerializerMethodField()
@@ -52,6 +191,7 @@ class FileSerializer(serializers.ModelSerializer):
     
     class Meta:
         model = File
+        list_serializer_class = FileListSerializer
         fields = [
             'id',
             'original_name',
@@ -69,6 +209,22 @@ class FileSerializer(serializers.ModelSerializer):
             'user_full_name'
         ]
         read_only_fields = ['stored_name', 'public_link', 'user_id', 'user_username', 'user_full_name']
+        # Столбцы File, нужные каждому полю (для .only() при ?fields=)
+        field_columns = {
+            'id': ['id'],
+            'original_name': ['original_name'],
+            'stored_name': ['stored_name'],
+            'size': ['size'],
+            'formatted_size': ['size'],
+            'file_type': ['original_name'],
+            'can_preview': ['original_name', 'size'],
+            'comment': ['comment'],
+            'last_download': ['last_download'],
+            'public_url': ['public_link'],
+            'user_id': ['user'],
+            'user_username': ['user', 'user__username'],
+            'user_full_name': ['user', 'user__username', 'user__first_name', 'user__last_name'],
+        }
     
     def get_user_full_name(self, obj):
         """Получаем полное имя пользователя, загрузившего файл"""
@@ -76,7 +232,7 @@ class FileSerializer(serializers.ModelSerializer):
     
     def get_public_url(self, obj):
         """Генерируем полный URL для публичной ссылки"""
-        path = f'/api/files/download/public/{obj.public_link}/'
+        path = f'{PUBLIC_DOWNLOAD_PATH}{obj.public_link}/'
         request = self.context.get('request')
         if request:
             return request.build_absolute_uri(path)
@@ -84,48 +240,15 @@ class FileSerializer(serializers.ModelSerializer):
 
     def get_formatted_size(self, obj):
         """Форматируем размер файла в читаемом виде"""
-        size = obj.size
-        if size < 1024:
-            return f"{size} B"
-        elif size < 1024 * 1024:
-            return f"{size / 1024:.1f} KB"
-        elif size < 1024 * 1024 * 1024:
-            return f"{size / (1024 * 1024):.1f} MB"
-        else:
-            return f"{size / (1024 * 1024 * 1024):.1f} GB"
+        return format_size(obj.size)
 
     def get_file_type(self, obj):
         """Определяем тип файла по расширению"""
-        import os
-        _, ext = os.path.splitext(obj.original_name.lower())
-        type_mapping = {
-            '.jpg': 'image', '.jpeg': 'image', '.png': 'image', '.gif': 'image',
-            '.bmp': 'image', '.svg': 'image', '.webp': 'image', '.ico': 'image',
-            '.pdf': 'document', '.doc': 'document', '.docx': 'document',
-            '.txt': 'document', '.rtf': 'document', '.odt': 'document',
-            '.md': 'document', '.tex': 'document',
-            '.xls': 'spreadsheet', '.xlsx': 'spreadsheet', '.csv': 'spreadsheet',
-            '.ods': 'spreadsheet',
-            '.ppt': 'presentation', '.pptx': 'presentation', '.odp': 'presentation',
-            '.mp4': 'video', '.avi': 'video', '.mkv': 'video', '.mov': 'video',
-            '.wmv': 'video', '.flv': 'video', '.webm': 'video', '.m4v': 'video',
-            '.mp3': 'audio', '.wav': 'audio', '.flac': 'audio', '.aac': 'audio',
-            '.ogg': 'audio', '.wma': 'audio', '.m4a': 'audio',
-            '.zip': 'archive', '.rar': 'archive', '.7z': 'archive', '.tar': 'archive',
-            '.gz': 'archive', '.bz2': 'archive', '.xz': 'archive',
-            '.py': 'code', '.js': 'code', '.html': 'code', '.css': 'code',
-            '.json': 'code', '.xml': 'code', '.sql': 'code', '.php': 'code',
-            '.java': 'code', '.cpp': 'code', '.c': 'code', '.h': 'code',
-            '.exe': 'executable', '.msi': 'executable', '.deb': 'executable',
-            '.rpm': 'executable', '.dmg': 'executable', '.pkg': 'executable',
-        }
-        return type_mapping.get(ext, 'file')
+        return file_type_for(obj.original_name)
     
     def get_can_preview(self, obj):
         """Определяем можно ли предварительно просматривать файл"""
-        file_type = self.get_file_type(obj)
-        previewable_types = ['image', 'document', 'code']
-        return file_type in previewable_types and obj.size < 10 * 1024 * 1024  # До 10MB
+        return self.get_file_type(obj) in PREVIEWABLE_TYPES and obj.size < PREVIEW_MAX_SIZE
 
 
 # ==== Сериализатор регистрации пользователя с улучшенной валидацией ====
@@ -311,7 +434,7 @@ class UserProfileSerializer(serializers.ModelSerializer):
         return value
 
 # ==== Сериализатор для админской панели ====
-class AdminUserSerializer(serializers.ModelSerializer):
+class AdminUserSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     file_count = serializers.IntegerField(read_only=True)
     total_size = serializers.IntegerField(read_only=True)
     full_name = serializers.SerializerMethodField()
@@ -339,6 +462,22 @@ class AdminUserSerializer(serializers.ModelSerializer):
             'total_size',
             'formatted_total_size'
         ]
+        # file_count/total_size — аннотации, столбцов не требуют
+        field_columns = {
+            'id': ['id'],
+            'username': ['username'],
+            'email': ['email'],
+            'first_name': ['first_name'],
+            'last_name': ['last_name'],
+            'full_name': ['first_name', 'last_name', 'username'],
+            'is_staff': ['is_staff'],
+            'is_superuser': ['is_superuser'],
+            'is_active': ['is_active'],
+            'date_joined': ['date_joined'],
+            'formatted_date_joined': ['date_joined'],
+            'last_login': ['last_login'],
+            'formatted_last_login': ['last_login'],
+        }
 
     def get_full_name(self, obj):
         """Получаем полное имя пользователя"""
@@ -358,15 +497,7 @@ class AdminUserSerializer(serializers.ModelSerializer):
     
     def get_formatted_total_size(self, obj):
         """Форматируем общий размер файлов пользователя"""
-        total_size = obj.total_size or 0
-        if total_size < 1024:
-            return f"{total_size} B"
-        elif total_size < 1024 * 1024:
-            return f"{total_size / 1024:.1f} KB"
-        elif total_size < 1024 * 1024 * 1024:
-            return f"{total_size / (1024 * 1024):.1f} MB"
-        else:
-            return f"{total_size / (1024 * 1024 * 1024):.1f} GB"
+        return format_size(obj.total_size or 0)
 
 # ==== Сериализатор для изменения пароля ====
 class ChangePasswordSerializer(serializers.Serializer):
@@ -0,0 +1,49 @@
+import logging
+from itertools import islice
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from .renderers import dumps
+
+logger = logging.getLogger(__name__)
+
+
+def _chunks(iterable, size):
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def iter_listing(head, key, queryset, serialize, chunk_size):
+    """
+    JSON-объект {**head, key: [...]} по частям. Строки читаются из БД
+    .iterator(chunk_size) (на PostgreSQL — серверный курсор), каждая пачка
+    сериализуется serialize(list) -> list[dict] и сразу отдаётся клиенту.
+    """
+    prefix = dumps(head)[:-1]
+    yield prefix + (b',' if head else b'') + dumps(key) + b':['
+
+    first = True
+    try:
+        for chunk in _chunks(queryset.iterator(chunk_size=chunk_size), chunk_size):
+            body = b','.join(dumps(row) for row in serialize(chunk))
+            yield body if first else b',' + body
+            first = False
+    except Exception as e:
+        # Заголовки уже отправлены — статус не сменить, обрываем ответ
+        logger.error(f"Ошибка при потоковой выдаче списка '{key}': {str(e)}")
+        raise
+    yield b']}'
+
+
+def streaming_listing(head, key, queryset, serialize, chunk_size=None):
+    """StreamingHttpResponse со списком: память не растёт с числом строк"""
+    chunk_size = chunk_size or settings.LISTING_STREAM_CHUNK_SIZE
+    response = StreamingHttpResponse(
+        iter_listing(head, key, queryset, serialize, chunk_size),
+        content_type='application/json',
+    )
+    response['X-Accel-Buffering'] = 'no'
+    return response
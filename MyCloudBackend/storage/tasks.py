@@ -0,0 +1,50 @@
+"""
+Фоновые задачи (storage/jobs.py). Модуль импортируется при запуске
+приложения (StorageConfig.ready), поэтому задачи известны и воркерам,
+и представлениям, которые их ставят.
+"""
+from django.core.management import call_command
+
+from . import blobs, deletion, jobs, thumbnails
+from .drivers import get_driver
+
+
+@jobs.task('blobs.remove_files')
+def remove_blob_files(blob_ids):
+    blobs.remove_blob_files(blob_ids)
+
+
+@jobs.task('storage.delete_keys')
+def delete_keys(keys):
+    get_driver().delete_many(keys)
+
+
+@jobs.task('users.purge')
+def plan_user_purge(purge_id):
+    deletion.plan(purge_id)
+
+
+@jobs.task('users.purge_batch')
+def purge_user_batch(purge_id, first_pk, last_pk):
+    deletion.purge_batch(purge_id, first_pk, last_pk)
+
+
+@jobs.task('thumbnails.generate')
+def generate_thumbnails(blob_id):
+    thumbnails.generate(blob_id)
+
+
+@jobs.task('thumbnails.evict')
+def evict_thumbnails():
+    thumbnails.evict()
+
+
+@jobs.task('management.command')
+def management_command(name, args=()):
+    """Команда manage.py — для периодических задач (settings.JOB_PERIODIC)"""
+    call_command(name, *args)
+
+
+@jobs.task('jobs.purge_finished')
+def purge_finished():
+    jobs.purge_finished()
@@ -0,0 +1,232 @@
+"""
+Миниатюры изображений фиксированных размеров (THUMBNAIL_SIZES) в WebP и JPEG.
+
+Миниатюры строятся фоновой задачей 'thumbnails.generate' — после загрузки
+и при первом запросе, которого они ещё не дождались. Декодирование и
+масштабирование (storage/imaging.py) выполняются в пуле процессов: задача
+нагружает CPU и не должна делить GIL с потоками воркера.
+
+Миниатюра адресуется хэшем содержимого (blob), поэтому общая для всех его
+копий и никогда не меняется — браузер кэширует её надолго. Записи Thumbnail
+учитывают объём; задача 'thumbnails.evict' удаляет давно не запрашиваемые,
+когда он превышает THUMBNAIL_CACHE_MAX_BYTES.
+"""
+import io
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import timedelta
+from PIL import Image
+from django.conf import settings
+from django.db.models import Sum
+from django.http import FileResponse, HttpResponse
+from django.utils import timezone
+from django.utils.cache import get_conditional_response
+
+from . import imaging, jobs, paths
+from .drivers import get_driver
+from .models import Blob, Thumbnail
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+# Миниатюру, которую ждёт открытая страница, строим раньше построенных заранее
+ON_DEMAND_PRIORITY = 5
+
+_pool = None
+_pool_lock = threading.Lock()
+_readable_extensions = None
+
+
+def _extensions():
+    """Расширения форматов, которые Pillow умеет читать"""
+    global _readable_extensions
+    if _readable_extensions is None:
+        Image.init()
+        _readable_extensions = frozenset(
+            ext for ext, name in Image.registered_extensions().items() if name in Image.OPEN
+        )
+    return _readable_extensions
+
+
+def supported(file_obj):
+    """Можно ли построить миниатюру: содержимое в blob, формат читается Pillow, размер в пределах лимита"""
+    extension = os.path.splitext(file_obj.original_name.lower())[1]
+    return (
+        bool(file_obj.blob_id)
+        and file_obj.size <= settings.THUMBNAIL_MAX_SOURCE_SIZE
+        and extension in _extensions()
+    )
+
+
+def failed(blob_id):
+    """Pillow не смог прочитать исходник — до THUMBNAIL_FAILURE_TIMEOUT не пытаемся снова"""
+    since = timezone.now() - timedelta(seconds=settings.THUMBNAIL_FAILURE_TIMEOUT)
+    return Blob.objects.filter(pk=blob_id, thumbnail_failed_at__gt=since).exists()
+
+
+def negotiate_format(request):
+    """
+    Формат миниатюры: явно из ?fmt= или по заголовку Accept (WebP, если браузер
+    его принимает). None — запрошен неизвестный формат.
+    """
+    formats = settings.THUMBNAIL_FORMATS
+    requested = request.GET.get('fmt')
+    if requested:
+        return requested if requested in formats else None
+    if 'webp' in formats and 'image/webp' in request.META.get('HTTP_ACCEPT', ''):
+        return 'webp'
+    return 'jpeg' if 'jpeg' in formats else formats[0]
+
+
+def blob_keys(blob_id):
+    """Ключи всех миниатюр blob в хранилище (для удаления вместе с ним)"""
+    return [
+        paths.thumbnail_relative_path(blob_id, size, fmt)
+        for size in settings.THUMBNAIL_SIZES for fmt in settings.THUMBNAIL_FORMATS
+    ]
+
+
+def schedule(file_obj, priority=0):
+    """Ставит построение миниатюр в очередь; дубликат активной задачи не создаётся"""
+    jobs.enqueue('thumbnails.generate', {'blob_id': file_obj.blob_id}, priority=priority,
+                 unique_key=f'thumbnails:{file_obj.blob_id}')
+
+
+def file_uploaded(file_obj):
+    """Миниатюры изображения строятся сразу после загрузки — к открытию списка они готовы"""
+    if supported(file_obj):
+        schedule(file_obj)
+
+
+def _process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            # spawn: дочерние процессы не наследуют потоки и соединения воркера.
+            # Процессы периодически перезапускаются — память после больших изображений возвращается системе
+            _pool = ProcessPoolExecutor(
+                settings.THUMBNAIL_PROCESSES,
+                mp_context=multiprocessing.get_context('spawn'),
+                max_tasks_per_child=settings.THUMBNAIL_TASKS_PER_CHILD,
+            )
+        return _pool
+
+
+def _render(source):
+    global _pool
+    args = (
+        source, settings.THUMBNAIL_SIZES, settings.THUMBNAIL_FORMATS,
+        settings.THUMBNAIL_QUALITY, settings.THUMBNAIL_MAX_PIXELS,
+    )
+    if not settings.THUMBNAIL_PROCESSES:
+        return imaging.render(*args)
+    try:
+        return _process_pool().submit(imaging.render, *args).result()
+    except BrokenProcessPool:
+        # Процесс пула упал (например, нехватка памяти) — следующая попытка задачи создаст пул заново
+        with _pool_lock:
+            _pool = None
+        raise
+
+
+def generate(blob_id):
+    """Строит недостающие миниатюры blob. Возвращает число сохранённых"""
+    blob = Blob.objects.filter(pk=blob_id).first()
+    if blob is None:
+        return 0
+    existing = set(Thumbnail.objects.filter(blob=blob).values_list('size', 'format'))
+    wanted = {(size, fmt) for size in settings.THUMBNAIL_SIZES for fmt in settings.THUMBNAIL_FORMATS}
+    if wanted <= existing:
+        return 0
+
+    storage = get_driver()
+    key = blob.current_relative_path()
+    # Локальный файл процесс пула читает сам; из S3 исходник загружается в память
+    source = storage.local_path(key) or b''.join(storage.read(key))
+    try:
+        rendered = _render(source)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        # Повтор не поможет: повреждённый файл, неподдерживаемый вариант формата, слишком большое изображение.
+        # Отметка в БД видна всем воркерам и не вытесняется из кэша
+        Blob.objects.filter(pk=blob_id).update(thumbnail_failed_at=timezone.now())
+        logger.warning(f"Не удалось построить миниатюры {blob_id}: {str(e)}")
+        return 0
+
+    rows = []
+    for (size, fmt), data in rendered.items():
+        if (size, fmt) in existing:
+            continue
+        storage.write(paths.thumbnail_relative_path(blob_id, size, fmt), io.BytesIO(data))
+        rows.append(Thumbnail(blob_id=blob_id, size=size, format=fmt, bytes=len(data)))
+    Thumbnail.objects.bulk_create(rows, ignore_conflicts=True)
+    logger.debug(f"Миниатюры {blob_id}: сохранено {len(rows)}")
+    return len(rows)
+
+
+def thumbnail_response(request, file_obj, size, fmt):
+    """
+    Ответ с миниатюрой (или 304 по If-None-Match); None — миниатюры ещё нет.
+    Содержимое по адресу не меняется, поэтому кэш браузера без перепроверки.
+    """
+    thumbnail = Thumbnail.objects.filter(blob_id=file_obj.blob_id, size=size, format=fmt).first()
+    if thumbnail is None:
+        return None
+
+    now = timezone.now()
+    if now - thumbnail.accessed_at > timedelta(seconds=settings.THUMBNAIL_TOUCH_INTERVAL):
+        # Время обращения для вытеснения — не чаще раза в THUMBNAIL_TOUCH_INTERVAL
+        Thumbnail.objects.filter(pk=thumbnail.pk).update(accessed_at=now)
+
+    etag = f'"{file_obj.blob_id}-{size}.{fmt}"'
+    cache_control = f'private, max-age={settings.THUMBNAIL_MAX_AGE}, immutable'
+    headers = HttpResponse()
+    headers['ETag'] = etag
+    headers['Cache-Control'] = cache_control
+    not_modified = get_conditional_response(request, etag=etag, response=headers)
+    if not_modified is not headers:
+        return not_modified
+
+    key = paths.thumbnail_relative_path(file_obj.blob_id, size, fmt)
+    try:
+        response = FileResponse(get_driver().open(key), content_type=CONTENT_TYPES[fmt])
+        response['Content-Length'] = thumbnail.bytes
+    except FileNotFoundError:
+        # Файл вытеснен или потерян — запись удаляем, миниатюра построится заново
+        Thumbnail.objects.filter(pk=thumbnail.pk).delete()
+        return None
+    response['ETag'] = etag
+    response['Cache-Control'] = cache_control
+    return response
+
+
+def evict():
+    """
+    Удаляет давно не запрашиваемые миниатюры, пока их общий объём больше
+    THUMBNAIL_CACHE_MAX_BYTES. Освобождаем с запасом в 10%, чтобы не вытеснять
+    по одной миниатюре при каждом запуске. Возвращает число удалённых.
+    """
+    limit = settings.THUMBNAIL_CACHE_MAX_BYTES
+    total = Thumbnail.objects.aggregate(total=Sum('bytes'))['total'] or 0
+    if total <= limit:
+        return 0
+
+    excess = total - int(limit * 0.9)
+    victims = []
+    freed = 0
+    oldest = Thumbnail.objects.order_by('accessed_at', 'pk').values_list('pk', 'blob_id', 'size', 'format', 'bytes')
+    for row in oldest.iterator(chunk_size=settings.LISTING_STREAM_CHUNK_SIZE):
+        victims.append(row)
+        freed += row[4]
+        if freed >= excess:
+            break
+
+    batch = settings.LISTING_STREAM_CHUNK_SIZE
+    for start in range(0, len(victims), batch):
+        Thumbnail.objects.filter(pk__in=[row[0] for row in victims[start:start + batch]]).delete()
+    get_driver().delete_many([paths.thumbnail_relative_path(blob_id, size, fmt) for _, blob_id, size, fmt, _ in victims])
+    logger.info(f"Вытеснено миниатюр: {len(victims)}, освобождено {freed} байт")
+    return len(victims)
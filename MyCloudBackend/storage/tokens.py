@@ -0,0 +1,80 @@
+"""
+JWT с данными пользователя в подписанных claims: права и активность берутся
+из токена, а не из БД на каждый запрос. Отзыв — через короткоживущую запись
+состояния пользователя в общем кэше (auth_state), которую сбрасывают изменения
+пользователя в админке.
+"""
+import hashlib
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .blacklist import might_be_blacklisted, publish_blacklisted
+
+# Claim с версией учётных данных: меняется при смене пароля — старые токены отзываются
+VERSION_CLAIM = 'ver'
+# Поля User, которые берутся из токена без запроса к БД
+CLAIM_FIELDS = ('username', 'is_staff', 'is_superuser', 'is_active')
+
+
+def token_version(user):
+    return hashlib.sha256(f'{user.pk}:{user.password}'.encode()).hexdigest()[:16]
+
+
+def user_claims(user):
+    claims = {field: getattr(user, field) for field in CLAIM_FIELDS}
+    claims[VERSION_CLAIM] = token_version(user)
+    return claims
+
+
+class StorageRefreshToken(RefreshToken):
+    """
+    Refresh-токен с claims пользователя; access-токен копирует их при выдаче.
+    Проверка blacklist идёт в БД, только если jti есть в Bloom-фильтре.
+    """
+
+    @classmethod
+    def for_user(cls, user):
+        token = super().for_user(user)
+        for claim, value in user_claims(user).items():
+            token[claim] = value
+        return token
+
+    def check_blacklist(self):
+        if might_be_blacklisted(self.payload[api_settings.JTI_CLAIM]):
+            super().check_blacklist()
+
+    def blacklist(self):
+        result = super().blacklist()
+        publish_blacklisted(self.payload[api_settings.JTI_CLAIM])
+        return result
+
+
+def _state_key(user_id):
+    return f'auth_state:{user_id}'
+
+
+def auth_state(user_id):
+    """
+    Актуальные права, активность и версия токенов пользователя. Кэшируются
+    на AUTH_STATE_CACHE_TIMEOUT секунд в общем кэше; None — пользователя нет.
+    """
+    key = _state_key(user_id)
+    state = cache.get(key)
+    if state is None:
+        user = (
+            get_user_model().objects.filter(pk=user_id)
+            .only('id', 'password', *CLAIM_FIELDS).first()
+        )
+        # Удалённого пользователя тоже запоминаем, чтобы не ходить в БД
+        state = user_claims(user) if user is not None else {}
+        cache.set(key, state, settings.AUTH_STATE_CACHE_TIMEOUT)
+    return state or None
+
+
+def invalidate_auth_state(user_id):
+    """Изменения пользователя действуют со следующего запроса во всех воркерах"""
+    transaction.on_commit(lambda: cache.delete(_state_key(user_id)))
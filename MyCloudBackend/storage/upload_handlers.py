@@ -0,0 +1,169 @@
+import os
+import hashlib
+import logging
+import mimetypes
+from django.core.files.uploadedfile import UploadedFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.http import QueryDict
+from django.utils.datastructures import MultiValueDict
+
+from . import blobs
+
+logger = logging.getLogger(__name__)
+
+# Запас на границы multipart и текстовые поля (комментарий) сверх размера файла
+MULTIPART_OVERHEAD = 64 * 1024
+
+# Сигнатуры форматов: (смещение, байты, MIME-тип). Только достаточно длинные:
+# двухбайтовые (BM, MZ) совпадают с началом обычного текста
+MAGIC_SIGNATURES = (
+    (0, b'\xff\xd8\xff', 'image/jpeg'),
+    (0, b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (0, b'GIF87a', 'image/gif'),
+    (0, b'GIF89a', 'image/gif'),
+    (0, b'\x00\x00\x01\x00', 'image/x-icon'),
+    (0, b'%PDF-', 'application/pdf'),
+    (0, b'PK\x03\x04', 'application/zip'),
+    (0, b'Rar!\x1a\x07', 'application/x-rar-compressed'),
+    (0, b"7z\xbc\xaf'\x1c", 'application/x-7z-compressed'),
+    (0, b'\x1f\x8b\x08', 'application/gzip'),
+    (0, b'BZh', 'application/x-bzip2'),
+    (0, b'\xd0\xcf\x11\xe0\xa1\xb1\x1a\xe1', 'application/x-ole-storage'),
+    (0, b'OggS', 'audio/ogg'),
+    (0, b'\x1aE\xdf\xa3', 'video/x-matroska'),
+    (0, b'\x7fELF', 'application/x-executable'),
+)
+RIFF_SUBTYPES = {b'WEBP': 'image/webp', b'WAVE': 'audio/wav', b'AVI ': 'video/x-msvideo'}
+# Контейнер ISO BMFF (ftyp) общий для видео, аудио и HEIC — тип определяет бренд
+FTYP_BRANDS = {
+    b'isom': 'video/mp4', b'iso2': 'video/mp4', b'mp41': 'video/mp4', b'mp42': 'video/mp4',
+    b'avc1': 'video/mp4', b'qt  ': 'video/quicktime', b'M4A ': 'audio/mp4',
+    b'heic': 'image/heic', b'heix': 'image/heic', b'mif1': 'image/heif',
+}
+SNIFF_LENGTH = 16
+
+
+def sniff_mime_type(head):
+    """MIME-тип по первым байтам файла или None, если сигнатура неизвестна"""
+    if head[:4] == b'RIFF':
+        return RIFF_SUBTYPES.get(head[8:12])
+    if head[4:8] == b'ftyp':
+        return FTYP_BRANDS.get(head[8:12])
+    for offset, signature, mime_type in MAGIC_SIGNATURES:
+        if head[offset:offset + len(signature)] == signature:
+            return mime_type
+    return None
+
+
+def detect_mime_type(name, head):
+    """
+    Тип для записи File: по расширению, как в File.save (сигнатура .docx — просто zip).
+    Сигнатура нужна только файлам, тип которых по имени не определить.
+    """
+    guessed, _ = mimetypes.guess_type(name)
+    return guessed or sniff_mime_type(head) or ''
+
+
+class StreamedUploadedFile(UploadedFile):
+    """
+    Загруженный файл, уже лежащий во временном файле рядом с хранилищем blob.
+    Помимо обычных атрибутов несёт sha256 и head — первые байты для detect_mime_type().
+    """
+
+    def __init__(self, file, name, content_type, size, charset, content_type_extra, sha256, head):
+        super().__init__(file, name, content_type, size, charset, content_type_extra)
+        self.sha256 = sha256
+        self.head = head
+
+    def temporary_file_path(self):
+        return self.file.name
+
+    def close(self):
+        # Если файл не был перенесён в хранилище (ошибка валидации) — убираем за собой
+        path = self.file.name
+        super().close()
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            logger.warning(f"Не удалось удалить временный файл {path}: {str(e)}")
+
+
+class StreamingBlobUploadHandler(FileUploadHandler):
+    """
+    Пишет байты запроса сразу во временный файл в MEDIA_ROOT/.tmp, в том же проходе
+    считая размер и SHA-256 и определяя тип по сигнатуре. Дальше файл попадает
+    в blobs/ переименованием, без повторного копирования. Принимается один файл
+    из поля field_name; при превышении max_size приём прерывается.
+    """
+
+    def __init__(self, request=None, max_size=None, field_name='file'):
+        super().__init__(request)
+        self.max_size = max_size
+        self.field_name = field_name
+        self.too_large = False
+        self.destination = None
+        self.active = False
+
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        # Тело заведомо больше лимита — не читаем его вовсе
+        if self.max_size is not None and content_length > self.max_size + MULTIPART_OVERHEAD:
+            self.too_large = True
+            return QueryDict(encoding=encoding), MultiValueDict()
+        return None
+
+    def new_file(self, field_name, *args, **kwargs):
+        super().new_file(field_name, *args, **kwargs)
+        self.active = field_name == self.field_name and self.destination is None
+        if not self.active:
+            return
+        self.destination = open(blobs.new_temp_path(), 'wb')
+        self.digest = hashlib.sha256()
+        self.size = 0
+        self.head = b''
+
+    def receive_data_chunk(self, raw_data, start):
+        if not self.active:
+            return None
+        self.size += len(raw_data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.too_large = True
+            self._discard()
+            raise StopUpload(connection_reset=True)
+        if len(self.head) < SNIFF_LENGTH:
+            self.head += raw_data[:SNIFF_LENGTH - len(self.head)]
+        self.digest.update(raw_data)
+        self.destination.write(raw_data)
+        return None
+
+    def file_complete(self, file_size):
+        if not self.active:
+            return None
+        self.active = False
+        self.destination.flush()
+        self.destination.seek(0)
+        return StreamedUploadedFile(
+            file=self.destination,
+            name=self.file_name,
+            content_type=self.content_type,
+            size=self.size,
+            charset=self.charset,
+            content_type_extra=self.content_type_extra,
+            sha256=self.digest.hexdigest(),
+            head=self.head
+        )
+
+    def upload_interrupted(self):
+        self._discard()
+
+    def _discard(self):
+        self.active = False
+        if self.destination is None or self.destination.closed:
+            return
+        path = self.destination.name
+        self.destination.close()
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
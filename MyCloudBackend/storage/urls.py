@@ -16,11 +16,17 @@ from .views import (
     # File views
     FileListView,
     FileUploadView,
+    UploadSessionCreateView,
+    UploadSessionDetailView,
+    UploadPartView,
+    UploadSessionCompleteView,
     FileDeleteView,
     RenameFileView,
     UpdateFileCommentView,
     DownloadFileView,
+    ThumbnailView,
     PublicDownloadView,
+    ArchiveDownloadView,
     CopyLinkView,
     
     # Admin views
@@ -28,6 +34,8 @@ from .views import (
     AdminUserUpdateView,
     AdminUserDeleteView,
     AdminUserFilesView,
+    AdminJobQueueView,
+    AdminUserPurgeView,
 )
 
 
@@ -52,7 +60,13 @@ def api_home(request):
             "files": {
                 "list": "/api/files/",
                 "upload": "/api/files/upload/",
+                "multipart_upload": "/api/files/uploads/",
+                "multipart_upload_status": "/api/files/uploads/{upload_id}/",
+                "multipart_upload_part": "/api/files/uploads/{upload_id}/parts/{part_number}/",
+                "multipart_upload_complete": "/api/files/uploads/{upload_id}/complete/",
                 "download": "/api/files/{id}/download/",
+                "thumbnail": "/api/files/{id}/thumbnail/{size}/",
+                "archive": "/api/files/archive/?ids={id},{id}",
                 "delete": "/api/files/{id}/",
                 "rename": "/api/files/{id}/rename/",
                 "comment": "/api/files/{id}/comment/",
@@ -63,7 +77,9 @@ def api_home(request):
                 "users": "/api/admin/users/",
                 "user_detail": "/api/admin/users/{id}/",
                 "user_files": "/api/admin/users/{id}/files/",
-                "delete_user": "/api/admin/users/{id}/delete/"
+                "delete_user": "/api/admin/users/{id}/delete/",
+                "job_queue": "/api/admin/jobs/",
+                "user_purge": "/api/admin/purges/{id}/"
             }
         },
         "status": "operational",
@@ -184,10 +200,16 @@ urlpatterns = [
     path('files/', include([
         path('', FileListView.as_view(), name='file-list'),
         path('upload/', FileUploadView.as_view(), name='file-upload'),
+        path('uploads/', UploadSessionCreateView.as_view(), name='upload-session-create'),
+        path('uploads/<uuid:upload_id>/', UploadSessionDetailView.as_view(), name='upload-session-detail'),
+        path('uploads/<uuid:upload_id>/parts/<int:part_number>/', UploadPartView.as_view(), name='upload-part'),
+        path('uploads/<uuid:upload_id>/complete/', UploadSessionCompleteView.as_view(), name='upload-session-complete'),
+        path('archive/', ArchiveDownloadView.as_view(), name='file-archive'),
         path('<int:pk>/', FileDeleteView.as_view(), name='file-delete'),
         path('<int:pk>/rename/', RenameFileView.as_view(), name='file-rename'),
         path('<int:pk>/comment/', UpdateFileCommentView.as_view(), name='file-comment'),
         path('<int:pk>/download/', DownloadFileView.as_view(), name='file-download'),
+        path('<int:pk>/thumbnail/<str:size>/', ThumbnailView.as_view(), name='file-thumbnail'),
         path('<int:pk>/copy-link/', CopyLinkView.as_view(), name='file-copy-link'),
         path('download/public/<str:public_link>/', PublicDownloadView.as_view(), name='file-public-download'),
     ])),
@@ -197,6 +219,8 @@ urlpatterns = [
         path('users/<int:user_id>/', AdminUserUpdateView.as_view(), name='admin-user-update'),
         path('users/<int:user_id>/delete/', AdminUserDeleteView.as_view(), name='admin-user-delete'),
         path('users/<int:user_id>/files/', AdminUserFilesView.as_view(), name='admin-user-files'),
+        path('jobs/', AdminJobQueueView.as_view(), name='admin-job-queue'),
+        path('purges/<int:purge_id>/', AdminUserPurgeView.as_view(), name='admin-user-purge'),
     ])),
 ]
 
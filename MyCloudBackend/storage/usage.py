@@ -0,0 +1,84 @@
+import logging
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import File, UserStorageUsage
+
+logger = logging.getLogger(__name__)
+
+
+def _actual(user_id):
+    """Число файлов и объём по самой таблице File"""
+    totals = File.objects.filter(user_id=user_id).aggregate(file_count=Count('id'), total_size=Sum('size'))
+    return totals['file_count'], totals['total_size'] or 0
+
+
+def _create(user_id):
+    """
+    Строка счётчиков по фактическим данным. Вызывается, когда строки ещё нет:
+    File в текущей транзакции уже изменены, поэтому прибавлять к ней ничего не нужно.
+    """
+    file_count, total_size = _actual(user_id)
+    try:
+        with transaction.atomic():
+            return UserStorageUsage.objects.create(user_id=user_id, file_count=file_count, total_size=total_size)
+    except IntegrityError:
+        # Параллельный запрос успел создать строку первым
+        return UserStorageUsage.objects.get(user_id=user_id)
+
+
+def get(user):
+    """Счётчики пользователя (одна выборка по первичному ключу)"""
+    try:
+        return UserStorageUsage.objects.get(user_id=user.pk)
+    except UserStorageUsage.DoesNotExist:
+        return _create(user.pk)
+
+
+def add(user_id, file_count, total_size):
+    """
+    Атомарно сдвигает счётчики на (file_count, total_size). Вызывать в той же
+    транзакции, где создаются или удаляются записи File, — после изменения.
+    """
+    updated = UserStorageUsage.objects.filter(user_id=user_id).update(
+        file_count=F('file_count') + file_count,
+        total_size=F('total_size') + total_size,
+    )
+    if not updated:
+        _create(user_id)
+
+
+def file_added(file_obj):
+    add(file_obj.user_id, 1, file_obj.size)
+
+
+def files_removed(rows):
+    """rows — пары (user_id, size) удалённых записей File"""
+    removed = defaultdict(lambda: [0, 0])
+    for user_id, size in rows:
+        removed[user_id][0] += 1
+        removed[user_id][1] += size
+    for user_id, (file_count, total_size) in removed.items():
+        add(user_id, -file_count, -total_size)
+
+
+@transaction.atomic
+def reconcile(user_id, dry_run=False):
+    """
+    Сверяет счётчики пользователя с таблицей File и чинит расхождение.
+    Строка блокируется до подсчёта — параллельные загрузки и удаления ждут.
+    Возвращает ((было), (стало)) или None, если расхождения нет.
+    """
+    usage = UserStorageUsage.objects.select_for_update().filter(user_id=user_id).first()
+    actual = _actual(user_id)
+    current = (usage.file_count, usage.total_size) if usage else None
+    if current == actual:
+        return None
+    if not dry_run:
+        if usage is None:
+            _create(user_id)
+        else:
+            UserStorageUsage.objects.filter(user_id=user_id).update(file_count=actual[0], total_size=actual[1])
+        logger.warning(f"Счётчики пользователя {user_id} исправлены: {current} -> {actual}")
+    return current, actual
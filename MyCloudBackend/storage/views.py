@@ -6,12 +6,12 @@ from pathlib import Path
 from django.conf import settings
 from django.utils import timezone
 from django.shortcuts import get_object_or_404
-from django.http import FileResponse, JsonResponse, Http404
+from django.http import JsonResponse, Http404, StreamingHttpResponse
 from django.contrib.auth import get_user_model, authenticate
-from django.db.models import Count, Sum
+from django.db.models.functions import Coalesce
 from django.views.decorators.csrf import csrf_exempt
 from django.utils.decorators import method_decorator
-from django.core.cache import cache
+from django.utils.cache import get_conditional_response, patch_vary_headers
 from django.db import transaction
 
 from rest_framework.exceptions import ValidationError
@@ -20,12 +20,22 @@ from rest_framework.response import Response
 from rest_framework import status, generics
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework.permissions import IsAuthenticated, AllowAny, IsAdminUser
-from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenObtainPairView, TokenRefreshView
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.throttling import UserRateThrottle, AnonRateThrottle
 
-from .models import File
+from .models import File, UploadSession, UploadPart, UserPurge
+from . import blobs, deletion, download_counters, jobs, listing_cache, paths, thumbnails, usage
+from .tokens import StorageRefreshToken, invalidate_auth_state
+from .deletion import delete_file_records
+from .downloads import conditional_response, file_response
+from .drivers import get_driver
+from .pagination import KeysetPagination, PaginationError
+from .fieldsets import FieldsetError, requested_fields, restrict
+from .archives import stream_zip, unique_arcname
+from .streaming import streaming_listing
+from .upload_handlers import SNIFF_LENGTH, StreamingBlobUploadHandler, detect_mime_type
+from .multipart import PartSizeError, write_part, assemble_parts, remove_parts_dir
 from .serializers import (
     FileSerializer,
     RegisterSerializer,
@@ -142,19 +152,11 @@ class CookieTokenRefreshView(TokenRefreshView):
 @permission_classes([IsAuthenticated])
 def current_user_view(request):
     """Получение данных текущего аутентифицированного пользователя"""
-    user = request.user
+    # В request.user только поля из токена — профиль читаем одной выборкой
+    user = User.objects.get(pk=request.user.pk)
     
-    # Кэшируем статистику пользователя на 5 минут
-    cache_key = f"user_stats_{user.id}"
-    user_stats = cache.get(cache_key)
-    
-    if user_stats is None:
-        user_files = File.objects.filter(user=user)
-        user_stats = {
-            'file_count': user_files.count(),
-            'total_size': user_files.aggregate(Sum('size'))['size__sum'] or 0
-        }
-        cache.set(cache_key, user_stats, 300)  # 5 минут
+    # Счётчики ведутся вместе с записями File — без count()/Sum по таблице файлов
+    user_stats = usage.get(user)
     
     return Response({
         'id': user.id,
@@ -168,8 +170,8 @@ def current_user_view(request):
         'is_staff': user.is_staff,
         'is_superuser': user.is_superuser,
         'is_active': user.is_active,
-        'file_count': user_stats['file_count'],
-        'total_size': user_stats['total_size'],
+        'file_count': user_stats.file_count,
+        'total_size': user_stats.total_size,
         'date_joined': user.date_joined.isoformat() if hasattr(user, 'date_joined') else None,
         'last_login': user.last_login.isoformat() if user.last_login else None
     })
@@ -193,7 +195,7 @@ class RegisterView(generics.CreateAPIView):
             if username and password:
                 user = authenticate(request, username=username, password=password)
                 if user and user.is_active:
-                    refresh = RefreshToken.for_user(user)
+                    refresh = StorageRefreshToken.for_user(user)
                     response.data['tokens'] = {
                         'refresh': str(refresh),
                         'access': str(refresh.access_token),
@@ -223,7 +225,7 @@ class LogoutView(APIView):
             # Добавляем токен в blacklist если он есть
             if refresh_token:
                 try:
-                    token = RefreshToken(refresh_token)
+                    token = StorageRefreshToken(refresh_token)
                     token.blacklist()
                 except Exception as e:
                     logger.warning(f"Ошибка при добавлении токена в blacklist: {str(e)}")
@@ -237,9 +239,6 @@ class LogoutView(APIView):
             response.delete_cookie("access_token", samesite="Lax")
             response.delete_cookie("refresh_token", samesite="Lax")
             
-            # Очищаем кэш пользователя
-            cache.delete(f"user_stats_{request.user.id}")
-            
             logger.info(f"Пользователь {request.user.username} вышел из системы")
             return response
             
@@ -251,6 +250,18 @@ class LogoutView(APIView):
             return response
 
 # ==== Список файлов пользователя ====
+def _user_file_count(user):
+    """Число файлов пользователя из счётчиков UserStorageUsage"""
+    return usage.get(user).file_count
+
+def _file_list_headers(response, etag):
+    """Браузер хранит список, но каждый раз сверяет ETag с сервером"""
+    if etag is not None:
+        response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    patch_vary_headers(response, ['Accept', 'Authorization', 'Cookie'])
+    return response
+
 class FileListView(APIView):
     permission_classes = [IsAuthenticated]
 
@@ -265,100 +276,150 @@ class FileListView(APIView):
                 except User.DoesNotExist:
                     return Response({"error": "Пользователь не найден"}, status=status.HTTP_404_NOT_FOUND)
             else:
-                files = File.objects.filter(user=request.user)
-            
-            # Пагинация и сортировка
-            ordering = request.GET.get('ordering', '-uploaded_at')
-            files = files.order_by(ordering)
+                user = request.user
+                files = File.objects.filter(user=user)
+            
+            # Пока файлы пользователя не менялись, ответ берётся из кэша,
+            # а клиент с тем же ETag получает 304 без тела
+            list_cache = listing_cache.FileListCache(request, user.pk)
+            etag = list_cache.etag(request.accepted_media_type)
+            if etag is not None:
+                not_modified = get_conditional_response(request, etag=etag)
+                if not_modified is not None:
+                    return _file_list_headers(not_modified, etag)
+            
+            data = list_cache.get()
+            if data is None:
+                # Пагинация по курсору и сортировка по разрешённым полям
+                try:
+                    paginator = KeysetPagination(request)
+                    fields = requested_fields(request, FileSerializer)
+                except (PaginationError, FieldsetError) as e:
+                    return Response({"error": e.message, "code": e.code}, status=status.HTTP_400_BAD_REQUEST)
+                
+                # ?fields=/?exclude= — из БД читаются только нужные столбцы (+ поле курсора)
+                if fields is None:
+                    files = files.select_related('user')
+                else:
+                    files = restrict(files, FileSerializer, fields, paginator.field)
+                page = paginator.paginate(files)
+                
+                # Общее число — только на первой странице или по ?count=1, ?count=0 отключает
+                count = None
+                count_param = request.GET.get('count')
+                if count_param == '1' or (count_param is None and paginator.cursor is None):
+                    count = _user_file_count(user)
+                
+                serializer = FileSerializer(page, many=True, context={'request': request, 'fields': fields})
+                data = {
+                    'count': count,
+                    'next': paginator.get_next_link(),
+                    'previous': paginator.get_previous_link(),
+                    'files': list(serializer.data)
+                }
+                list_cache.set(data)
             
-            serializer = FileSerializer(files, many=True, context={'request': request})
-            return Response({
-                'count': files.count(),
-                'files': serializer.data
-            })
+            return _file_list_headers(Response(data), etag)
             
         except Exception as e:
             logger.error(f"Ошибка при получении списка файлов: {str(e)}")
             return Response({"error": "Ошибка сервера"}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+def _validate_new_file(user, name, size, content_type=None):
+    """
+    Общие проверки перед сохранением нового файла: лимит файлов, размер,
+    тип и имя. Возвращает Response с ошибкой или None.
+    """
+    # Проверка лимита файлов пользователя
+    if _user_file_count(user) >= MAX_FILES_PER_USER:
+        return Response({
+            "error": f"Превышен лимит файлов ({MAX_FILES_PER_USER})",
+            "code": "FILE_LIMIT_EXCEEDED"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Проверка размера файла
+    if size > MAX_FILE_SIZE:
+        return Response({
+            "error": f"Файл слишком большой (максимум {MAX_FILE_SIZE // (1024*1024)}MB)",
+            "code": "FILE_TOO_LARGE"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Проверка типа файла
+    if content_type not in ALLOWED_FILE_TYPES:
+        # Дополнительная проверка по расширению
+        mime_type, _ = mimetypes.guess_type(name or '')
+        if mime_type not in ALLOWED_FILE_TYPES:
+            return Response({
+                "error": f"Тип файла не поддерживается: {content_type or mime_type}",
+                "code": "UNSUPPORTED_FILE_TYPE"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+    # Проверка имени файла
+    if not name or len(name) > 255:
+        return Response({
+            "error": "Некорректное имя файла",
+            "code": "INVALID_FILENAME"
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    return None
+
+
 # ==== Загрузка файла ====
 class FileUploadView(APIView):
     parser_classes = [MultiPartParser, FormParser]
     permission_classes = [IsAuthenticated]
     throttle_classes = [UploadRateThrottle]
 
-    @transaction.atomic
     def post(self, request):
-        uploaded = request.FILES.get('file')
-        if not uploaded:
-            return Response({
-                "error": "Файл не прикреплён",
-                "code": "MISSING_FILE"
-            }, status=status.HTTP_400_BAD_REQUEST)
-
-        # Проверка лимита файлов пользователя
-        user_file_count = File.objects.filter(user=request.user).count()
-        if user_file_count >= MAX_FILES_PER_USER:
-            return Response({
-                "error": f"Превышен лимит файлов ({MAX_FILES_PER_USER})",
-                "code": "FILE_LIMIT_EXCEEDED"
-            }, status=status.HTTP_400_BAD_REQUEST)
+        # Тело запроса пишется сразу рядом с хранилищем, без буфера в памяти и лишней копии.
+        # Транзакцию открываем только после приёма файла, чтобы не держать её всё время загрузки
+        handler = StreamingBlobUploadHandler(request._request, max_size=MAX_FILE_SIZE)
+        request.upload_handlers = [handler]
 
-        # Проверка размера файла
-        if uploaded.size > MAX_FILE_SIZE:
+        uploaded = request.FILES.get('file')
+        if handler.too_large:
             return Response({
                 "error": f"Файл слишком большой (максимум {MAX_FILE_SIZE // (1024*1024)}MB)",
                 "code": "FILE_TOO_LARGE"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        # Проверка типа файла
-        content_type = uploaded.content_type
-        if content_type not in ALLOWED_FILE_TYPES:
-            # Дополнительная проверка по расширению
-            mime_type, _ = mimetypes.guess_type(uploaded.name)
-            if mime_type not in ALLOWED_FILE_TYPES:
-                return Response({
-                    "error": f"Тип файла не поддерживается: {content_type}",
-                    "code": "UNSUPPORTED_FILE_TYPE"
-                }, status=status.HTTP_400_BAD_REQUEST)
-
-        # Проверка имени файла
-        if not uploaded.name or len(uploaded.name) > 255:
+        if not uploaded:
             return Response({
-                "error": "Некорректное имя файла",
-                "code": "INVALID_FILENAME"
+                "error": "Файл не прикреплён",
+                "code": "MISSING_FILE"
             }, status=status.HTTP_400_BAD_REQUEST)
 
-        comment = request.data.get('comment', '')[:500]  # Ограничиваем длину комментария
+        error = _validate_new_file(request.user, uploaded.name, uploaded.size, uploaded.content_type)
+        if error is not None:
+            return error
 
-        # Создаем папку для файлов если её нет
-        media_root = Path(settings.MEDIA_ROOT)
-        media_root.mkdir(parents=True, exist_ok=True)
+        comment = request.data.get('comment', '')[:500]  # Ограничиваем длину комментария
 
         # Генерируем уникальное имя файла
         _, ext = os.path.splitext(uploaded.name)
         stored_name = f"{request.user.id}_{uuid.uuid4().hex}{ext}"
-        file_path = media_root / stored_name
-
-        # Создаем запись в БД
-        file_obj = File.objects.create(
-            user=request.user,
-            original_name=uploaded.name,
-            stored_name=stored_name,
-            size=uploaded.size,
-            comment=comment,
-            public_link=uuid.uuid4().hex,
-            file_path=str(Path('uploads') / stored_name)
-        )
 
         try:
-            # Сохраняем файл
-            with open(file_path, 'wb') as destination:
-                for chunk in uploaded.chunks():
-                    destination.write(chunk)
-            
-            # Очищаем кэш статистики пользователя
-            cache.delete(f"user_stats_{request.user.id}")
+            # До транзакции: если она откатится, перенесённое в хранилище содержимое будет удалено
+            blobs.prepare(uploaded.temporary_file_path(), uploaded.sha256)
+            with transaction.atomic():
+                # Одинаковое содержимое хранится один раз
+                blob = blobs.store(uploaded.temporary_file_path(), uploaded.sha256, uploaded.size)
+
+                file_obj = File.objects.create(
+                    user=request.user,
+                    original_name=uploaded.name,
+                    stored_name=stored_name,
+                    size=uploaded.size,
+                    comment=comment,
+                    public_link=uuid.uuid4().hex,
+                    file_path=blob.current_relative_path(),
+                    blob=blob,
+                    mime_type=detect_mime_type(uploaded.name, uploaded.head)
+                )
+                usage.file_added(file_obj)
+                listing_cache.invalidate([file_obj.user_id])
+                thumbnails.file_uploaded(file_obj)
             
             logger.info(f"Пользователь {request.user.username} загрузил файл {uploaded.name} ({uploaded.size} bytes)")
             return Response(
@@ -367,21 +428,225 @@ class FileUploadView(APIView):
             )
         
         except Exception as e:
-            # Откатываем изменения в БД
-            file_obj.delete()
-            # Удаляем файл если он успел создаться
-            if file_path.exists():
+            # Временный файл удалит uploaded.close() в конце запроса
+            logger.error(f"Ошибка при сохранении файла: {str(e)}")
+            return Response({
+                "error": "Ошибка при сохранении файла",
+                "code": "SAVE_ERROR"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+# ==== Многочастная (возобновляемая) загрузка ====
+def _upload_session_data(session):
+    received = list(session.parts.order_by('number').values_list('number', flat=True))
+    received_set = set(received)
+    return {
+        "upload_id": str(session.id),
+        "name": session.original_name,
+        "size": session.total_size,
+        "part_size": session.part_size,
+        "part_count": session.part_count,
+        "received_parts": received,
+        "missing_parts": [n for n in range(1, session.part_count + 1) if n not in received_set],
+        "expires_at": session.expires_at.isoformat(),
+    }
+
+def _get_upload_session(request, upload_id, for_update=False):
+    sessions = UploadSession.objects.select_for_update() if for_update else UploadSession.objects
+    return get_object_or_404(sessions, pk=upload_id, user=request.user)
+
+class UploadSessionCreateView(APIView):
+    """Создание сессии загрузки: клиент заранее сообщает имя и размер файла"""
+    permission_classes = [IsAuthenticated]
+    throttle_classes = [UploadRateThrottle]
+
+    def post(self, request):
+        name = (request.data.get('name') or '').strip()
+        try:
+            total_size = int(request.data.get('size'))
+            part_size = int(request.data.get('part_size') or settings.MULTIPART_UPLOAD_PART_SIZE)
+        except (TypeError, ValueError):
+            return Response({
+                "error": "Некорректный размер файла или части",
+                "code": "INVALID_SIZE"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if total_size <= 0:
+            return Response({
+                "error": "Некорректный размер файла или части",
+                "code": "INVALID_SIZE"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        error = _validate_new_file(request.user, name, total_size, request.data.get('content_type'))
+        if error is not None:
+            return error
+
+        min_part = settings.MULTIPART_UPLOAD_MIN_PART_SIZE
+        max_part = settings.MULTIPART_UPLOAD_MAX_PART_SIZE
+        if not min_part <= part_size <= max_part:
+            return Response({
+                "error": f"Размер части должен быть от {min_part} до {max_part} байт",
+                "code": "INVALID_PART_SIZE"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        session = UploadSession.objects.create(
+            user=request.user,
+            original_name=name,
+            total_size=total_size,
+            part_size=part_size,
+            comment=(request.data.get('comment') or '')[:500],
+            expires_at=timezone.now() + settings.MULTIPART_UPLOAD_EXPIRY
+        )
+        logger.info(f"Пользователь {request.user.username} начал загрузку {name} ({total_size} bytes, {session.part_count} частей)")
+        return Response(_upload_session_data(session), status=status.HTTP_201_CREATED)
+
+class UploadSessionDetailView(APIView):
+    """Состояние сессии (какие части уже приняты) и её отмена"""
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, upload_id):
+        session = _get_upload_session(request, upload_id)
+        return Response(_upload_session_data(session))
+
+    @transaction.atomic
+    def delete(self, request, upload_id):
+        session = _get_upload_session(request, upload_id, for_update=True)
+        parts_dir = session.get_parts_dir()
+        session.delete()
+        transaction.on_commit(lambda: remove_parts_dir(parts_dir))
+        logger.info(f"Пользователь {request.user.username} отменил загрузку {upload_id}")
+        return Response({"status": "aborted"})
+
+class UploadPartView(APIView):
+    """
+    Приём одной части. Тело запроса — сырые байты части, они пишутся на диск
+    потоково. Части можно отправлять параллельно и в любом порядке,
+    повторная отправка перезаписывает часть.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, upload_id, part_number):
+        session = _get_upload_session(request, upload_id)
+
+        if session.expires_at <= timezone.now():
+            return Response({
+                "error": "Срок действия загрузки истёк",
+                "code": "UPLOAD_EXPIRED"
+            }, status=status.HTTP_410_GONE)
+
+        if not 1 <= part_number <= session.part_count:
+            return Response({
+                "error": f"Номер части должен быть от 1 до {session.part_count}",
+                "code": "INVALID_PART_NUMBER"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        expected_size = session.expected_part_size(part_number)
+        try:
+            size = write_part(request.stream, session.get_part_path(part_number), expected_size)
+        except PartSizeError as e:
+            return Response({
+                "error": f"Неверный размер части: {str(e)}",
+                "code": "PART_SIZE_MISMATCH",
+                "expected_size": expected_size
+            }, status=status.HTTP_400_BAD_REQUEST)
+        except OSError as e:
+            logger.error(f"Ошибка при сохранении части {part_number} загрузки {upload_id}: {str(e)}")
+            return Response({
+                "error": "Ошибка при сохранении части",
+                "code": "SAVE_ERROR"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        # Upsert: параллельные повторы одной части не конфликтуют
+        UploadPart.objects.bulk_create(
+            [UploadPart(session=session, number=part_number, size=size)],
+            update_conflicts=True,
+            unique_fields=['session', 'number'],
+            update_fields=['size', 'received_at']
+        )
+        return Response({"part_number": part_number, "size": size})
+
+class UploadSessionCompleteView(APIView):
+    """Завершение загрузки: склейка частей в итоговый файл и создание записи File"""
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, upload_id):
+        # Склейка и хэширование больших файлов идут без транзакции и блокировки сессии;
+        # сессия блокируется только на время создания записей
+        session = _get_upload_session(request, upload_id)
+
+        data = _upload_session_data(session)
+        if data['missing_parts']:
+            return Response({
+                "error": "Получены не все части файла",
+                "code": "MISSING_PARTS",
+                "missing_parts": data['missing_parts']
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        error = _validate_new_file(request.user, session.original_name, session.total_size)
+        if error is not None:
+            return error
+
+        _, ext = os.path.splitext(session.original_name)
+        stored_name = f"{request.user.id}_{uuid.uuid4().hex}{ext}"
+        temp_path = blobs.new_temp_path()
+
+        try:
+            part_paths = [session.get_part_path(n) for n in range(1, session.part_count + 1)]
+            size = assemble_parts(part_paths, temp_path)
+            if size != session.total_size:
+                raise ValueError(f"assembled {size} bytes, expected {session.total_size}")
+
+            # Части приходят в произвольном порядке, поэтому хэш считаем по собранному файлу
+            sha256, _ = blobs.hash_file(temp_path)
+            with open(temp_path, 'rb') as assembled:
+                mime_type = detect_mime_type(session.original_name, assembled.read(SNIFF_LENGTH))
+            blobs.prepare(temp_path, sha256)
+
+            with transaction.atomic():
+                # Параллельный запрос мог уже завершить эту сессию
+                session = UploadSession.objects.select_for_update().filter(pk=upload_id, user=request.user).first()
+                if session is None:
+                    os.unlink(temp_path)
+                    raise Http404
+
+                blob = blobs.store(temp_path, sha256, size)
+                file_obj = File.objects.create(
+                    user=request.user,
+                    original_name=session.original_name,
+                    stored_name=stored_name,
+                    size=size,
+                    comment=session.comment,
+                    public_link=uuid.uuid4().hex,
+                    file_path=blob.current_relative_path(),
+                    blob=blob,
+                    mime_type=mime_type
+                )
+                usage.file_added(file_obj)
+                listing_cache.invalidate([file_obj.user_id])
+                thumbnails.file_uploaded(file_obj)
+
+                parts_dir = session.get_parts_dir()
+                session.delete()
+                transaction.on_commit(lambda: remove_parts_dir(parts_dir))
+        except Http404:
+            raise
+        except Exception as e:
+            if os.path.exists(temp_path):
                 try:
-                    file_path.unlink()
+                    os.unlink(temp_path)
                 except OSError:
                     pass
-                    
-            logger.error(f"Ошибка при сохранении файла: {str(e)}")
+            logger.error(f"Ошибка при сборке загрузки {upload_id}: {str(e)}")
             return Response({
                 "error": "Ошибка при сохранении файла",
                 "code": "SAVE_ERROR"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        logger.info(f"Пользователь {request.user.username} загрузил файл {file_obj.original_name} ({size} bytes) по частям")
+        return Response(
+            FileSerializer(file_obj, context={'request': request}).data,
+            status=status.HTTP_201_CREATED
+        )
+
 # ==== Копирование публичной ссылки ====
 class CopyLinkView(APIView):
     permission_classes = [IsAuthenticated]
@@ -390,7 +655,7 @@ class CopyLinkView(APIView):
         try:
             file_obj = get_object_or_404(File, pk=pk)
             
-            if file_obj.user != request.user and not request.user.is_staff:
+            if file_obj.user_id != request.user.pk and not request.user.is_staff:
                 return Response({
                     "detail": "Доступ запрещён",
                     "code": "ACCESS_DENIED"
@@ -422,28 +687,17 @@ class FileDeleteView(APIView):
         try:
             file_obj = get_object_or_404(File, pk=pk)
             
-            if file_obj.user != request.user and not request.user.is_staff:
+            if file_obj.user_id != request.user.pk and not request.user.is_staff:
                 return Response({
                     "detail": "Доступ запрещён",
                     "code": "ACCESS_DENIED"
                 }, status=status.HTTP_403_FORBIDDEN)
 
-            # Удаляем физический файл
-            file_path = Path(settings.MEDIA_ROOT) / file_obj.stored_name
-            if file_path.exists():
-                try:
-                    file_path.unlink()
-                except OSError as e:
-                    logger.error(f"Не удалось удалить файл {file_path}: {str(e)}")
-
             # Сохраняем информацию для логирования
             original_name = file_obj.original_name
             
-            # Удаляем запись из БД
-            file_obj.delete()
-            
-            # Очищаем кэш
-            cache.delete(f"user_stats_{request.user.id}")
+            # Удаляем запись из БД и освобождаем содержимое
+            delete_file_records(File.objects.filter(pk=file_obj.pk))
             
             logger.info(f"Файл {original_name} (ID: {pk}) удален пользователем {request.user.username}")
             return Response({"status": "deleted", "message": "Файл успешно удален"})
@@ -463,7 +717,7 @@ class RenameFileView(APIView):
         try:
             file_obj = get_object_or_404(File, pk=pk)
             
-            if file_obj.user != request.user and not request.user.is_staff:
+            if file_obj.user_id != request.user.pk and not request.user.is_staff:
                 return Response({
                     "detail": "Доступ запрещён",
                     "code": "ACCESS_DENIED"
@@ -499,6 +753,7 @@ class RenameFileView(APIView):
             old_name = file_obj.original_name
             file_obj.original_name = new_name
             file_obj.save()
+            listing_cache.invalidate([file_obj.user_id])
 
             logger.info(f"Файл '{old_name}' переименован в '{new_name}' пользователем {request.user.username}")
             
@@ -523,7 +778,7 @@ class UpdateFileCommentView(APIView):
         try:
             file_obj = get_object_or_404(File, pk=pk)
             
-            if file_obj.user != request.user and not request.user.is_staff:
+            if file_obj.user_id != request.user.pk and not request.user.is_staff:
                 return Response({
                     "detail": "Доступ запрещён",
                     "code": "ACCESS_DENIED"
@@ -539,6 +794,7 @@ class UpdateFileCommentView(APIView):
 
             file_obj.comment = new_comment
             file_obj.save()
+            listing_cache.invalidate([file_obj.user_id])
             
             logger.info(f"Комментарий к файлу {file_obj.original_name} изменён пользователем {request.user.username}")
             return Response(FileSerializer(file_obj, context={'request': request}).data)
@@ -553,39 +809,40 @@ class UpdateFileCommentView(APIView):
 # ==== Скачивание файла ====
 class DownloadFileView(APIView):
     permission_classes = [IsAuthenticated]
+    # True в ASGI-маршрутах (mycloud/asgi_urls.py): тело — асинхронный итератор
+    async_body = False
 
     def get(self, request, pk):
         try:
             file_obj = get_object_or_404(File, pk=pk)
             
-            if file_obj.user != request.user and not request.user.is_staff:
+            if file_obj.user_id != request.user.pk and not request.user.is_staff:
                 return Response({
                     "detail": "Доступ запрещён",
                     "code": "ACCESS_DENIED"
                 }, status=status.HTTP_403_FORBIDDEN)
 
-            file_path = Path(settings.MEDIA_ROOT) / file_obj.stored_name
-            
-            if not file_path.exists():
-                logger.warning(f"Файл не найден на диске: {file_path}")
+            # У клиента актуальная копия — 304 без открытия файла и без счётчиков
+            not_modified = conditional_response(request, file_obj)
+            if not_modified is not None:
+                return not_modified
+
+            # Поддерживаются Range/If-Range: докачка и перемотка видео.
+            # При отдаче через nginx наличие файла проверяет он сам
+            try:
+                response = file_response(request, file_obj, asynchronous=self.async_body)
+            except FileNotFoundError:
+                logger.warning(f"Файл не найден в хранилище: {paths.file_relative_path(file_obj)}")
                 return Response({
                     "detail": "Файл не найден на диске",
                     "code": "FILE_NOT_FOUND"
                 }, status=status.HTTP_404_NOT_FOUND)
 
-            # Обновляем время последнего скачивания
-            file_obj.last_download = timezone.now()
-            file_obj.save(update_fields=['last_download'])
+            # Счётчик и время последнего скачивания пишутся в БД пачками в фоне
+            download_counters.record(file_obj.pk)
             
             logger.info(f"Файл {file_obj.original_name} скачан пользователем {request.user.username}")
             
-            # Используем context manager для безопасного открытия файла
-            response = FileResponse(
-                open(file_path, 'rb'),
-                as_attachment=True,
-                filename=file_obj.original_name
-            )
-            response['Content-Length'] = file_path.stat().st_size
             return response
             
         except Exception as e:
@@ -595,32 +852,86 @@ class DownloadFileView(APIView):
                 "code": "DOWNLOAD_ERROR"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+# ==== Миниатюры изображений ====
+class ThumbnailView(APIView):
+    """
+    Миниатюра изображения фиксированного размера (THUMBNAIL_SIZES) в WebP или JPEG.
+    Пока миниатюра строится в фоне — 202 с Retry-After, без чтения оригинала.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, pk, size):
+        try:
+            file_obj = get_object_or_404(File, pk=pk)
+
+            if file_obj.user_id != request.user.pk and not request.user.is_staff:
+                return Response({
+                    "detail": "Доступ запрещён",
+                    "code": "ACCESS_DENIED"
+                }, status=status.HTTP_403_FORBIDDEN)
+
+            fmt = thumbnails.negotiate_format(request)
+            if size not in settings.THUMBNAIL_SIZES or fmt is None:
+                return Response({
+                    "detail": f"Размер: {', '.join(settings.THUMBNAIL_SIZES)}; формат: {', '.join(settings.THUMBNAIL_FORMATS)}",
+                    "code": "INVALID_THUMBNAIL"
+                }, status=status.HTTP_400_BAD_REQUEST)
+
+            if not thumbnails.supported(file_obj) or thumbnails.failed(file_obj.blob_id):
+                return Response({
+                    "detail": "Для этого файла миниатюра недоступна",
+                    "code": "THUMBNAIL_UNAVAILABLE"
+                }, status=status.HTTP_404_NOT_FOUND)
+
+            response = thumbnails.thumbnail_response(request, file_obj, size, fmt)
+            if response is None:
+                thumbnails.schedule(file_obj, priority=thumbnails.ON_DEMAND_PRIORITY)
+                response = Response({
+                    "status": "pending",
+                    "code": "THUMBNAIL_PENDING"
+                }, status=status.HTTP_202_ACCEPTED)
+                response['Retry-After'] = settings.THUMBNAIL_RETRY_AFTER
+                response['Cache-Control'] = 'no-store'
+            # Без ?fmt= формат зависит от Accept
+            patch_vary_headers(response, ['Accept'])
+            return response
+
+        except Http404:
+            raise
+        except Exception as e:
+            logger.error(f"Ошибка при получении миниатюры файла {pk}: {str(e)}")
+            return Response({
+                "error": "Ошибка при получении миниатюры",
+                "code": "THUMBNAIL_ERROR"
+            }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
 # ==== Скачивание по публичной ссылке ====
 class PublicDownloadView(APIView):
     permission_classes = [AllowAny]
     throttle_classes = [AnonRateThrottle]
+    async_body = False
 
     def get(self, request, public_link):
         try:
-            file_obj = get_object_or_404(File, public_link=public_link)
-            file_path = Path(settings.MEDIA_ROOT) / file_obj.stored_name
-            
-            if not file_path.exists():
-                logger.warning(f"Публичный файл не найден: {file_path}")
+            # Файлы пользователя, удаляемого в фоне, по публичным ссылкам уже не отдаются
+            file_obj = get_object_or_404(File, public_link=public_link, user__purge__isnull=True)
+
+            not_modified = conditional_response(request, file_obj, public=True)
+            if not_modified is not None:
+                return not_modified
+
+            # При отдаче через nginx наличие файла проверяет он сам
+            try:
+                response = file_response(request, file_obj, public=True, asynchronous=self.async_body)
+            except FileNotFoundError:
+                logger.warning(f"Публичный файл не найден: {paths.file_relative_path(file_obj)}")
                 raise Http404("Файл не найден")
 
-            # Обновляем счетчик скачиваний
-            file_obj.last_download = timezone.now()
-            file_obj.save(update_fields=['last_download'])
+            # Счётчик и время последнего скачивания пишутся в БД пачками в фоне
+            download_counters.record(file_obj.pk)
             
             logger.info(f"Файл {file_obj.original_name} скачан по публичной ссылке")
             
-            response = FileResponse(
-                open(file_path, 'rb'),
-                as_attachment=True,
-                filename=file_obj.original_name
-            )
-            response['Content-Length'] = file_path.stat().st_size
             return response
             
         except Http404:
@@ -629,6 +940,94 @@ class PublicDownloadView(APIView):
             logger.error(f"Ошибка при публичном скачивании {public_link}: {str(e)}")
             raise Http404("Файл не найден")
 
+# ==== Скачивание нескольких файлов одним ZIP-архивом ====
+class ArchiveDownloadView(APIView):
+    """
+    GET ?ids=1,2,3 или POST {"ids": [...]} — архив выбранных файлов.
+    Администратор может передать user_id, чтобы скачать все файлы пользователя.
+    Архив собирается на лету и сразу уходит клиенту, без временного файла.
+    """
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request):
+        ids = [part for part in request.query_params.get('ids', '').split(',') if part.strip()]
+        return self._archive(request, ids, request.query_params.get('user_id'))
+
+    def post(self, request):
+        ids = request.data.get('ids') or []
+        if not isinstance(ids, list):
+            ids = [ids]
+        return self._archive(request, ids, request.data.get('user_id'))
+
+    def _archive(self, request, ids, user_id):
+        try:
+            ids = [int(pk) for pk in ids]
+            user_id = int(user_id) if user_id not in (None, '') else None
+        except (TypeError, ValueError):
+            return Response({
+                "error": "Некорректный список файлов",
+                "code": "INVALID_FILE_IDS"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        if user_id is not None:
+            if not request.user.is_staff:
+                return Response({
+                    "detail": "Доступ запрещён",
+                    "code": "ACCESS_DENIED"
+                }, status=status.HTTP_403_FORBIDDEN)
+            files = File.objects.filter(user_id=user_id)
+            if ids:
+                files = files.filter(pk__in=ids)
+        elif ids:
+            files = File.objects.filter(pk__in=ids)
+            if not request.user.is_staff:
+                if files.exclude(user=request.user).exists():
+                    return Response({
+                        "detail": "Доступ запрещён",
+                        "code": "ACCESS_DENIED"
+                    }, status=status.HTTP_403_FORBIDDEN)
+        else:
+            return Response({
+                "error": "Не выбраны файлы для архива",
+                "code": "NO_FILES_SELECTED"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        files = list(files.order_by('original_name', 'id'))
+        if not files:
+            raise Http404("Файлы не найдены")
+        if len(files) > settings.ARCHIVE_MAX_FILES:
+            return Response({
+                "error": f"В архив можно включить не более {settings.ARCHIVE_MAX_FILES} файлов",
+                "code": "ARCHIVE_TOO_MANY_FILES"
+            }, status=status.HTTP_400_BAD_REQUEST)
+
+        download_counters.record([f.pk for f in files])
+        logger.info(f"Архив из {len(files)} файлов скачан пользователем {request.user.username}")
+
+        storage = get_driver()
+        response = StreamingHttpResponse(stream_zip(self._entries(storage, files), storage), content_type='application/zip')
+        response['Content-Disposition'] = f'attachment; filename="mycloud_{timezone.now():%Y%m%d_%H%M%S}.zip"'
+        # Сжатый поток не должен повторно сжиматься и буферизоваться прокси
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+    @staticmethod
+    def _entries(storage, files):
+        used_names = set()
+        for file_obj in files:
+            key = paths.file_relative_path(file_obj)
+            try:
+                size = storage.stat(key).size
+            except FileNotFoundError:
+                logger.warning(f"Файл не найден в хранилище и пропущен в архиве: {key}")
+                continue
+            yield (
+                unique_arcname(file_obj.original_name, used_names),
+                key,
+                size,
+                timezone.localtime(file_obj.uploaded_at),
+            )
+
 # ==== Админские эндпоинты ====
 class AdminUserListView(APIView):
     permission_classes = [IsAdminUser]
@@ -636,10 +1035,24 @@ class AdminUserListView(APIView):
 
     def get(self, request):
         try:
-            users_qs = User.objects.annotate(
-                file_count=Count('file'),
-                total_size=Sum('file__size')
-            ).select_related()
+            try:
+                fields = requested_fields(request, AdminUserSerializer)
+            except FieldsetError as e:
+                return Response({"error": e.message, "code": e.code}, status=status.HTTP_400_BAD_REQUEST)
+            ordering = request.GET.get('ordering', '-date_joined')
+            
+            # Счётчики файлов (из UserStorageUsage) — только если они запрошены или по ним сортируют
+            wanted = set(AdminUserSerializer.Meta.fields if fields is None else fields)
+            wanted.add(ordering.lstrip('-'))
+            aggregates = {}
+            if 'file_count' in wanted:
+                aggregates['file_count'] = Coalesce('storage_usage__file_count', 0)
+            if wanted & {'total_size', 'formatted_total_size'}:
+                aggregates['total_size'] = Coalesce('storage_usage__total_size', 0)
+            # Пользователи, удаляемые в фоне, в списке уже не показываются
+            users_qs = User.objects.filter(purge__isnull=True).annotate(**aggregates)
+            if fields is not None:
+                users_qs = restrict(users_qs, AdminUserSerializer, fields)
             
             # Фильтрация
             is_active = request.GET.get('is_active')
@@ -651,15 +1064,14 @@ class AdminUserListView(APIView):
                 users_qs = users_qs.filter(is_staff=is_staff.lower() == 'true')
             
             # Сортировка
-            ordering = request.GET.get('ordering', '-date_joined')
             users_qs = users_qs.order_by(ordering)
             
-            serializer = AdminUserSerializer(users_qs, many=True)
-            
-            return Response({
-                'count': users_qs.count(),
-                'users': serializer.data
-            })
+            # Список отдаётся потоком — в памяти только текущая пачка строк
+            context = {'fields': fields}
+            return streaming_listing(
+                {'count': users_qs.count()}, 'users', users_qs,
+                lambda chunk: AdminUserSerializer(chunk, many=True, context=context).data,
+            )
             
         except Exception as e:
             logger.error(f"Ошибка при получении списка пользователей: {str(e)}")
@@ -700,6 +1112,8 @@ class AdminUserUpdateView(APIView):
             
             if updated_fields:
                 user.save(update_fields=updated_fields)
+                # Деактивация и смена прав действуют со следующего запроса, а не по истечении токена
+                invalidate_auth_state(user.id)
                 
             logger.info(f"Пользователь {user.username} обновлен админом {request.user.username}: {updated_fields}")
             
@@ -742,37 +1156,18 @@ class AdminUserDeleteView(APIView):
                     "code": "INSUFFICIENT_PERMISSIONS"
                 }, status=status.HTTP_403_FORBIDDEN)
             
-            username = user.username
-            
-            # Удаляем файлы пользователя
-            files = File.objects.filter(user=user)
-            deleted_files_count = 0
-            
-            for f in files:
-                file_path = Path(settings.MEDIA_ROOT) / f.stored_name
-                if file_path.exists():
-                    try:
-                        file_path.unlink()
-                        deleted_files_count += 1
-                    except OSError as e:
-                        logger.warning(f"Не удалось удалить файл {file_path}: {str(e)}")
-                        
-            files.delete()
-            
-            # Удаляем пользователя
-            user.delete()
+            # Файлы удаляются в фоне пачками (storage/deletion.py), ответ не ждёт их удаления
+            purge = deletion.schedule(user, request.user.username)
             
-            # Очищаем кэш
-            cache.delete(f"user_stats_{user_id}")
-            
-            logger.info(f"Пользователь {username} и {deleted_files_count} его файлов удалены администратором {request.user.username}")
+            logger.info(f"Пользователь {user.username} поставлен в очередь на удаление администратором {request.user.username}")
             
             return Response({
-                "status": "deleted", 
+                "status": "pending",
                 "user_id": user_id,
-                "username": username,
-                "deleted_files": deleted_files_count
-            })
+                "username": user.username,
+                "purge": deletion.status(purge),
+                "status_url": f"/api/admin/purges/{purge.pk}/"
+            }, status=status.HTTP_202_ACCEPTED)
             
         except Exception as e:
             logger.error(f"Ошибка при удалении пользователя {user_id}: {str(e)}")
@@ -787,19 +1182,29 @@ class AdminUserFilesView(APIView):
     def get(self, request, user_id):
         try:
             user = get_object_or_404(User, pk=user_id)
-            files = File.objects.filter(user=user).order_by('-upload_at')
-            
-            serializer = FileSerializer(files, many=True, context={'request': request})
+            try:
+                fields = requested_fields(request, FileSerializer)
+            except FieldsetError as e:
+                return Response({"error": e.message, "code": e.code}, status=status.HTTP_400_BAD_REQUEST)
+            files = File.objects.filter(user=user).order_by('-uploaded_at')
+            if fields is None:
+                files = files.select_related('user')
+            else:
+                files = restrict(files, FileSerializer, fields)
             
-            return Response({
-                'user': {
-                    'id': user.id,
-                    'username': user.username,
-                    'email': user.email
+            context = {'request': request, 'fields': fields}
+            return streaming_listing(
+                {
+                    'user': {
+                        'id': user.id,
+                        'username': user.username,
+                        'email': user.email
+                    },
+                    'count': _user_file_count(user),
                 },
-                'count': files.count(),
-                'files': serializer.data
-            })
+                'files', files,
+                lambda chunk: FileSerializer(chunk, many=True, context=context).data,
+            )
             
         except Exception as e:
             logger.error(f"Ошибка при получении файлов пользователя {user_id}: {str(e)}")
@@ -808,6 +1213,23 @@ class AdminUserFilesView(APIView):
                 "code": "SERVER_ERROR"
             }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+class AdminJobQueueView(APIView):
+    """Глубина очереди фоновых задач: по статусам и по именам задач"""
+    permission_classes = [IsAdminUser]
+    throttle_classes = [AdminActionThrottle]
+
+    def get(self, request):
+        return Response(jobs.queue_stats())
+
+class AdminUserPurgeView(APIView):
+    """Прогресс фонового удаления пользователя"""
+    permission_classes = [IsAdminUser]
+    throttle_classes = [AdminActionThrottle]
+
+    def get(self, request, purge_id):
+        purge = get_object_or_404(UserPurge, pk=purge_id)
+        return Response(deletion.status(purge))
+
 # ==== Проверка здоровья API ====
 @api_view(['GET'])
 @permission_classes([AllowAny])
@@ -862,7 +1284,7 @@ class UserViewSet(viewsets.ModelViewSet):
     """
     CRUD операции для пользователей. Доступно только администраторам.
     """
-    queryset = User.objects.all().order_by('id')
+    queryset = User.objects.filter(purge__isnull=True).order_by('id')
     serializer_class = AdminUserSerializer
     permission_classes = [IsAdminUser]
     throttle_classes = [AdminActionThrottle]
@@ -893,6 +1315,9 @@ class UserViewSet(viewsets.ModelViewSet):
             raise ValidationError("Нельзя изменять свои собственные права")
         
         serializer.save()
+        invalidate_auth_state(serializer.instance.pk)
+        # Имя владельца входит в список его файлов
+        listing_cache.invalidate([serializer.instance.pk])
         logger.info(f"Пользователь {serializer.instance.username} обновлен админом {self.request.user.username}")
 
     def perform_destroy(self, instance):
@@ -907,22 +1332,10 @@ class UserViewSet(viewsets.ModelViewSet):
         if instance.is_superuser and not self.request.user.is_superuser:
             raise ValidationError("Недостаточно прав для удаления суперпользователя")
         
-        username = instance.username
-        
-        # Удаляем файлы пользователя
-        files = File.objects.filter(user=instance)
-        for f in files:
-            file_path = Path(settings.MEDIA_ROOT) / f.stored_name
-            if file_path.exists():
-                try:
-                    file_path.unlink()
-                except OSError as e:
-                    logger.warning(f"Не удалось удалить файл {file_path}: {str(e)}")
-        
-        files.delete()
-        instance.delete()
+        # Файлы и учётная запись удаляются в фоне (storage/deletion.py)
+        deletion.schedule(instance, self.request.user.username)
         
-        logger.info(f"Пользователь {username} удален администратором {self.request.user.username}")
+        logger.info(f"Пользователь {instance.username} поставлен в очередь на удаление администратором {self.request.user.username}")
 
 
 # ==== Класс-обертка для current_user_view (для совместимости) ====
@@ -7,17 +7,32 @@ django.setup()
 
 import pytest
 import tempfile
+from datetime import timedelta
 from pathlib import Path
 from django.test import override_settings
+from django.core.cache import cache
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
 from django.contrib.auth import get_user_model
 from rest_framework.test import APIClient
-from rest_framework_simplejwt.tokens import RefreshToken
 from storage.models import File
+from storage.tokens import StorageRefreshToken
 from PIL import Image
 
 User = get_user_model()
 
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """Счётчики throttling и кэш статистики не переносятся между тестами"""
+    cache.clear()
+    yield
+    cache.clear()
+
+@pytest.fixture(autouse=True)
+def sync_download_counters(settings):
+    """Без фонового потока: счётчики скачиваний пишутся в БД сразу"""
+    settings.DOWNLOAD_COUNTER_FLUSH_INTERVAL = 0
+
 @pytest.fixture
 def api_client():
     """API клиент для тестов"""
@@ -60,14 +75,14 @@ def admin_user(admin_data):
 @pytest.fixture
 def auth_client(api_client, user):
     """API клиент с авторизованным пользователем"""
-    refresh = RefreshToken.for_user(user)
+    refresh = StorageRefreshToken.for_user(user)
     api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
     return api_client
 
 @pytest.fixture
 def admin_client(api_client, admin_user):
     """API клиент с авторизованным админом"""
-    refresh = RefreshToken.for_user(admin_user)
+    refresh = StorageRefreshToken.for_user(admin_user)
     api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {refresh.access_token}')
     return api_client
 
@@ -119,4 +134,27 @@ def file_obj(user, temp_media_root):
         size=len('Test content'),
         comment='Test file',
         file_path='test_file.txt'
-    )
\ No newline at end of file
+    )
+
+
+FILE_NAMES = ['photo.JPG', 'report.pdf', 'archive.tar.gz', 'script.py', 'noext', 'movie.mkv', 'big.png']
+
+
+@pytest.fixture
+def make_files():
+    """Создаёт count записей File пользователя одним запросом: разные имена, размеры и комментарии"""
+    def make(user, count):
+        files = File.objects.bulk_create(
+            File(
+                user=user,
+                original_name=FILE_NAMES[i % len(FILE_NAMES)],
+                stored_name=f'{user.pk}_{i}',
+                public_link=f'link{user.pk}x{i}',
+                size=[5, 2048, 5 * 1024 * 1024, 11 * 1024 * 1024, 3 * 1024 ** 3][i % 5],
+                comment=f'comment {i}' if i % 2 else '',
+            )
+            for i in range(count)
+        )
+        File.objects.filter(pk__in=[f.pk for f in files[::3]]).update(last_download=timezone.now() - timedelta(days=1))
+        return files
+    return make
@@ -1,10 +1,17 @@
+import json
 import pytest
 from django.urls import reverse
 from rest_framework import status
 from django.contrib.auth import get_user_model
+from storage import jobs
 
 User = get_user_model()
 
+
+def streamed(response):
+    """Тело потокового JSON-ответа админских списков"""
+    return json.loads(b''.join(response.streaming_content))
+
 @pytest.mark.admin
 @pytest.mark.django_db
 class TestAdminUserList:
@@ -12,7 +19,33 @@ class TestAdminUserList:
         url = reverse('admin-user-list')
         response = admin_client.get(url)
         assert response.status_code == status.HTTP_200_OK
-        assert 'users' in response.data
+        assert 'users' in streamed(response)
+
+    def test_users_list_sparse_fields(self, admin_client, user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        url = reverse('admin-user-list')
+        with CaptureQueriesContext(connection) as ctx:
+            response = admin_client.get(url, {'fields': 'id,username', 'ordering': 'username'})
+            data = streamed(response)
+        assert response.status_code == status.HTTP_200_OK
+        assert all(set(u) == {'id', 'username'} for u in data['users'])
+        # Без запрошенных агрегатов таблица файлов не трогается
+        select = next(q['sql'] for q in ctx.captured_queries if 'auth_user' in q['sql'] and 'ORDER BY' in q['sql'])
+        assert 'storage_file' not in select and 'email' not in select
+
+    def test_users_list_exclude_keeps_aggregates(self, admin_client, user):
+        url = reverse('admin-user-list')
+        response = admin_client.get(url, {'exclude': 'email,formatted_last_login'})
+        assert response.status_code == status.HTTP_200_OK
+        row = streamed(response)['users'][0]
+        assert 'email' not in row and 'formatted_last_login' not in row
+        assert 'file_count' in row and 'formatted_total_size' in row
+
+    def test_users_list_unknown_field(self, admin_client):
+        response = admin_client.get(reverse('admin-user-list'), {'fields': 'id,password'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['code'] == 'INVALID_FIELDS'
 
     def test_get_users_list_as_user(self, auth_client):
         url = reverse('admin-user-list')
@@ -51,7 +84,9 @@ class TestAdminUserDelete:
     def test_delete_user_as_admin(self, admin_client, user):
         url = reverse('admin-user-delete', kwargs={'user_id': user.id})
         response = admin_client.delete(url)
-        assert response.status_code == status.HTTP_200_OK
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert not User.objects.get(id=user.id).is_active
+        jobs.run_pending()
         assert not User.objects.filter(id=user.id).exists()
 
     def test_delete_self_as_admin(self, admin_client, admin_user):
@@ -71,8 +106,14 @@ class TestAdminUserFiles:
     def test_get_user_files_as_admin(self, admin_client, file_obj):
         url = reverse('admin-user-files', kwargs={'user_id': file_obj.user.id})
         response = admin_client.get(url)
-        # endpoint returns 500 due to catch-all except
-        assert response.status_code == status.HTTP_500_INTERNAL_SERVER_ERROR
+        assert response.status_code == status.HTTP_200_OK
+        assert [f['id'] for f in streamed(response)['files']] == [file_obj.id]
+
+    def test_user_files_sparse_fields(self, admin_client, file_obj):
+        url = reverse('admin-user-files', kwargs={'user_id': file_obj.user.id})
+        response = admin_client.get(url, {'fields': 'id,original_name'})
+        assert response.status_code == status.HTTP_200_OK
+        assert streamed(response)['files'] == [{'id': file_obj.id, 'original_name': file_obj.original_name}]
 
     def test_get_nonexistent_user_files(self, admin_client):
         url = reverse('admin-user-files', kwargs={'user_id': 999})
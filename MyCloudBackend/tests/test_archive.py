@@ -0,0 +1,88 @@
+import io
+import zipfile
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework import status
+from storage.archives import stream_zip, unique_arcname
+from storage.models import File
+
+
+def upload(client, name, content):
+    url = reverse('file-upload')
+    response = client.post(url, {'file': SimpleUploadedFile(name, content)}, format='multipart')
+    assert response.status_code == status.HTTP_201_CREATED
+    return File.objects.get(pk=response.data['id'])
+
+
+def read_archive(response):
+    return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestArchiveDownload:
+    def test_archive_selected_files(self, auth_client, temp_media_root):
+        text = upload(auth_client, 'notes.txt', b'hello ' * 1000)
+        image = upload(auth_client, 'photo.jpg', b'\xff\xd8\xff' + b'x' * 500)
+        twin = upload(auth_client, 'notes.txt', b'second')
+
+        url = reverse('file-archive')
+        response = auth_client.get(url, {'ids': f'{text.id},{image.id},{twin.id}'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'application/zip'
+
+        archive = read_archive(response)
+        assert archive.testzip() is None
+        assert set(archive.namelist()) == {'notes.txt', 'notes (1).txt', 'photo.jpg'}
+        assert archive.getinfo('photo.jpg').compress_type == zipfile.ZIP_STORED
+        assert archive.getinfo('notes.txt').compress_type == zipfile.ZIP_DEFLATED
+        assert archive.read('photo.jpg') == b'\xff\xd8\xff' + b'x' * 500
+
+    def test_post_ids(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client, 'a.txt', b'aaa')
+        response = auth_client.post(reverse('file-archive'), {'ids': [file_obj.id]}, format='json')
+        assert response.status_code == status.HTTP_200_OK
+        assert read_archive(response).read('a.txt') == b'aaa'
+
+    def test_foreign_file_denied(self, auth_client, admin_user, temp_media_root):
+        foreign = File.objects.create(user=admin_user, original_name='x.txt', stored_name='x.txt', size=1)
+        response = auth_client.get(reverse('file-archive'), {'ids': str(foreign.id)})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_user_id_requires_admin(self, auth_client, user):
+        response = auth_client.get(reverse('file-archive'), {'user_id': user.id})
+        assert response.status_code == status.HTTP_403_FORBIDDEN
+
+    def test_admin_archives_all_user_files(self, auth_client, user, admin_user, temp_media_root):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        upload(auth_client, 'a.txt', b'a')
+        upload(auth_client, 'b.txt', b'b')
+        auth_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(admin_user).access_token}')
+        response = auth_client.get(reverse('file-archive'), {'user_id': user.id})
+        assert response.status_code == status.HTTP_200_OK
+        assert sorted(read_archive(response).namelist()) == ['a.txt', 'b.txt']
+
+    def test_no_ids(self, auth_client):
+        response = auth_client.get(reverse('file-archive'))
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['code'] == 'NO_FILES_SELECTED'
+
+
+class TestStreamZip:
+    def test_chunks_are_bounded(self, temp_media_root):
+        from datetime import datetime
+        from pathlib import Path
+        from storage.drivers import READ_CHUNK_SIZE, LocalStorageDriver
+        path = Path(temp_media_root) / 'data.bin'
+        path.write_bytes(bytes(range(256)) * 4096)  # 1MB
+        entries = [('data.bin', 'data.bin', path.stat().st_size, datetime(2024, 1, 1))]
+        chunks = list(stream_zip(entries, LocalStorageDriver()))
+        assert max(len(c) for c in chunks) <= READ_CHUNK_SIZE + 1024
+        archive = zipfile.ZipFile(io.BytesIO(b''.join(chunks)))
+        assert archive.read('data.bin') == path.read_bytes()
+
+    def test_unique_arcname(self):
+        used = set()
+        assert unique_arcname('a/b.txt', used) == 'a_b.txt'
+        assert unique_arcname('a/b.txt', used) == 'a_b (1).txt'
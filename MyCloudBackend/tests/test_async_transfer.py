@@ -0,0 +1,80 @@
+import pytest
+from asgiref.sync import async_to_sync
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import AsyncClient
+from storage.models import File
+from storage.tokens import StorageRefreshToken
+
+CONTENT = b'Test content'  # см. фикстуру file_obj
+
+User = get_user_model()
+
+
+@pytest.fixture
+def asgi_urls(settings):
+    """Маршруты процесса ASGI; представления выполняют запросы к БД в других потоках"""
+    settings.ROOT_URLCONF = 'mycloud.asgi_urls'
+
+
+def bearer(user):
+    return {'authorization': f'Bearer {StorageRefreshToken.for_user(user).access_token}'}
+
+
+@async_to_sync
+async def fetch(method, path, headers=None, **kwargs):
+    """Запрос через ASGI-обработчик; тело читается асинхронно, как его читает сервер"""
+    response = await getattr(AsyncClient(), method)(path, headers=headers or {}, **kwargs)
+    if response.streaming:
+        response.body = b''.join([chunk async for chunk in response.streaming_content])
+    else:
+        response.body = response.content
+    return response
+
+
+@pytest.mark.files
+@pytest.mark.django_db(transaction=True)
+class TestAsyncTransfer:
+    def test_download_streams_asynchronously(self, asgi_urls, user, file_obj):
+        response = fetch('get', f'/api/files/{file_obj.id}/download/', bearer(user))
+        assert response.status_code == 200
+        assert response.is_async
+        assert response.body == CONTENT
+        assert response['Content-Length'] == str(len(CONTENT))
+        assert 'attachment' in response['Content-Disposition']
+
+    def test_range_download(self, asgi_urls, user, file_obj):
+        headers = {**bearer(user), 'range': 'bytes=5-'}
+        response = fetch('get', f'/api/files/{file_obj.id}/download/', headers)
+        assert response.status_code == 206
+        assert response.body == CONTENT[5:]
+
+    def test_not_modified(self, asgi_urls, user, file_obj):
+        first = fetch('get', f'/api/files/{file_obj.id}/download/', bearer(user))
+        headers = {**bearer(user), 'if-none-match': first['ETag']}
+        assert fetch('get', f'/api/files/{file_obj.id}/download/', headers).status_code == 304
+
+    def test_foreign_file_forbidden(self, asgi_urls, file_obj):
+        other = User.objects.create_user(username='otheruser', email='o@example.com', password='Other123!')
+        response = fetch('get', f'/api/files/{file_obj.id}/download/', bearer(other))
+        assert response.status_code == 403
+
+    def test_requires_authentication(self, asgi_urls, file_obj):
+        assert fetch('get', f'/api/files/{file_obj.id}/download/').status_code == 401
+
+    def test_public_download(self, asgi_urls, file_obj):
+        file_obj.public_link = 'asyncpublic'
+        file_obj.save(update_fields=['public_link'])
+        response = fetch('get', '/api/files/download/public/asyncpublic/')
+        assert response.status_code == 200
+        assert response.body == CONTENT
+        assert fetch('get', '/api/files/download/public/missing/').status_code == 404
+
+    def test_upload(self, asgi_urls, user, temp_media_root):
+        upload = SimpleUploadedFile('async.txt', b'uploaded asynchronously', 'text/plain')
+        response = fetch('post', '/api/files/upload/', bearer(user), data={'file': upload})
+        assert response.status_code == 201
+        assert File.objects.get(user=user).original_name == 'async.txt'
+
+        download = fetch('get', f"/api/files/{response.json()['id']}/download/", bearer(user))
+        assert download.body == b'uploaded asynchronously'
@@ -0,0 +1,147 @@
+import pytest
+from datetime import timedelta
+from django.core.cache import cache
+from django.core.management import call_command
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import BlacklistMixin
+from rest_framework_simplejwt.utils import aware_utcnow
+from storage import blacklist
+from storage.blacklist import BlacklistFilter, BloomFilter
+from storage.tokens import StorageRefreshToken
+
+
+@pytest.fixture
+def bloom(monkeypatch):
+    """
+    Фильтр «нового процесса», не знающий о прошлых тестах. «Воркеры» тестов
+    работают в одном процессе и делят его LocMemCache — считаем кэш общим.
+    """
+    monkeypatch.setattr(blacklist, 'cache_is_shared', lambda using='default': True)
+    fresh = BlacklistFilter()
+    monkeypatch.setattr(blacklist, 'blacklist_filter', fresh)
+    return fresh
+
+
+def refresh(refresh_token):
+    return APIClient().post(reverse('token_refresh'), {'refresh': str(refresh_token)}, format='json')
+
+
+class TestBloomFilter:
+    def test_no_false_negatives_and_low_error_rate(self):
+        bloom = BloomFilter(1000, 0.01)
+        added = [f'jti-{i}' for i in range(1000)]
+        for value in added:
+            bloom.add(value)
+        assert all(value in bloom for value in added)
+        false_positives = sum(f'other-{i}' in bloom for i in range(10000))
+        assert false_positives < 300
+
+
+@pytest.mark.auth
+@pytest.mark.django_db
+class TestBlacklistFilter:
+    def test_refresh_skips_blacklist_query(self, user, bloom, mocker, django_capture_on_commit_callbacks):
+        bloom.rebuild()
+        check = mocker.spy(BlacklistMixin, 'check_blacklist')
+        with django_capture_on_commit_callbacks(execute=True):
+            response = refresh(StorageRefreshToken.for_user(user))
+        assert response.status_code == status.HTTP_200_OK
+        assert check.call_count == 0
+
+    def test_rotated_token_rejected(self, user, bloom, django_capture_on_commit_callbacks):
+        token = StorageRefreshToken.for_user(user)
+        with django_capture_on_commit_callbacks(execute=True):
+            assert refresh(token).status_code == status.HTTP_200_OK
+        assert refresh(token).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_logout_revokes_refresh_token(self, user, bloom, django_capture_on_commit_callbacks):
+        token = StorageRefreshToken.for_user(user)
+        client = APIClient()
+        client.credentials(HTTP_AUTHORIZATION=f'Bearer {token.access_token}')
+        with django_capture_on_commit_callbacks(execute=True):
+            client.post(reverse('logout'), {'refresh': str(token)}, format='json')
+        assert refresh(token).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_revocation_visible_to_other_workers(self, user, bloom, django_capture_on_commit_callbacks):
+        other = BlacklistFilter()
+        token = StorageRefreshToken.for_user(user)
+        jti = token['jti']
+        assert other.might_contain(jti) is False
+
+        with django_capture_on_commit_callbacks(execute=True):
+            token.blacklist()
+        assert other.might_contain(jti) is True
+
+    def test_built_from_database(self, user, bloom):
+        token = StorageRefreshToken.for_user(user)
+        token.blacklist()
+        assert BlacklistFilter().might_contain(token['jti']) is True
+
+    def test_missing_entry_falls_back_to_database(self, user, bloom, django_capture_on_commit_callbacks):
+        other = BlacklistFilter()
+        other.rebuild()
+        token = StorageRefreshToken.for_user(user)
+        with django_capture_on_commit_callbacks(execute=True):
+            token.blacklist()
+        cache.delete(blacklist._entry_key(other.number + 1))
+        assert other.might_contain('unrelated') is True
+
+
+@pytest.mark.auth
+@pytest.mark.django_db
+class TestProcessLocalCache:
+    @pytest.fixture
+    def worker_caches(self, settings):
+        settings.CACHES = {
+            **settings.CACHES,
+            'worker_a': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker-a'},
+            'worker_b': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker-b'},
+        }
+
+    def test_revocation_in_other_worker_checked_in_database(self, user, worker_caches, monkeypatch,
+                                                           django_capture_on_commit_callbacks):
+        worker_a, worker_b = BlacklistFilter('worker_a'), BlacklistFilter('worker_b')
+        token = StorageRefreshToken.for_user(user)
+        assert worker_b.might_contain(token['jti']) is True
+
+        # Обновление в воркере A отзывает токен (BLACKLIST_AFTER_ROTATION)
+        monkeypatch.setattr(blacklist, 'blacklist_filter', worker_a)
+        with django_capture_on_commit_callbacks(execute=True):
+            assert refresh(token).status_code == status.HTTP_200_OK
+
+        # Воркер B кэш воркера A не видит — повтор токена отклоняется проверкой в БД
+        monkeypatch.setattr(blacklist, 'blacklist_filter', worker_b)
+        assert refresh(token).status_code == status.HTTP_401_UNAUTHORIZED
+
+
+@pytest.mark.auth
+@pytest.mark.django_db
+class TestPurgeExpiredTokens:
+    def make_token(self, user, jti, expires_in):
+        now = aware_utcnow()
+        return OutstandingToken.objects.create(
+            user=user, jti=jti, token='-', created_at=now, expires_at=now + expires_in,
+        )
+
+    def test_purges_expired_in_batches(self, user):
+        for i in range(5):
+            BlacklistedToken.objects.create(token=self.make_token(user, f'old-{i}', timedelta(days=-1)))
+        fresh = [self.make_token(user, f'new-{i}', timedelta(days=1)) for i in range(3)]
+
+        call_command('purge_expired_tokens', '--batch-size', '2')
+
+        assert set(OutstandingToken.objects.values_list('pk', flat=True)) == {token.pk for token in fresh}
+        assert not BlacklistedToken.objects.exists()
+
+    def test_stops_at_unexpired_unless_full(self, user):
+        self.make_token(user, 'fresh', timedelta(days=1))
+        self.make_token(user, 'old', timedelta(days=-1))
+
+        call_command('purge_expired_tokens', '--batch-size', '1')
+        assert OutstandingToken.objects.count() == 2
+
+        call_command('purge_expired_tokens', '--batch-size', '1', '--full')
+        assert list(OutstandingToken.objects.values_list('jti', flat=True)) == ['fresh']
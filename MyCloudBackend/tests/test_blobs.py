@@ -0,0 +1,159 @@
+import hashlib
+import pytest
+from pathlib import Path
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from storage import blobs, drivers, jobs
+from storage.models import Blob, File, Job
+
+CONTENT = b'Same bytes uploaded twice'
+
+
+def upload(client, name='doc.txt', content=CONTENT):
+    url = reverse('file-upload')
+    response = client.post(url, {'file': SimpleUploadedFile(name, content, content_type='text/plain')}, format='multipart')
+    assert response.status_code == status.HTTP_201_CREATED
+    return File.objects.get(pk=response.data['id'])
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestBlobStore:
+    def test_identical_uploads_share_blob(self, auth_client, temp_media_root):
+        first = upload(auth_client, 'a.txt')
+        second = upload(auth_client, 'b.txt')
+
+        assert first.blob_id == second.blob_id == hashlib.sha256(CONTENT).hexdigest()
+        assert first.stored_name != second.stored_name
+        assert Blob.objects.get(pk=first.blob_id).ref_count == 2
+        assert Path(first.get_file_path()).read_bytes() == CONTENT
+
+    def test_blob_removed_with_last_reference(self, auth_client, temp_media_root, django_capture_on_commit_callbacks):
+        first = upload(auth_client, 'a.txt')
+        second = upload(auth_client, 'b.txt')
+        blob_path = Path(first.get_file_path())
+
+        with django_capture_on_commit_callbacks(execute=True):
+            auth_client.delete(reverse('file-delete', kwargs={'pk': first.id}))
+        assert Blob.objects.get(pk=second.blob_id).ref_count == 1
+        assert blob_path.exists()
+
+        with django_capture_on_commit_callbacks(execute=True):
+            auth_client.delete(reverse('file-delete', kwargs={'pk': second.id}))
+        assert not Blob.objects.exists()
+        # Файл из хранилища удаляет фоновая задача
+        assert blob_path.exists()
+        assert jobs.run_pending() == 1
+        assert not blob_path.exists()
+
+    def test_user_delete_releases_blobs(self, auth_client, user, admin_user, temp_media_root):
+        from rest_framework_simplejwt.tokens import RefreshToken
+        upload(auth_client, 'a.txt')
+        upload(auth_client, 'b.txt')
+        auth_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(admin_user).access_token}')
+        response = auth_client.delete(reverse('admin-user-delete', kwargs={'user_id': user.id}))
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['purge']['total_files'] == 2
+        jobs.run_pending()
+        assert not Blob.objects.exists()
+
+    def test_rolled_back_upload_content_removed(self, temp_media_root):
+        source = Path(blobs.new_temp_path())
+        source.write_bytes(CONTENT)
+        sha256 = hashlib.sha256(CONTENT).hexdigest()
+
+        blobs.prepare(str(source), sha256)
+        with pytest.raises(RuntimeError):
+            with transaction.atomic():
+                blob = blobs.store(str(source), sha256, len(CONTENT))
+                raise RuntimeError('File не создан')
+        blob_path = Path(temp_media_root) / blob.relative_path
+        assert not Blob.objects.exists()
+        assert blob_path.exists()
+
+        # Отложенная проверка находит содержимое без записи Blob
+        Job.objects.filter(name='blobs.remove_files').update(run_at=timezone.now())
+        assert jobs.run_pending() == 1
+        assert not blob_path.exists()
+
+    def test_orphan_check_keeps_committed_content(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client, 'a.txt')
+        upload(auth_client, 'b.txt')
+        # Проверку ставит только первая загрузка содержимого
+        assert Job.objects.filter(name='blobs.remove_files').count() == 1
+
+        Job.objects.filter(name='blobs.remove_files').update(run_at=timezone.now())
+        jobs.run_pending()
+        assert Path(file_obj.get_file_path()).read_bytes() == CONTENT
+
+    def test_content_removed_before_reupload_is_saved_again(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client, 'a.txt')
+        blob_path = Path(file_obj.get_file_path())
+        auth_client.delete(reverse('file-delete', kwargs={'pk': file_obj.id}))
+
+        # Загрузка того же содержимого прошла prepare() до того, как задача удалила файл
+        source = Path(blobs.new_temp_path())
+        source.write_bytes(CONTENT)
+        blobs.prepare(str(source), file_obj.blob_id)
+        jobs.run_pending()
+        assert not blob_path.exists()
+
+        # store() под блокировкой видит, что содержимого нет, и сохраняет его заново
+        blobs.store(str(source), file_obj.blob_id, len(CONTENT))
+        assert blob_path.read_bytes() == CONTENT
+
+    def test_migrate_legacy_files(self, user, temp_media_root):
+        for name in ('1_a.txt', '1_b.txt'):
+            (Path(temp_media_root) / name).write_bytes(CONTENT)
+            File.objects.create(user=user, original_name=name, stored_name=name, size=len(CONTENT), file_path=name)
+
+        call_command('migrate_to_blobs', stdout=open('/dev/null', 'w'))
+
+        assert set(File.objects.values_list('blob_id', flat=True)) == {hashlib.sha256(CONTENT).hexdigest()}
+        assert Blob.objects.get().ref_count == 2
+        assert not (Path(temp_media_root) / '1_a.txt').exists()
+        assert Path(File.objects.first().get_file_path()).read_bytes() == CONTENT
+
+    def test_new_blobs_are_sharded(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client, 'a.txt')
+        sha256 = file_obj.blob_id
+        expected = Path(temp_media_root) / 'blobs' / sha256[:2] / sha256[2:4] / sha256
+        assert Path(file_obj.get_file_path()) == expected
+        assert expected.read_bytes() == CONTENT
+
+    def test_shard_media_moves_flat_blobs(self, user, temp_media_root, settings):
+        settings.BLOB_FLAT_LAYOUT = True
+        sha256 = hashlib.sha256(CONTENT).hexdigest()
+        flat = Path(temp_media_root) / 'blobs' / sha256
+        flat.parent.mkdir()
+        flat.write_bytes(CONTENT)
+        blob = Blob.objects.create(sha256=sha256, size=len(CONTENT), ref_count=1)
+        file_obj = File.objects.create(
+            user=user, original_name='a.txt', stored_name='1_a.txt', size=len(CONTENT),
+            file_path=f'blobs/{sha256}', blob=blob
+        )
+        assert Path(file_obj.get_file_path()) == flat
+
+        call_command('shard_media', stdout=open('/dev/null', 'w'))
+        # Повторный запуск ничего не ломает
+        call_command('shard_media', stdout=open('/dev/null', 'w'))
+
+        file_obj.refresh_from_db()
+        assert not flat.exists()
+        assert Path(file_obj.get_file_path()).read_bytes() == CONTENT
+        assert file_obj.file_path == f'blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
+
+    def test_flat_layout_is_not_checked_by_default(self, temp_media_root, monkeypatch):
+        sha256 = hashlib.sha256(CONTENT).hexdigest()
+        flat = Path(temp_media_root) / 'blobs' / sha256
+        flat.parent.mkdir()
+        flat.write_bytes(CONTENT)
+        blob = Blob.objects.create(sha256=sha256, size=len(CONTENT), ref_count=1)
+
+        # Без BLOB_FLAT_LAYOUT хранилище не опрашивается
+        monkeypatch.setattr(drivers, 'get_driver', None)
+        assert blob.current_relative_path() == f'blobs/{sha256[:2]}/{sha256[2:4]}/{sha256}'
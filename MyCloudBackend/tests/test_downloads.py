@@ -0,0 +1,195 @@
+import pytest
+from django.urls import reverse
+from rest_framework import status
+from storage.downloads import RangeNotSatisfiable, parse_range_header
+from storage.models import File
+
+CONTENT = b'Test content'  # см. фикстуру file_obj
+
+
+def body(response):
+    return b''.join(response.streaming_content)
+
+
+@pytest.mark.parametrize('header, expected', [
+    ('bytes=0-3', [(0, 3)]),
+    ('bytes=5-', [(5, 11)]),
+    ('bytes=-4', [(8, 11)]),
+    ('bytes=0-100', [(0, 11)]),
+    ('bytes=8-9, 0-1', [(8, 9), (0, 1)]),
+    ('bytes=0-5, 3-8', [(0, 8)]),
+    ('items=0-1', None),
+    ('bytes=abc', None),
+    ('bytes=5-2', None),
+])
+def test_parse_range_header(header, expected):
+    assert parse_range_header(header, len(CONTENT)) == expected
+
+
+def test_parse_range_header_unsatisfiable():
+    with pytest.raises(RangeNotSatisfiable):
+        parse_range_header('bytes=100-200', len(CONTENT))
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestRangeDownload:
+    def url(self, file_obj):
+        return reverse('file-download', kwargs={'pk': file_obj.id})
+
+    def test_full_download_advertises_ranges(self, auth_client, file_obj):
+        response = auth_client.get(self.url(file_obj))
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Accept-Ranges'] == 'bytes'
+        assert body(response) == CONTENT
+
+    def test_single_range(self, auth_client, file_obj):
+        response = auth_client.get(self.url(file_obj), HTTP_RANGE='bytes=5-')
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response['Content-Range'] == f'bytes 5-11/{len(CONTENT)}'
+        assert response['Content-Length'] == '7'
+        assert body(response) == b'content'
+
+    def test_multiple_ranges(self, auth_client, file_obj):
+        response = auth_client.get(self.url(file_obj), HTTP_RANGE='bytes=0-3,5-11')
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert response['Content-Type'].startswith('multipart/byteranges; boundary=')
+        data = body(response)
+        assert int(response['Content-Length']) == len(data)
+        assert b'Content-Range: bytes 0-3/12\r\n\r\nTest\r\n' in data
+        assert b'Content-Range: bytes 5-11/12\r\n\r\ncontent\r\n' in data
+
+    def test_unsatisfiable_range(self, auth_client, file_obj):
+        response = auth_client.get(self.url(file_obj), HTTP_RANGE='bytes=50-60')
+        assert response.status_code == status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE
+        assert response['Content-Range'] == f'bytes */{len(CONTENT)}'
+
+    def test_if_range_mismatch_returns_full_file(self, auth_client, file_obj):
+        response = auth_client.get(self.url(file_obj), HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE='"stale"')
+        assert response.status_code == status.HTTP_200_OK
+        assert body(response) == CONTENT
+
+    def test_if_range_match(self, auth_client, file_obj):
+        etag = auth_client.get(self.url(file_obj))['ETag']
+        response = auth_client.get(self.url(file_obj), HTTP_RANGE='bytes=0-3', HTTP_IF_RANGE=etag)
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert body(response) == b'Test'
+
+    def test_public_link_range(self, api_client, file_obj):
+        url = reverse('file-public-download', kwargs={'public_link': file_obj.public_link})
+        response = api_client.get(url, HTTP_RANGE='bytes=-7')
+        assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+        assert body(response) == b'content'
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestAccelRedirect:
+    def test_download_offloaded_to_nginx(self, auth_client, file_obj, settings):
+        settings.FILE_DELIVERY_MODE = 'x-accel'
+        response = auth_client.get(reverse('file-download', kwargs={'pk': file_obj.id}))
+        assert response.status_code == status.HTTP_200_OK
+        assert response['X-Accel-Redirect'] == f'/protected-media/{file_obj.stored_name}'
+        assert 'attachment' in response['Content-Disposition']
+        assert response.content == b''
+
+    def test_public_download_offloaded_without_touching_disk(self, api_client, file_obj, settings):
+        settings.FILE_DELIVERY_MODE = 'x-accel'
+        file_obj.file_path = 'missing.bin'
+        file_obj.stored_name = 'missing.bin'
+        file_obj.save()
+        url = reverse('file-public-download', kwargs={'public_link': file_obj.public_link})
+        response = api_client.get(url)
+        assert response.status_code == status.HTTP_200_OK
+        assert response['X-Accel-Redirect'] == '/protected-media/missing.bin'
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestConditionalDownload:
+    def url(self, file_obj):
+        return reverse('file-download', kwargs={'pk': file_obj.id})
+
+    def test_validators_present(self, auth_client, file_obj):
+        response = auth_client.get(self.url(file_obj))
+        body(response)
+        assert response['ETag']
+        assert response['Last-Modified']
+        assert response['Cache-Control'] == 'private, no-cache'
+
+    def test_if_none_match_returns_304(self, auth_client, file_obj, monkeypatch):
+        etag = auth_client.get(self.url(file_obj))['ETag']
+        file_obj.refresh_from_db()
+        last_download = file_obj.last_download
+
+        # Файл не должен открываться
+        monkeypatch.setattr('storage.drivers.LocalStorageDriver.open', lambda *a, **kw: pytest.fail('file opened'))
+        response = auth_client.get(self.url(file_obj), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response['ETag'] == etag
+        file_obj.refresh_from_db()
+        assert file_obj.last_download == last_download
+
+    def test_if_modified_since_returns_304(self, auth_client, file_obj):
+        last_modified = auth_client.get(self.url(file_obj))['Last-Modified']
+        response = auth_client.get(self.url(file_obj), HTTP_IF_MODIFIED_SINCE=last_modified)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_stale_etag_returns_file(self, auth_client, file_obj):
+        response = auth_client.get(self.url(file_obj), HTTP_IF_NONE_MATCH='"other"')
+        assert response.status_code == status.HTTP_200_OK
+        assert body(response) == CONTENT
+
+    def test_public_link_is_cacheable(self, api_client, file_obj, settings):
+        url = reverse('file-public-download', kwargs={'public_link': file_obj.public_link})
+        response = api_client.get(url)
+        body(response)
+        assert response['Cache-Control'] == f'public, max-age={settings.PUBLIC_DOWNLOAD_MAX_AGE}'
+        response = api_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestDownloadCounters:
+    @pytest.fixture
+    def buffered(self, settings, monkeypatch):
+        from storage import download_counters
+        settings.DOWNLOAD_COUNTER_FLUSH_INTERVAL = 3600
+        monkeypatch.setattr(download_counters, '_ensure_flusher', lambda: None)
+        yield download_counters
+        download_counters._counts.clear()
+        download_counters._last_seen.clear()
+
+    def test_downloads_buffered_then_flushed(self, auth_client, file_obj, buffered, django_assert_num_queries):
+        url = reverse('file-download', kwargs={'pk': file_obj.id})
+        for _ in range(3):
+            body(auth_client.get(url))
+        public_url = reverse('file-public-download', kwargs={'public_link': file_obj.public_link})
+        body(auth_client.get(public_url))
+
+        file_obj.refresh_from_db()
+        assert file_obj.download_count == 0
+        assert file_obj.last_download is None
+        assert buffered.pending() == {file_obj.id: 4}
+
+        # UPDATE пачки и выборка владельцев для сброса кэша списков
+        with django_assert_num_queries(2):
+            assert buffered.flush() == 1
+        file_obj.refresh_from_db()
+        assert file_obj.download_count == 4
+        assert file_obj.last_download is not None
+        assert buffered.pending() == {}
+
+    def test_flush_adds_to_existing_count(self, file_obj, buffered):
+        File.objects.filter(pk=file_obj.pk).update(download_count=10)
+        buffered.record([file_obj.pk, file_obj.pk])
+        buffered.flush()
+        file_obj.refresh_from_db()
+        assert file_obj.download_count == 12
+
+    def test_overflow_flushes_inline(self, file_obj, buffered, settings):
+        settings.DOWNLOAD_COUNTER_MAX_PENDING = 1
+        buffered.record(file_obj.pk)
+        file_obj.refresh_from_db()
+        assert file_obj.download_count == 1
@@ -0,0 +1,116 @@
+import io
+import boto3
+import pytest
+from moto import mock_aws
+from pathlib import Path
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework import status
+from storage.drivers import LocalStorageDriver, S3StorageDriver, StorageDriver, get_driver
+from storage.models import File
+
+CONTENT = b'0123456789' * 10000
+
+S3_OPTIONS = {'bucket': 'mycloud-test', 'region_name': 'us-east-1', 'access_key': 'test', 'secret_key': 'test'}
+
+
+@pytest.fixture
+def s3_bucket(monkeypatch):
+    """S3 поверх moto: без сети и настоящего бакета"""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'test')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'test')
+    with mock_aws():
+        boto3.client('s3', region_name='us-east-1').create_bucket(Bucket=S3_OPTIONS['bucket'])
+        yield S3_OPTIONS
+
+
+@pytest.fixture(params=['local', 's3'])
+def driver(request, temp_media_root):
+    if request.param == 'local':
+        return LocalStorageDriver()
+    return S3StorageDriver(request.getfixturevalue('s3_bucket'))
+
+
+class TestDriverContract:
+    def test_write_stat_read(self, driver):
+        driver.write('blobs/aa/bb/key', io.BytesIO(CONTENT))
+        assert driver.stat('blobs/aa/bb/key').size == len(CONTENT)
+        assert b''.join(driver.read('blobs/aa/bb/key')) == CONTENT
+        assert b''.join(driver.read('blobs/aa/bb/key', 10, 19)) == CONTENT[10:20]
+        assert driver.open('blobs/aa/bb/key').read() == CONTENT
+
+    def test_save_file_moves_source(self, driver, temp_media_root):
+        source = Path(temp_media_root) / 'source.tmp'
+        source.write_bytes(CONTENT)
+        driver.save_file(str(source), 'blobs/cc/dd/key')
+        assert not source.exists()
+        assert driver.exists('blobs/cc/dd/key')
+
+    def test_missing_object(self, driver):
+        assert not driver.exists('nope')
+        with pytest.raises(FileNotFoundError):
+            driver.stat('nope')
+        with pytest.raises(FileNotFoundError):
+            b''.join(driver.read('nope'))
+        driver.delete('nope')
+
+    def test_delete_many(self, driver):
+        keys = [f'k/{i}' for i in range(5)]
+        for key in keys:
+            driver.write(key, io.BytesIO(b'x'))
+        driver.delete_many(keys + ['k/missing'])
+        assert not any(driver.exists(key) for key in keys)
+
+
+def test_incomplete_driver_rejected():
+    class ReadOnlyDriver(StorageDriver):
+        def open(self, key):
+            return io.BytesIO(CONTENT)
+
+    # Драйвер без save_file/write/... не создаётся, а не падает при первой загрузке
+    with pytest.raises(TypeError, match='save_file'):
+        ReadOnlyDriver()
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestS3Views:
+    def test_upload_and_ranged_download(self, auth_client, s3_bucket, temp_media_root):
+        with override_settings(STORAGE_DRIVER='s3', S3_STORAGE=s3_bucket):
+            assert isinstance(get_driver(), S3StorageDriver)
+            upload = SimpleUploadedFile('data.bin', CONTENT)
+            response = auth_client.post(reverse('file-upload'), {'file': upload}, format='multipart')
+            assert response.status_code == status.HTTP_201_CREATED
+            # На локальном диске содержимое не остаётся
+            assert not (Path(temp_media_root) / 'blobs').exists()
+
+            url = reverse('file-download', kwargs={'pk': response.data['id']})
+            response = auth_client.get(url, HTTP_RANGE='bytes=100-199')
+            assert response.status_code == status.HTTP_206_PARTIAL_CONTENT
+            assert b''.join(response.streaming_content) == CONTENT[100:200]
+        assert isinstance(get_driver(), LocalStorageDriver)
+
+    def test_upload_outside_transaction(self, auth_client, s3_bucket, temp_media_root, mocker):
+        with override_settings(STORAGE_DRIVER='s3', S3_STORAGE=s3_bucket):
+            write = S3StorageDriver.write
+            # Сам тест выполняется в транзакции — сравниваем глубину вложенности
+            outer_depth = len(connection.atomic_blocks)
+            depths = []
+
+            def tracked_write(driver, key, stream):
+                depths.append(len(connection.atomic_blocks))
+                return write(driver, key, stream)
+
+            mocker.patch.object(S3StorageDriver, 'write', tracked_write)
+            save_file = mocker.patch.object(S3StorageDriver, 'save_file')
+            upload = SimpleUploadedFile('data.bin', CONTENT)
+            response = auth_client.post(reverse('file-upload'), {'file': upload}, format='multipart')
+            assert response.status_code == status.HTTP_201_CREATED
+
+            # Содержимое загружено до транзакции, store() его только нашёл
+            assert depths == [outer_depth]
+            save_file.assert_not_called()
+            file_obj = File.objects.get(pk=response.data['id'])
+            assert b''.join(get_driver().read(file_obj.blob.relative_path)) == CONTENT
@@ -137,3 +137,177 @@ class TestPublicDownload:
         url = reverse('file-public-download', kwargs={'public_link': 'invalid'})
         response = api_client.get(url)
         assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestFileListPagination:
+    @pytest.fixture
+    def many_files(self, user):
+        # Одинаковые размеры — проверяем устойчивость порядка по id
+        return [
+            File.objects.create(user=user, original_name=f'f{i:02d}.txt', stored_name=f's{i}', size=i % 3)
+            for i in range(7)
+        ]
+
+    def walk(self, client, params):
+        from urllib.parse import urlparse
+        response = client.get(reverse('file-list'), params)
+        pages = [response.data]
+        while response.data['next']:
+            response = client.get(reverse('file-list') + '?' + urlparse(response.data['next']).query)
+            pages.append(response.data)
+        return pages
+
+    @pytest.mark.parametrize('ordering', ['size', '-size', 'original_name', '-uploaded_at'])
+    def test_cursor_walk_matches_full_ordering(self, auth_client, many_files, ordering):
+        pages = self.walk(auth_client, {'ordering': ordering, 'page_size': 3})
+        ids = [f['id'] for page in pages for f in page['files']]
+        expected = list(File.objects.order_by(ordering, ('-' if ordering.startswith('-') else '') + 'id')
+                        .values_list('id', flat=True))
+        assert ids == expected
+        assert [len(page['files']) for page in pages] == [3, 3, 1]
+        assert pages[0]['count'] == 7
+        assert pages[1]['count'] is None
+
+    def test_previous_returns_same_page(self, auth_client, many_files):
+        from urllib.parse import urlparse
+        pages = self.walk(auth_client, {'ordering': 'size', 'page_size': 3})
+        previous = auth_client.get(reverse('file-list') + '?' + urlparse(pages[2]['previous']).query)
+        assert [f['id'] for f in previous.data['files']] == [f['id'] for f in pages[1]['files']]
+        first = auth_client.get(reverse('file-list') + '?' + urlparse(previous.data['previous']).query)
+        assert [f['id'] for f in first.data['files']] == [f['id'] for f in pages[0]['files']]
+        assert first.data['previous'] is None
+
+    def test_invalid_ordering(self, auth_client):
+        response = auth_client.get(reverse('file-list'), {'ordering': 'stored_name'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['code'] == 'INVALID_ORDERING'
+
+    def test_invalid_cursor(self, auth_client):
+        response = auth_client.get(reverse('file-list'), {'cursor': 'garbage'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['code'] == 'INVALID_CURSOR'
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestFileListFields:
+    def test_fields_limit_keys_and_columns(self, auth_client, user):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        for i in range(3):
+            File.objects.create(user=user, original_name=f'f{i}.txt', stored_name=f's{i}', size=i, comment='c')
+        with CaptureQueriesContext(connection) as ctx:
+            response = auth_client.get(reverse('file-list'), {'fields': 'id,original_name,size', 'page_size': 2})
+        assert response.status_code == status.HTTP_200_OK
+        assert [list(f) for f in response.data['files']] == [['id', 'original_name', 'size']] * 2
+        select = next(q['sql'] for q in ctx.captured_queries if 'FROM "storage_file"' in q['sql'] and 'LIMIT' in q['sql'])
+        assert '"comment"' not in select and 'auth_user' not in select
+        # Курсор следующей страницы сохраняет набор полей
+        assert 'fields=' in response.data['next']
+
+    def test_exclude_and_user_fields(self, auth_client, user, file_obj):
+        response = auth_client.get(reverse('file-list'), {'exclude': 'public_url,comment,stored_name'})
+        row = response.data['files'][0]
+        assert 'public_url' not in row and 'comment' not in row and 'stored_name' not in row
+        assert row['user_username'] == user.username and row['user_id'] == user.id
+
+    def test_unknown_field(self, auth_client):
+        response = auth_client.get(reverse('file-list'), {'fields': 'id,secret'})
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['code'] == 'INVALID_FIELDS'
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestFileListCache:
+    @pytest.fixture(autouse=True)
+    def shared_cache(self, monkeypatch):
+        # Клиенты тестов работают в одном процессе и делят его LocMemCache — считаем кэш общим
+        from storage import listing_cache
+        monkeypatch.setattr(listing_cache, 'cache_is_shared', lambda using='default': True)
+
+    def list_queries(self, client, **headers):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('file-list'), **headers)
+        return response, [q['sql'] for q in ctx.captured_queries if 'storage_file' in q['sql']]
+
+    def test_repeat_served_from_cache_and_304(self, auth_client, file_obj):
+        first, queries = self.list_queries(auth_client)
+        assert queries
+        second, queries = self.list_queries(auth_client)
+        assert queries == []
+        assert second.data == first.data
+        assert second['ETag'] == first['ETag']
+
+        response, queries = self.list_queries(auth_client, HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+        assert response['ETag'] == first['ETag']
+        assert queries == []
+
+    def test_pages_and_orderings_cached_separately(self, auth_client, file_obj):
+        by_date = auth_client.get(reverse('file-list'))
+        by_name = auth_client.get(reverse('file-list'), {'ordering': 'original_name'})
+        assert by_date['ETag'] != by_name['ETag']
+        msgpack = auth_client.get(reverse('file-list'), HTTP_ACCEPT='application/msgpack')
+        assert msgpack['ETag'] != by_date['ETag']
+
+    @pytest.mark.parametrize('change', ['rename', 'comment', 'delete', 'upload', 'download'])
+    def test_changes_bump_generation(self, auth_client, file_obj, temp_media_root, change,
+                                     django_capture_on_commit_callbacks):
+        first = auth_client.get(reverse('file-list'))
+        # Поколение сдвигается после фиксации транзакции
+        with django_capture_on_commit_callbacks(execute=True):
+            self.change(auth_client, file_obj, temp_media_root, change)
+
+        response = auth_client.get(reverse('file-list'), HTTP_IF_NONE_MATCH=first['ETag'])
+        assert response.status_code == status.HTTP_200_OK
+        assert response['ETag'] != first['ETag']
+        assert response.data != first.data
+
+    def change(self, auth_client, file_obj, temp_media_root, change):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        if change == 'rename':
+            auth_client.patch(reverse('file-rename', kwargs={'pk': file_obj.id}), {'name': 'new.txt'}, format='json')
+        elif change == 'comment':
+            auth_client.patch(reverse('file-comment', kwargs={'pk': file_obj.id}), {'comment': 'x'}, format='json')
+        elif change == 'delete':
+            auth_client.delete(reverse('file-delete', kwargs={'pk': file_obj.id}))
+        elif change == 'upload':
+            auth_client.post(reverse('file-upload'), {'file': SimpleUploadedFile('n.txt', b'new', 'text/plain')},
+                             format='multipart')
+        else:
+            import os
+            with open(os.path.join(temp_media_root, file_obj.stored_name), 'wb') as f:
+                f.write(b'data')
+            b''.join(auth_client.get(reverse('file-download', kwargs={'pk': file_obj.id})).streaming_content)
+
+    def test_other_users_cache_untouched(self, auth_client, file_obj, admin_user, django_capture_on_commit_callbacks):
+        from rest_framework.test import APIClient
+        from rest_framework_simplejwt.tokens import RefreshToken
+        admin = APIClient()
+        admin.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(admin_user).access_token}')
+        admin_etag = admin.get(reverse('file-list'))['ETag']
+        with django_capture_on_commit_callbacks(execute=True):
+            auth_client.patch(reverse('file-comment', kwargs={'pk': file_obj.id}), {'comment': 'x'}, format='json')
+        assert admin.get(reverse('file-list'), HTTP_IF_NONE_MATCH=admin_etag).status_code == status.HTTP_304_NOT_MODIFIED
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestFileListWithoutSharedCache:
+    def test_process_local_cache_not_used(self, auth_client, file_obj, settings):
+        from django.db import connection
+        from django.test.utils import CaptureQueriesContext
+        settings.CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'worker'}}
+
+        first = auth_client.get(reverse('file-list'))
+        # Другой воркер не узнал бы о сбросе поколения — ни ETag, ни ответа из кэша
+        assert 'ETag' not in first
+        with CaptureQueriesContext(connection) as ctx:
+            second = auth_client.get(reverse('file-list'))
+        assert any('storage_file' in q['sql'] for q in ctx.captured_queries)
+        assert second.data == first.data
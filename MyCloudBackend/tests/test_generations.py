@@ -0,0 +1,68 @@
+import pytest
+from django.core.cache import cache, caches
+from storage import generations
+
+
+class TestGenerations:
+    def test_bump_invalidates_namespace_only(self):
+        generations.set('files:1', 'list', [1, 2])
+        generations.set('files:2', 'list', [3])
+        generations.bump('files:1')
+        assert generations.get('files:1', 'list') is None
+        assert generations.get('files:2', 'list') == [3]
+
+    def test_get_or_set_computes_once_per_generation(self):
+        calls = []
+
+        def compute():
+            calls.append(1)
+            return len(calls)
+
+        assert generations.get_or_set('files:1', 'count', compute) == 1
+        assert generations.get_or_set('files:1', 'count', compute) == 1
+        generations.bump('files:1')
+        assert generations.get_or_set('files:1', 'count', compute) == 2
+
+    def test_value_computed_before_bump_is_not_served(self):
+        version = generations.generation('files:1')
+        generations.bump('files:1')  # параллельная запись, пока значение считалось
+        generations.set('files:1', 'list', 'stale', version=version)
+        assert generations.get('files:1', 'list') is None
+
+    def test_evicted_generation_does_not_resurrect_old_entries(self):
+        generations.set('files:1', 'list', 'old')
+        cache.delete('gen:files:1')  # вытеснено из кэша
+        assert generations.get('files:1', 'list') is None
+        generations.bump('files:1')
+        assert generations.get('files:1', 'list') is None
+
+
+@pytest.fixture
+def redis_workers(settings):
+    """Два «воркера» со своими подключениями к одному (поддельному) Redis"""
+    fakeredis = pytest.importorskip('fakeredis')
+    server = fakeredis.FakeServer()
+    options = {'connection_class': fakeredis.FakeConnection, 'server': server}
+    settings.CACHES = {
+        alias: {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': 'redis://localhost:6379/0',
+            'KEY_PREFIX': 'mycloud',
+            'OPTIONS': options,
+        }
+        for alias in ('default', 'worker1', 'worker2')
+    }
+    yield caches['worker1'], caches['worker2']
+
+
+class TestSharedRedisCache:
+    def test_bump_is_visible_to_other_worker(self, redis_workers):
+        generations.set('files:1', 'list', [1], using='worker1')
+        assert generations.get('files:1', 'list', using='worker2') == [1]
+        generations.bump('files:1', using='worker2')
+        assert generations.get('files:1', 'list', using='worker1') is None
+
+    def test_throttle_counts_are_shared(self, redis_workers):
+        first, second = redis_workers
+        first.set('throttle_user_1', ['t1'])
+        assert second.get('throttle_user_1') == ['t1']
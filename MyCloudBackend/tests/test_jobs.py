@@ -0,0 +1,208 @@
+import io
+import pytest
+from datetime import timedelta
+from pathlib import Path
+from django.core.management import call_command
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from storage import jobs
+from storage.models import Job
+
+CALLS = []
+
+
+@jobs.task('test.record')
+def record(value):
+    CALLS.append(value)
+
+
+@jobs.task('test.fail')
+def fail():
+    raise RuntimeError("сбой задачи")
+
+
+@pytest.fixture(autouse=True)
+def clear_calls():
+    CALLS.clear()
+
+
+@pytest.mark.django_db
+class TestJobQueue:
+    def test_enqueue_and_run(self):
+        job = jobs.enqueue('test.record', {'value': 1})
+        assert Job.objects.get(pk=job.pk).status == Job.QUEUED
+
+        assert jobs.run_pending() == 1
+        job.refresh_from_db()
+        assert CALLS == [1]
+        assert (job.status, job.attempts, job.locked_by) == (Job.DONE, 1, '')
+        assert job.finished_at is not None
+
+    def test_unknown_task_rejected(self):
+        with pytest.raises(ValueError):
+            jobs.enqueue('test.missing')
+
+    def test_priority_then_run_at(self):
+        low = jobs.enqueue('test.record', {'value': 'low'})
+        high = jobs.enqueue('test.record', {'value': 'high'}, priority=10)
+        assert jobs.claim('w1') == [high.pk]
+        assert jobs.claim('w1') == [low.pk]
+        assert jobs.claim('w1') == []
+
+    def test_scheduled_job_waits(self):
+        job = jobs.enqueue('test.record', {'value': 1}, delay=60)
+        assert jobs.claim('w1') == []
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        assert jobs.claim('w1') == [job.pk]
+
+    def test_retry_with_backoff_then_failed(self, settings):
+        settings.JOB_RETRY_BASE_DELAY = 10
+        job = jobs.enqueue('test.fail', max_attempts=2)
+
+        before = timezone.now()
+        jobs.run_pending()
+        job.refresh_from_db()
+        assert (job.status, job.attempts) == (Job.QUEUED, 1)
+        assert before + timedelta(seconds=7) < job.run_at < before + timedelta(seconds=13)
+        assert 'сбой задачи' in job.last_error
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        jobs.run_pending()
+        job.refresh_from_db()
+        assert (job.status, job.attempts) == (Job.FAILED, 2)
+
+    def test_retry_delay_grows_and_is_capped(self, settings):
+        settings.JOB_RETRY_BASE_DELAY = 10
+        settings.JOB_RETRY_MAX_DELAY = 100
+        assert 16 <= jobs.retry_delay(2) <= 24
+        assert jobs.retry_delay(10) <= 120
+
+    def test_stale_lease_requeued(self):
+        job = jobs.enqueue('test.record', {'value': 1})
+        jobs.claim('crashed')
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+
+        assert jobs.requeue_stale() == 1
+        job.refresh_from_db()
+        assert (job.status, job.locked_by) == (Job.QUEUED, '')
+
+        # Результат от воркера, потерявшего аренду, не записывается
+        jobs.claim('w2')
+        jobs.run_job(job.pk, 'crashed')
+        job.refresh_from_db()
+        assert (job.status, job.locked_by) == (Job.RUNNING, 'w2')
+
+    def test_heartbeat_extends_lease(self):
+        job = jobs.enqueue('test.record', {'value': 1})
+        jobs.claim('w1')
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now())
+        assert jobs.heartbeat('w1') == 1
+        assert Job.objects.get(pk=job.pk).locked_until > timezone.now() + timedelta(seconds=60)
+
+    def test_unique_key_deduplicates_active_jobs(self):
+        jobs.enqueue('test.record', {'value': 1}, unique_key='once')
+        jobs.enqueue('test.record', {'value': 2}, unique_key='once')
+        assert Job.objects.count() == 1
+
+        jobs.run_pending()
+        jobs.enqueue('test.record', {'value': 3}, unique_key='once')
+        assert Job.objects.filter(status=Job.QUEUED).count() == 1
+
+    def test_periodic_jobs(self, settings):
+        settings.JOB_PERIODIC = {'tick': {'task': 'test.record', 'args': {'value': 'tick'}, 'interval': 600}}
+        jobs.ensure_periodic()
+        jobs.ensure_periodic()
+        first = Job.objects.get(unique_key='periodic:tick')
+
+        jobs.run_pending()
+        jobs.ensure_periodic()
+        following = Job.objects.get(unique_key='periodic:tick', status=Job.QUEUED)
+        assert following.run_at == first.run_at + timedelta(seconds=600)
+        assert CALLS == ['tick']
+
+    def test_purge_finished(self, settings):
+        settings.JOB_RETENTION_DAYS = 1
+        old = jobs.enqueue('test.record', {'value': 1})
+        jobs.enqueue('test.record', {'value': 2})
+        jobs.run_pending()
+        Job.objects.filter(pk=old.pk).update(finished_at=timezone.now() - timedelta(days=2))
+        assert jobs.purge_finished() == 1
+        assert Job.objects.count() == 1
+
+
+@pytest.mark.django_db(transaction=True)
+class TestRunWorker:
+    @pytest.mark.skipif(connection.vendor == 'sqlite', reason="SQLite в памяти (shared cache) не допускает одновременной записи из нескольких потоков")
+    def test_burst_thread_pool(self):
+        for value in range(5):
+            jobs.enqueue('test.record', {'value': value})
+        call_command('runworker', '--burst', '--concurrency', '3', '--poll-interval', '0.01',
+                     stdout=io.StringIO())
+        assert sorted(CALLS) == list(range(5))
+        assert set(Job.objects.values_list('status', flat=True)) == {Job.DONE}
+
+    @pytest.mark.skipif(connection.vendor == 'sqlite', reason="тестовая БД SQLite в памяти не видна дочерним процессам")
+    def test_burst_process_pool(self):
+        jobs.enqueue('jobs.purge_finished')
+        call_command('runworker', '--burst', '--pool', 'process', '--concurrency', '2',
+                     stdout=io.StringIO())
+        assert Job.objects.get().status == Job.DONE
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestDeferredDeletion:
+    def test_delete_returns_before_storage_cleanup(self, auth_client, file_obj, temp_media_root):
+        path = Path(temp_media_root) / file_obj.stored_name
+        response = auth_client.delete(reverse('file-delete', kwargs={'pk': file_obj.id}))
+        assert response.status_code == status.HTTP_200_OK
+
+        job = Job.objects.get()
+        assert (job.name, job.args) == ('storage.delete_keys', {'keys': [file_obj.stored_name]})
+        assert path.exists()
+
+        jobs.run_pending()
+        assert not path.exists()
+
+
+@pytest.mark.admin
+@pytest.mark.django_db
+class TestJobQueueAdmin:
+    def test_queue_depth(self, admin_client):
+        jobs.enqueue('test.record', {'value': 1})
+        jobs.enqueue('test.record', {'value': 2}, delay=3600)
+        failed = jobs.enqueue('test.fail', max_attempts=1)
+        jobs.claim('w1', 10)
+        jobs.run_job(failed.pk, 'w1')
+        jobs.enqueue('test.record', {'value': 3})
+
+        response = admin_client.get(reverse('admin-job-queue'))
+        assert response.status_code == status.HTTP_200_OK
+        data = response.data
+        assert (data['queued'], data['ready'], data['scheduled']) == (2, 1, 1)
+        assert (data['running'], data['failed']) == (1, 1)
+        assert data['by_name']['test.fail'] == {'failed': 1}
+
+    def test_requires_admin(self, auth_client):
+        assert auth_client.get(reverse('admin-job-queue')).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_retry_skips_jobs_already_queued(self, admin_user):
+        from django.test import Client
+        finished = Job.objects.create(name='jobs.purge_finished', unique_key='purge', status=Job.FAILED)
+        jobs.enqueue('jobs.purge_finished', unique_key='purge')
+        other = Job.objects.create(name='jobs.purge_finished', status=Job.FAILED)
+
+        client = Client()
+        client.force_login(admin_user)
+        response = client.post(reverse('admin:storage_job_changelist'), {
+            'action': 'retry', '_selected_action': [finished.pk, other.pk],
+        }, follow=True)
+        assert response.status_code == status.HTTP_200_OK
+        messages = [str(m) for m in response.context['messages']]
+        assert 'Поставлено в очередь: 1' in messages
+        assert any(f'#{finished.pk}' in m for m in messages)
+        assert Job.objects.get(pk=finished.pk).status == Job.FAILED
+        assert Job.objects.get(pk=other.pk).status == Job.QUEUED
+
@@ -0,0 +1,100 @@
+import io
+import pytest
+from pathlib import Path
+from django.urls import reverse
+from django.test import override_settings
+from rest_framework import status
+from storage.models import File, UploadSession
+from storage.multipart import write_part
+
+CONTENT = b'0123456789' * 25  # 250 байт -> 3 части по 100 байт
+
+
+@pytest.fixture
+def small_parts():
+    with override_settings(MULTIPART_UPLOAD_MIN_PART_SIZE=10):
+        yield
+
+
+@pytest.fixture
+def upload_session(auth_client, temp_media_root, small_parts):
+    url = reverse('upload-session-create')
+    response = auth_client.post(url, {'name': 'big.txt', 'size': len(CONTENT), 'part_size': 100, 'comment': 'parts'})
+    assert response.status_code == status.HTTP_201_CREATED
+    return response.data
+
+
+def put_part(client, upload_id, number, data):
+    url = reverse('upload-part', kwargs={'upload_id': upload_id, 'part_number': number})
+    return client.put(url, data, content_type='application/octet-stream')
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestMultipartUpload:
+    def test_create_session(self, upload_session):
+        assert upload_session['part_count'] == 3
+        assert upload_session['missing_parts'] == [1, 2, 3]
+
+    def test_parts_out_of_order_and_commit(self, auth_client, upload_session, temp_media_root):
+        upload_id = upload_session['upload_id']
+        for number in (3, 1, 2):
+            chunk = CONTENT[(number - 1) * 100:number * 100]
+            response = put_part(auth_client, upload_id, number, chunk)
+            assert response.status_code == status.HTTP_200_OK
+
+        status_url = reverse('upload-session-detail', kwargs={'upload_id': upload_id})
+        assert auth_client.get(status_url).data['received_parts'] == [1, 2, 3]
+
+        url = reverse('upload-session-complete', kwargs={'upload_id': upload_id})
+        response = auth_client.post(url)
+        assert response.status_code == status.HTTP_201_CREATED
+
+        file_obj = File.objects.get(pk=response.data['id'])
+        assert file_obj.size == len(CONTENT)
+        assert file_obj.comment == 'parts'
+        assert file_obj.mime_type == 'text/plain'
+        assert Path(file_obj.get_file_path()).read_bytes() == CONTENT
+        assert not UploadSession.objects.filter(pk=upload_id).exists()
+
+    def test_commit_with_missing_parts(self, auth_client, upload_session):
+        upload_id = upload_session['upload_id']
+        put_part(auth_client, upload_id, 1, CONTENT[:100])
+        url = reverse('upload-session-complete', kwargs={'upload_id': upload_id})
+        response = auth_client.post(url)
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['missing_parts'] == [2, 3]
+        assert not File.objects.exists()
+
+    def test_part_size_mismatch(self, auth_client, upload_session):
+        response = put_part(auth_client, upload_session['upload_id'], 1, CONTENT[:99])
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['code'] == 'PART_SIZE_MISMATCH'
+
+    def test_other_user_cannot_upload_part(self, api_client, upload_session):
+        from django.contrib.auth import get_user_model
+        from rest_framework_simplejwt.tokens import RefreshToken
+        other = get_user_model().objects.create_user('other', 'o@o.com', 'Pass123!')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(other).access_token}')
+        response = put_part(api_client, upload_session['upload_id'], 1, CONTENT[:100])
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+
+
+class TestWritePart:
+    def test_concurrent_writes_of_same_part(self, tmp_path):
+        path = str(tmp_path / 'parts' / '1')
+
+        class RacingStream(io.BytesIO):
+            """Пока пишется первая копия части, тот же процесс пишет вторую"""
+            raced = False
+
+            def read(self, size=-1):
+                if not self.raced:
+                    self.raced = True
+                    write_part(io.BytesIO(CONTENT[:100]), path, 100)
+                return super().read(size)
+
+        assert write_part(RacingStream(CONTENT[:100]), path, 100) == 100
+        assert Path(path).read_bytes() == CONTENT[:100]
+        # Временные файлы обеих записей не остаются
+        assert [p.name for p in (tmp_path / 'parts').iterdir()] == ['1']
@@ -0,0 +1,90 @@
+import json
+import pytest
+from urllib.parse import urlparse
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework_simplejwt.tokens import RefreshToken
+from storage.models import File
+
+# Планы имеют смысл только на той СУБД, что в продакшене
+pytestmark = [
+    pytest.mark.django_db,
+    pytest.mark.skipif(connection.vendor != 'postgresql', reason="EXPLAIN-проверки только для PostgreSQL"),
+]
+
+USERS = 50
+FILES_PER_USER = 400
+
+User = get_user_model()
+
+
+@pytest.fixture
+def seeded(api_client):
+    """Таблица достаточного размера, чтобы планировщик выбирал индексы осознанно"""
+    users = User.objects.bulk_create([
+        User(username=f'plan{i}', email=f'plan{i}@example.com') for i in range(USERS)
+    ])
+    File.objects.bulk_create(
+        File(
+            user=user,
+            original_name=f'file_{j:04d}.txt',
+            stored_name=f'{user.pk}_{j}',
+            public_link=f'{user.pk}_{j}',
+            size=(j * 7919) % 100000,
+        )
+        for user in users for j in range(FILES_PER_USER)
+    )
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE storage_file')
+    api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {RefreshToken.for_user(users[0]).access_token}')
+    api_client.user = users[0]
+    return api_client
+
+
+def plan_nodes(plan):
+    yield plan
+    for child in plan.get('Plans', []):
+        yield from plan_nodes(child)
+
+
+def assert_file_queries_use_indexes(queries):
+    """EXPLAIN каждого запроса к storage_file: ни Seq Scan по таблице, ни Sort"""
+    checked = 0
+    for query in queries:
+        sql = query['sql']
+        if 'storage_file' not in sql or not sql.lstrip().upper().startswith('SELECT'):
+            continue
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + sql)
+            raw = cursor.fetchone()[0]
+        plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]['Plan']
+        for node in plan_nodes(plan):
+            assert not (node['Node Type'] == 'Seq Scan' and node.get('Relation Name') == 'storage_file'), sql
+            assert node['Node Type'] not in ('Sort', 'Incremental Sort'), sql
+        checked += 1
+    assert checked, "Не найдено запросов к storage_file"
+
+
+@pytest.mark.parametrize('ordering', ['-uploaded_at', 'uploaded_at', 'original_name', '-size'])
+def test_file_list_pages(seeded, ordering):
+    url = reverse('file-list')
+    with CaptureQueriesContext(connection) as first:
+        response = seeded.get(url, {'ordering': ordering})
+    assert_file_queries_use_indexes(first.captured_queries)
+
+    # Глубокая страница по курсору — тот же план
+    with CaptureQueriesContext(connection) as deep:
+        seeded.get(url + '?' + urlparse(response.data['next']).query)
+    assert_file_queries_use_indexes(deep.captured_queries)
+
+
+def test_current_user_stats(seeded):
+    from rest_framework.test import APIRequestFactory, force_authenticate
+    from storage.views import current_user_view
+    request = APIRequestFactory().get('/api/auth/user/me/')
+    force_authenticate(request, user=seeded.user)
+    with CaptureQueriesContext(connection) as ctx:
+        current_user_view(request)
+    assert_file_queries_use_indexes(ctx.captured_queries)
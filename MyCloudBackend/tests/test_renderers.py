@@ -0,0 +1,69 @@
+import io
+import uuid
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+import msgpack
+import pytest
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from storage.renderers import MessagePackParser, MessagePackRenderer, ORJSONRenderer
+
+PAYLOAD = {
+    'id': 7,
+    'name': 'Отчёт.pdf',
+    'size': Decimal('1.5'),
+    'when': datetime(2025, 1, 2, 3, 4, 5, 678901, tzinfo=dt_timezone.utc),
+    'uuid': uuid.UUID('12345678-1234-5678-1234-567812345678'),
+    'label': gettext_lazy('Пример'),
+    'nested': [{'ok': True, 'none': None}],
+    1: 'int key',
+}
+
+
+class TestRenderers:
+    def test_orjson_matches_drf_json(self):
+        assert ORJSONRenderer().render(PAYLOAD) == JSONRenderer().render(PAYLOAD)
+
+    def test_orjson_indent_from_accept(self):
+        rendered = ORJSONRenderer().render({'a': 1}, 'application/json; indent=4')
+        assert rendered == b'{\n  "a": 1\n}'
+
+    def test_msgpack_round_trip(self):
+        # Парсер принимает только строковые ключи (strict_map_key)
+        packed = MessagePackRenderer().render({k: v for k, v in PAYLOAD.items() if isinstance(k, str)})
+        data = MessagePackParser().parse(io.BytesIO(packed))
+        assert data['name'] == 'Отчёт.pdf'
+        assert data['when'] == '2025-01-02T03:04:05.678901Z'
+        assert data['label'] == 'Пример'
+
+    def test_msgpack_parse_error(self):
+        with pytest.raises(ParseError):
+            MessagePackParser().parse(io.BytesIO(b'\xc1'))
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestContentNegotiation:
+    def test_json_by_default(self, auth_client, file_obj):
+        response = auth_client.get(reverse('file-list'))
+        assert response['Content-Type'] == 'application/json'
+        assert response.json()['files'][0]['id'] == file_obj.id
+
+    def test_msgpack_by_accept(self, auth_client, file_obj):
+        url = reverse('file-list')
+        as_json = auth_client.get(url).json()
+        response = auth_client.get(url, HTTP_ACCEPT='application/msgpack')
+        assert response['Content-Type'] == 'application/msgpack'
+        assert msgpack.unpackb(response.content) == as_json
+
+    def test_msgpack_request_body(self, auth_client, file_obj):
+        response = auth_client.generic(
+            'PATCH', reverse('file-comment', kwargs={'pk': file_obj.id}),
+            msgpack.packb({'comment': 'из клиента'}), content_type='application/msgpack',
+            HTTP_ACCEPT='application/msgpack',
+        )
+        assert response.status_code == 200
+        assert msgpack.unpackb(response.content)['comment'] == 'из клиента'
+
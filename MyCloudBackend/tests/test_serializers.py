@@ -0,0 +1,40 @@
+import json
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework.test import APIRequestFactory
+from storage.models import File
+from storage.serializers import FileSerializer
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestFileListSerialization:
+    def test_list_output_identical_to_per_row(self, user, admin_user, make_files):
+        user.first_name, user.last_name = 'Иван', 'Петров'
+        user.save()
+        make_files(user, 10)
+        make_files(admin_user, 4)
+        context = {'request': APIRequestFactory().get('/api/files/')}
+        queryset = File.objects.order_by('id')
+
+        fast = FileSerializer(queryset, many=True, context=context).data
+        per_row = [FileSerializer(f, context=context).data for f in queryset]
+        assert json.dumps(fast, sort_keys=False) == json.dumps(per_row, sort_keys=False)
+
+        # Та же страница, переданная списком
+        page = list(File.objects.order_by('id'))
+        assert FileSerializer(page, many=True, context=context).data == fast
+
+    def test_file_list_query_count_is_constant(self, auth_client, user, make_files):
+        def list_queries(page_size):
+            with CaptureQueriesContext(connection) as ctx:
+                response = auth_client.get(reverse('file-list'), {'page_size': page_size})
+            assert len(response.data['files']) == page_size
+            return len(ctx.captured_queries)
+
+        make_files(user, 40)
+        list_queries(1)  # файлы созданы в обход счётчиков: первый запрос заводит строку UserStorageUsage
+        assert list_queries(2) == list_queries(40)
+
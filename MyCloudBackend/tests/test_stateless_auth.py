@@ -0,0 +1,93 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+from storage.tokens import StorageRefreshToken
+
+
+def client_for(token):
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+    return client
+
+
+def user_queries(ctx):
+    return [q['sql'] for q in ctx.captured_queries if 'FROM "auth_user"' in q['sql']]
+
+
+@pytest.mark.auth
+@pytest.mark.django_db
+class TestStatelessJWT:
+    def test_claims_in_tokens(self, user):
+        access = StorageRefreshToken.for_user(user).access_token
+        assert access['is_staff'] is False and access['is_active'] is True
+        assert access['username'] == user.username and access['ver']
+
+    def test_no_user_query_after_first_request(self, user, file_obj):
+        client = client_for(StorageRefreshToken.for_user(user).access_token)
+        client.get(reverse('file-list'))
+        with CaptureQueriesContext(connection) as ctx:
+            response = client.get(reverse('file-list'), {'ordering': 'original_name'})
+        assert response.status_code == status.HTTP_200_OK
+        assert user_queries(ctx) == []
+
+    def test_deactivation_takes_effect_immediately(self, user, admin_client, django_capture_on_commit_callbacks):
+        client = client_for(StorageRefreshToken.for_user(user).access_token)
+        assert client.get(reverse('file-list')).status_code == status.HTTP_200_OK
+
+        with django_capture_on_commit_callbacks(execute=True):
+            admin_client.patch(reverse('admin-user-update', kwargs={'user_id': user.id}),
+                               {'is_active': False}, format='json')
+        response = client.get(reverse('file-list'))
+        assert response.status_code == status.HTTP_401_UNAUTHORIZED
+        assert response.data['code'] == 'user_inactive'
+
+    def test_promotion_requires_refresh(self, user, admin_client, django_capture_on_commit_callbacks):
+        refresh = StorageRefreshToken.for_user(user)
+        client = client_for(refresh.access_token)
+        client.get(reverse('file-list'))
+        with django_capture_on_commit_callbacks(execute=True):
+            admin_client.patch(reverse('admin-user-update', kwargs={'user_id': user.id}),
+                               {'is_staff': True}, format='json')
+        assert client.get(reverse('file-list')).data['code'] == 'token_stale'
+
+        # Обновлённый токен уже несёт новые права
+        refreshed = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+        assert refreshed.status_code == status.HTTP_200_OK
+        admin = client_for(refreshed.data['access'])
+        assert admin.get(reverse('admin-user-list')).status_code == status.HTTP_200_OK
+
+    def test_password_change_revokes_tokens(self, user):
+        refresh = StorageRefreshToken.for_user(user)
+        user.set_password('Another123!')
+        user.save()
+        # Смена пароля вне админки: отзыв вступает в силу по истечении записи состояния
+        cache.clear()
+        response = client_for(refresh.access_token).get(reverse('file-list'))
+        assert response.data['code'] == 'token_revoked'
+        refreshed = APIClient().post(reverse('token_refresh'), {'refresh': str(refresh)}, format='json')
+        assert refreshed.status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_deleted_user_rejected(self, user, admin_client, django_capture_on_commit_callbacks):
+        client = client_for(StorageRefreshToken.for_user(user).access_token)
+        client.get(reverse('file-list'))
+        with django_capture_on_commit_callbacks(execute=True):
+            admin_client.delete(reverse('admin-user-delete', kwargs={'user_id': user.id}))
+        assert client.get(reverse('file-list')).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_legacy_token_checked_against_db(self, user):
+        client = client_for(RefreshToken.for_user(user).access_token)
+        with CaptureQueriesContext(connection) as ctx:
+            assert client.get(reverse('file-list')).status_code == status.HTTP_200_OK
+        assert user_queries(ctx)
+
+    def test_login_issues_claims(self, api_client, user, user_data):
+        response = api_client.post(reverse('token_obtain_pair'),
+                                   {'username': user_data['username'], 'password': user_data['password']})
+        assert response.status_code == status.HTTP_200_OK
+        client = client_for(response.data['access'])
+        assert client.get(reverse('file-list')).status_code == status.HTTP_200_OK
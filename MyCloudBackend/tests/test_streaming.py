@@ -0,0 +1,70 @@
+import json
+import pytest
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from rest_framework import status
+from storage.models import File
+from storage.serializers import AdminUserSerializer, FileSerializer
+from storage.streaming import iter_listing
+
+User = get_user_model()
+
+
+def make_users(count):
+    return User.objects.bulk_create([
+        User(username=f'stream{i}', email=f'stream{i}@example.com', first_name='Имя') for i in range(count)
+    ])
+
+
+@pytest.mark.admin
+@pytest.mark.django_db
+class TestStreamingListings:
+    def test_iter_listing_is_valid_json_in_chunks(self):
+        make_users(5)
+        queryset = User.objects.order_by('id')
+        context = {'fields': ['id', 'username', 'full_name']}
+        parts = list(iter_listing(
+            {'count': 5}, 'users', queryset,
+            lambda chunk: AdminUserSerializer(chunk, many=True, context=context).data, chunk_size=2,
+        ))
+        # Начало, три пачки (2 + 2 + 1) и конец
+        assert len(parts) == 5
+        data = json.loads(b''.join(parts))
+        assert data['count'] == 5
+        assert data['users'] == json.loads(json.dumps(AdminUserSerializer(queryset, many=True, context=context).data))
+
+    def test_empty_listing(self):
+        parts = iter_listing({}, 'files', File.objects.none(), lambda chunk: chunk, chunk_size=10)
+        assert json.loads(b''.join(parts)) == {'files': []}
+
+    def test_user_list_reads_in_chunks(self, admin_client, settings):
+        settings.LISTING_STREAM_CHUNK_SIZE = 2
+        make_users(5)
+        response = admin_client.get(reverse('admin-user-list'), {'ordering': 'id'})
+        assert response.status_code == status.HTTP_200_OK
+        assert response.streaming
+        parts = list(response.streaming_content)
+        # Начало, пачки по две строки и конец — ответ не собирается целиком
+        assert len(parts) == (User.objects.count() + 1) // 2 + 2
+        data = json.loads(b''.join(parts))
+        assert data['count'] == User.objects.count()
+        assert [u['id'] for u in data['users']] == list(User.objects.order_by('id').values_list('id', flat=True))
+
+    def test_user_files_same_as_serializer(self, admin_client, user, settings):
+        settings.LISTING_STREAM_CHUNK_SIZE = 3
+        for i in range(7):
+            File.objects.create(user=user, original_name=f'f{i}.pdf', stored_name=f's{i}', size=i)
+        response = admin_client.get(reverse('admin-user-files', kwargs={'user_id': user.id}))
+        with CaptureQueriesContext(connection) as ctx:
+            data = json.loads(b''.join(response.streaming_content))
+        assert data['user']['id'] == user.id and data['count'] == 7
+        expected = FileSerializer(
+            File.objects.filter(user=user).order_by('-uploaded_at'), many=True,
+            context={'request': response.wsgi_request},
+        ).data
+        assert data['files'] == json.loads(json.dumps(expected))
+        # Владелец подтянут select_related — без догрузок по пачкам
+        assert len(ctx.captured_queries) == 1
+
@@ -0,0 +1,178 @@
+import pytest
+from datetime import timedelta
+from io import BytesIO
+from pathlib import Path
+from PIL import Image
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from storage import jobs, paths, thumbnails
+from storage.models import Blob, File, Job, Thumbnail
+from storage.tokens import StorageRefreshToken
+
+User = get_user_model()
+
+
+@pytest.fixture(autouse=True)
+def inline_rendering(settings):
+    settings.THUMBNAIL_PROCESSES = 0
+
+
+def image_bytes(size=(800, 600), mode='RGB', fmt='PNG'):
+    buffer = BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else (200, 30, 30)).save(buffer, fmt)
+    return buffer.getvalue()
+
+
+def upload(client, name='photo.png', content=None):
+    content = image_bytes() if content is None else content
+    response = client.post(
+        reverse('file-upload'), {'file': SimpleUploadedFile(name, content)}, format='multipart'
+    )
+    assert response.status_code == status.HTTP_201_CREATED
+    return File.objects.get(pk=response.data['id'])
+
+
+def thumbnail(client, file_obj, size='small', **kwargs):
+    return client.get(reverse('file-thumbnail', kwargs={'pk': file_obj.pk, 'size': size}), **kwargs)
+
+
+def body_image(response):
+    return Image.open(BytesIO(b''.join(response.streaming_content)))
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestThumbnails:
+    def test_pending_until_generated(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client)
+        assert Job.objects.filter(name='thumbnails.generate', status=Job.QUEUED).count() == 1
+
+        response = thumbnail(auth_client, file_obj)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response['Retry-After'] == '2'
+        assert response['Cache-Control'] == 'no-store'
+        # Повторный запрос не ставит вторую задачу
+        assert Job.objects.filter(name='thumbnails.generate').count() == 1
+
+        jobs.run_pending()
+        assert Thumbnail.objects.filter(blob_id=file_obj.blob_id).count() == 6
+        response = thumbnail(auth_client, file_obj, HTTP_ACCEPT='image/avif,image/webp,*/*')
+        assert response.status_code == status.HTTP_200_OK
+        assert response['Content-Type'] == 'image/webp'
+        assert 'immutable' in response['Cache-Control']
+        assert 'Accept' in response['Vary']
+        image = body_image(response)
+        assert (image.format, image.size) == ('WEBP', (128, 96))
+
+    def test_jpeg_by_default_and_explicit_format(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client)
+        jobs.run_pending()
+
+        response = thumbnail(auth_client, file_obj, 'medium')
+        assert response['Content-Type'] == 'image/jpeg'
+        assert body_image(response).size == (512, 384)
+
+        response = thumbnail(auth_client, file_obj, 'large', HTTP_ACCEPT='image/webp,*/*', data={'fmt': 'jpeg'})
+        assert response['Content-Type'] == 'image/jpeg'
+        # Изображение меньше размера миниатюры не увеличивается
+        assert body_image(response).size == (800, 600)
+
+    def test_transparent_png_to_jpeg(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client, 'icon.png', image_bytes((300, 300), 'RGBA'))
+        jobs.run_pending()
+        image = body_image(thumbnail(auth_client, file_obj))
+        assert (image.format, image.mode) == ('JPEG', 'RGB')
+
+    def test_not_modified(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client)
+        jobs.run_pending()
+        etag = thumbnail(auth_client, file_obj)['ETag']
+        response = thumbnail(auth_client, file_obj, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == status.HTTP_304_NOT_MODIFIED
+
+    def test_invalid_size_or_format(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client)
+        assert thumbnail(auth_client, file_obj, 'huge').data['code'] == 'INVALID_THUMBNAIL'
+        assert thumbnail(auth_client, file_obj, data={'fmt': 'gif'}).status_code == status.HTTP_400_BAD_REQUEST
+
+    def test_not_an_image(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client, 'notes.txt', b'plain text')
+        assert not Job.objects.filter(name='thumbnails.generate').exists()
+        response = thumbnail(auth_client, file_obj)
+        assert response.status_code == status.HTTP_404_NOT_FOUND
+        assert response.data['code'] == 'THUMBNAIL_UNAVAILABLE'
+
+    def test_broken_image_not_retried(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client, 'broken.jpg', b'not really a jpeg')
+        jobs.run_pending()
+        assert Job.objects.get(name='thumbnails.generate').status == Job.DONE
+        assert thumbnail(auth_client, file_obj).data['code'] == 'THUMBNAIL_UNAVAILABLE'
+        assert not Job.objects.filter(name='thumbnails.generate', status=Job.QUEUED).exists()
+        # Отметка хранится в БД — её видят все воркеры
+        assert Blob.objects.get(pk=file_obj.blob_id).thumbnail_failed_at is not None
+
+    def test_failure_expires(self, auth_client, temp_media_root, settings):
+        file_obj = upload(auth_client, 'broken.jpg', b'not really a jpeg')
+        jobs.run_pending()
+        assert thumbnails.failed(file_obj.blob_id)
+
+        Blob.objects.filter(pk=file_obj.blob_id).update(
+            thumbnail_failed_at=timezone.now() - timedelta(seconds=settings.THUMBNAIL_FAILURE_TIMEOUT + 1)
+        )
+        assert not thumbnails.failed(file_obj.blob_id)
+        assert thumbnail(auth_client, file_obj).status_code == status.HTTP_202_ACCEPTED
+
+    def test_other_users_file_denied(self, auth_client, api_client, temp_media_root):
+        file_obj = upload(auth_client)
+        other = User.objects.create_user('other', 'o@o.com', 'Pass123!')
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {StorageRefreshToken.for_user(other).access_token}')
+        assert thumbnail(api_client, file_obj).status_code == status.HTTP_403_FORBIDDEN
+
+    def test_missing_derivative_regenerated(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client)
+        jobs.run_pending()
+        Path(temp_media_root, paths.thumbnail_relative_path(file_obj.blob_id, 'small', 'jpeg')).unlink()
+
+        assert thumbnail(auth_client, file_obj).status_code == status.HTTP_202_ACCEPTED
+        jobs.run_pending()
+        assert thumbnail(auth_client, file_obj).status_code == status.HTTP_200_OK
+
+    def test_thumbnails_removed_with_blob(self, auth_client, temp_media_root):
+        file_obj = upload(auth_client)
+        jobs.run_pending()
+        assert list(Path(temp_media_root, paths.THUMBNAIL_DIR).rglob('*.*'))
+
+        auth_client.delete(reverse('file-delete', kwargs={'pk': file_obj.pk}))
+        jobs.run_pending()
+        assert not Thumbnail.objects.exists()
+        assert not list(Path(temp_media_root, paths.THUMBNAIL_DIR).rglob('*.*'))
+
+    def test_evict_least_recently_used(self, auth_client, temp_media_root, settings):
+        first = upload(auth_client, 'a.png', image_bytes((400, 300)))
+        second = upload(auth_client, 'b.png', image_bytes((300, 400)))
+        jobs.run_pending()
+        # Миниатюры второго файла запрашивались позже
+        Thumbnail.objects.filter(blob_id=second.blob_id).update(accessed_at=timezone.now() + timedelta(hours=1))
+
+        per_blob = sum(Thumbnail.objects.filter(blob_id=first.blob_id).values_list('bytes', flat=True))
+        settings.THUMBNAIL_CACHE_MAX_BYTES = per_blob * 2 - 1
+        assert thumbnails.evict() >= 1
+        assert Thumbnail.objects.filter(blob_id=second.blob_id).count() == 6
+        evicted = 6 - Thumbnail.objects.filter(blob_id=first.blob_id).count()
+        assert evicted >= 1
+        assert thumbnails.evict() == 0
+
+    @pytest.mark.slow
+    def test_process_pool(self, auth_client, temp_media_root, settings):
+        settings.THUMBNAIL_PROCESSES = 1
+        file_obj = upload(auth_client)
+        try:
+            assert thumbnails.generate(file_obj.blob_id) == 6
+        finally:
+            if thumbnails._pool is not None:
+                thumbnails._pool.shutdown()
+                thumbnails._pool = None
+        assert thumbnail(auth_client, file_obj).status_code == status.HTTP_200_OK
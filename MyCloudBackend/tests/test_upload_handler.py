@@ -0,0 +1,71 @@
+import pytest
+from pathlib import Path
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.urls import reverse
+from rest_framework import status
+from storage import views
+from storage.models import File
+from storage.upload_handlers import detect_mime_type, sniff_mime_type
+
+
+@pytest.mark.parametrize('head, expected', [
+    (b'\xff\xd8\xff\xe0\x00\x10JFIF', 'image/jpeg'),
+    (b'%PDF-1.7\n', 'application/pdf'),
+    (b'RIFF\x00\x00\x00\x00WEBPVP8 ', 'image/webp'),
+    (b'\x00\x00\x00\x18ftypmp42', 'video/mp4'),
+    (b'\x00\x00\x00\x14ftypqt  ', 'video/quicktime'),
+    (b'\x00\x00\x00\x20ftypM4A ', 'audio/mp4'),
+    (b'\x00\x00\x00\x18ftypheic', 'image/heic'),
+    (b'BMW service notes', None),
+    (b'MZ-1 manual', None),
+    (b'plain text', None),
+])
+def test_sniff_mime_type(head, expected):
+    assert sniff_mime_type(head) == expected
+
+
+@pytest.mark.parametrize('name, head, expected', [
+    ('report.docx', b'PK\x03\x04\x14\x00\x06\x00', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+    ('notes.txt', b'BM is on Monday', 'text/plain'),
+    ('noext', b'%PDF-1.7\n', 'application/pdf'),
+    ('noext', b'plain text', ''),
+])
+def test_detect_mime_type_prefers_extension(name, head, expected):
+    assert detect_mime_type(name, head) == expected
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestStreamingUpload:
+    def test_upload_streams_into_blob_store(self, auth_client, sample_image, temp_media_root):
+        response = auth_client.post(reverse('file-upload'), {'file': sample_image}, format='multipart')
+        assert response.status_code == status.HTTP_201_CREATED
+
+        file_obj = File.objects.get(pk=response.data['id'])
+        assert file_obj.mime_type == 'image/jpeg'
+        assert Path(file_obj.get_file_path()).stat().st_size == file_obj.size
+        # Временных файлов после запроса не остаётся
+        assert list((Path(temp_media_root) / '.tmp').iterdir()) == []
+
+    def test_oversized_upload_aborted_while_streaming(self, auth_client, temp_media_root, monkeypatch):
+        monkeypatch.setattr(views, 'MAX_FILE_SIZE', 1024)
+        # Запас на multipart-заголовки не даёт отсечь запрос по Content-Length
+        upload = SimpleUploadedFile('big.txt', b'x' * 4096, content_type='text/plain')
+        response = auth_client.post(reverse('file-upload'), {'file': upload}, format='multipart')
+        assert response.status_code == status.HTTP_400_BAD_REQUEST
+        assert response.data['code'] == 'FILE_TOO_LARGE'
+        assert not File.objects.exists()
+        assert list((Path(temp_media_root) / '.tmp').iterdir()) == []
+
+    @pytest.mark.parametrize('name, content, expected', [
+        ('report.docx', b'PK\x03\x04' + b'\x00' * 60, 'application/vnd.openxmlformats-officedocument.wordprocessingml.document'),
+        ('notes.txt', b'BM is on Monday', 'text/plain'),
+    ])
+    def test_type_from_extension_survives_download(self, auth_client, temp_media_root, name, content, expected):
+        upload = SimpleUploadedFile(name, content, content_type='application/octet-stream')
+        response = auth_client.post(reverse('file-upload'), {'file': upload}, format='multipart')
+        assert response.status_code == status.HTTP_201_CREATED
+        assert File.objects.get(pk=response.data['id']).mime_type == expected
+
+        response = auth_client.get(reverse('file-download', kwargs={'pk': response.data['id']}))
+        assert response['Content-Type'] == expected
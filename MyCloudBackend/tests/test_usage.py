@@ -0,0 +1,123 @@
+import json
+import threading
+import pytest
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection, connections
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from storage import usage
+from storage.deletion import delete_file_records
+from storage.models import Blob, File, UserStorageUsage
+
+
+def upload(client, name, content):
+    return client.post(reverse('file-upload'), {'file': SimpleUploadedFile(name, content, 'text/plain')}, format='multipart')
+
+
+def counters(user):
+    row = UserStorageUsage.objects.get(user=user)
+    return row.file_count, row.total_size
+
+
+@pytest.mark.files
+@pytest.mark.django_db
+class TestStorageUsage:
+    def test_upload_and_delete_update_counters(self, auth_client, user, temp_media_root):
+        first = upload(auth_client, 'a.txt', b'12345')
+        upload(auth_client, 'b.txt', b'123')
+        assert counters(user) == (2, 8)
+
+        auth_client.delete(reverse('file-delete', kwargs={'pk': first.data['id']}))
+        assert counters(user) == (1, 3)
+
+    def test_current_user_reads_counters(self, auth_client, user, temp_media_root):
+        from storage.views import current_user_view
+        from rest_framework.test import APIRequestFactory, force_authenticate
+        upload(auth_client, 'a.txt', b'12345')
+        request = APIRequestFactory().get('/api/auth/user/me/')
+        force_authenticate(request, user=user)
+        with CaptureQueriesContext(connection) as ctx:
+            response = current_user_view(request)
+        assert (response.data['file_count'], response.data['total_size']) == (1, 5)
+        assert not any('storage_file' in q['sql'] for q in ctx.captured_queries)
+
+    def test_limit_uses_counters(self, auth_client, user, temp_media_root, monkeypatch):
+        monkeypatch.setattr('storage.views.MAX_FILES_PER_USER', 1)
+        assert upload(auth_client, 'a.txt', b'1').status_code == 201
+        response = upload(auth_client, 'b.txt', b'2')
+        assert response.status_code == 400
+        assert response.data['code'] == 'FILE_LIMIT_EXCEEDED'
+
+    def test_missing_row_is_built_from_files(self, user):
+        File.objects.create(user=user, original_name='x.txt', stored_name='x1', size=10)
+        File.objects.create(user=user, original_name='y.txt', stored_name='y1', size=5)
+        row = usage.get(user)
+        assert (row.file_count, row.total_size) == (2, 15)
+        # Первое изменение после появления строки — приращение, а не пересчёт
+        usage.add(user.pk, 1, 7)
+        assert counters(user) == (3, 22)
+
+    def test_admin_list_uses_counters(self, admin_client, user):
+        UserStorageUsage.objects.create(user=user, file_count=4, total_size=2048)
+        response = admin_client.get(reverse('admin-user-list'), {'fields': 'id,file_count,formatted_total_size',
+                                                                  'ordering': '-file_count'})
+        rows = json.loads(b''.join(response.streaming_content))['users']
+        assert rows[0] == {'id': user.id, 'file_count': 4, 'formatted_total_size': '2.0 KB'}
+
+    def test_admin_deletes_owner_counters(self, admin_client, user, temp_media_root):
+        file_obj = File.objects.create(user=user, original_name='x.txt', stored_name='x1', size=10)
+        assert (usage.get(user).file_count, usage.get(user).total_size) == (1, 10)
+        # Уменьшаются счётчики владельца, а не администратора
+        admin_client.delete(reverse('file-delete', kwargs={'pk': file_obj.pk}))
+        assert counters(user) == (0, 0)
+
+
+@pytest.mark.files
+@pytest.mark.django_db(transaction=True)
+@pytest.mark.skipif(connection.vendor == 'sqlite', reason="SQLite не выполняет удаления параллельно")
+class TestConcurrentDelete:
+    def test_counters_decremented_once(self, auth_client, user, temp_media_root):
+        file_id = upload(auth_client, 'a.txt', b'12345').data['id']
+        upload(auth_client, 'b.txt', b'12345')
+        barrier = threading.Barrier(4)
+        removed = []
+
+        def delete():
+            try:
+                barrier.wait()
+                removed.append(delete_file_records(File.objects.filter(pk=file_id)))
+            finally:
+                connections.close_all()
+
+        threads = [threading.Thread(target=delete) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert sorted(removed) == [0, 0, 0, 1]
+        assert counters(user) == (1, 5)
+        assert Blob.objects.get().ref_count == 1
+
+
+@pytest.mark.django_db
+class TestReconcileCommand:
+    def test_fixes_drift(self, user, admin_user, capsys):
+        File.objects.create(user=user, original_name='x.txt', stored_name='x1', size=10)
+        UserStorageUsage.objects.create(user=user, file_count=5, total_size=999)
+        UserStorageUsage.objects.create(user=admin_user, file_count=0, total_size=0)
+
+        call_command('reconcile_storage_usage', '--dry-run')
+        assert counters(user) == (5, 999)
+        assert 'Найдено расхождений: 1' in capsys.readouterr().out
+
+        call_command('reconcile_storage_usage', '--batch-size', '1')
+        assert counters(user) == (1, 10)
+        assert counters(admin_user) == (0, 0)
+        assert 'Исправлено: 1' in capsys.readouterr().out
+
+    def test_creates_missing_rows(self, user):
+        File.objects.create(user=user, original_name='x.txt', stored_name='x1', size=10)
+        call_command('reconcile_storage_usage', '--user-id', str(user.pk))
+        assert counters(user) == (1, 10)
@@ -0,0 +1,104 @@
+import json
+import pytest
+from pathlib import Path
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from rest_framework import status
+from storage import jobs
+from storage.models import File, Job, UserPurge
+from storage.tokens import StorageRefreshToken
+
+User = get_user_model()
+
+
+@pytest.fixture
+def victim(temp_media_root):
+    """Пользователь с пятью файлами на диске"""
+    victim = User.objects.create_user('victim', 'v@v.com', 'Pass123!')
+    for i in range(5):
+        name = f'victim_{i}.txt'
+        (Path(temp_media_root) / name).write_text('content')
+        File.objects.create(user=victim, original_name=name, stored_name=name, size=7, file_path=name)
+    return victim
+
+
+def delete_user(client, user):
+    return client.delete(reverse('admin-user-delete', kwargs={'user_id': user.id}))
+
+
+def purge_status(client, purge_id):
+    return client.get(reverse('admin-user-purge', kwargs={'purge_id': purge_id})).data
+
+
+@pytest.mark.admin
+@pytest.mark.django_db
+class TestUserPurge:
+    def test_delete_returns_before_files_removed(self, admin_client, victim, temp_media_root):
+        response = delete_user(admin_client, victim)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['purge']['status'] == UserPurge.PENDING
+        assert response.data['purge']['total_files'] == 5
+
+        # Учётная запись отключена сразу, файлы ещё на месте
+        assert not User.objects.get(pk=victim.pk).is_active
+        assert File.objects.filter(user=victim).count() == 5
+        users = json.loads(b''.join(admin_client.get(reverse('admin-user-list')).streaming_content))
+        assert 'victim' not in [u['username'] for u in users['users']]
+
+        jobs.run_pending()
+        assert not User.objects.filter(pk=victim.pk).exists()
+        assert list(Path(temp_media_root).glob('victim_*')) == []
+        data = purge_status(admin_client, response.data['purge']['id'])
+        assert (data['status'], data['removed_files'], data['remaining_files']) == (UserPurge.DONE, 5, 0)
+        assert data['finished_at'] is not None
+
+    def test_files_split_into_batches(self, admin_client, victim, settings):
+        settings.USER_PURGE_BATCH_SIZE = 2
+        purge_id = delete_user(admin_client, victim).data['purge']['id']
+
+        jobs.run_pending(limit=1)
+        assert Job.objects.filter(name='users.purge_batch', status=Job.QUEUED).count() == 3
+
+        jobs.run_pending(limit=1)
+        data = purge_status(admin_client, purge_id)
+        assert (data['status'], data['removed_files'], data['remaining_files']) == (UserPurge.RUNNING, 2, 3)
+        assert User.objects.filter(pk=victim.pk).exists()
+
+        jobs.run_pending()
+        assert purge_status(admin_client, purge_id)['status'] == UserPurge.DONE
+
+    def test_repeated_delete_resumes_same_purge(self, admin_client, victim, settings):
+        settings.USER_PURGE_BATCH_SIZE = 2
+        purge_id = delete_user(admin_client, victim).data['purge']['id']
+        jobs.run_pending(limit=1)
+
+        # Пачка исчерпала попытки — удаление встало
+        failed = Job.objects.filter(name='users.purge_batch').first()
+        Job.objects.filter(pk=failed.pk).update(status=Job.FAILED)
+        jobs.run_pending()
+        assert purge_status(admin_client, purge_id)['failed_batches'] == 1
+        assert File.objects.filter(user=victim).count() == 2
+
+        response = delete_user(admin_client, victim)
+        assert response.status_code == status.HTTP_202_ACCEPTED
+        assert response.data['purge']['id'] == purge_id
+        jobs.run_pending()
+        assert not User.objects.filter(pk=victim.pk).exists()
+        assert UserPurge.objects.get(pk=purge_id).removed_files == 5
+
+    def test_pending_user_is_locked_out(self, admin_client, api_client, victim):
+        token = StorageRefreshToken.for_user(victim).access_token
+        delete_user(admin_client, victim)
+        api_client.credentials(HTTP_AUTHORIZATION=f'Bearer {token}')
+        assert api_client.get(reverse('file-list')).status_code == status.HTTP_401_UNAUTHORIZED
+
+    def test_public_links_of_pending_user_disabled(self, admin_client, api_client, victim):
+        file_obj = File.objects.filter(user=victim).first()
+        url = reverse('file-public-download', kwargs={'public_link': file_obj.public_link})
+        delete_user(admin_client, victim)
+        assert api_client.get(url).status_code == status.HTTP_404_NOT_FOUND
+
+    def test_status_requires_admin(self, auth_client, victim):
+        purge = UserPurge.objects.create(user=victim, deleted_user_id=victim.pk, username=victim.username)
+        response = auth_client.get(reverse('admin-user-purge', kwargs={'purge_id': purge.pk}))
+        assert response.status_code == status.HTTP_403_FORBIDDEN
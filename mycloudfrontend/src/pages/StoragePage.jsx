@@ -2,20 +2,21 @@ import React, { useEffect } from 'react';
 import { useDispatch, useSelector } from 'react-redux';
 import {
   fetchFiles,
+  fetchMoreFiles,
   deleteFile,
   updateFileComment,
   renameFile
 } from '../store/filesSlice';
 import FileUploadForm from '../components/FileUploadForm';
 import FileItem from '../components/FileItem';
-import { Spin, Alert, Empty, message } from 'antd';
+import { Spin, Alert, Empty, Button, message } from 'antd';
 import { useIsMobile } from '../hooks/useIsMobile';
 import { downloadFileApi, copyFileLinkApi } from '../utils/api';
 
 
 export default function StoragePage() {
   const dispatch = useDispatch();
-  const { files, loading, error, loadingIds } = useSelector(state => state.files);
+  const { files, next, loading, loadingMore, error, loadingIds } = useSelector(state => state.files);
   const isMobile = useIsMobile();
 
 
@@ -179,6 +180,15 @@ const handleCopyLink = async file => {
           </table>
         )
       )}
+
+
+      {!loading && next && (
+        <div style={{ textAlign: 'center', marginTop: 16 }}>
+          <Button onClick={() => dispatch(fetchMoreFiles())} loading={loadingMore}>
+            Показать ещё
+          </Button>
+        </div>
+      )}
     </div>
   );
 }
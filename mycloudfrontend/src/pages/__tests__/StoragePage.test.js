@@ -18,6 +18,7 @@ jest.mock('react-redux', () => ({
 // Мокаем filesSlice
 jest.mock('../../store/filesSlice', () => ({
   fetchFiles: jest.fn(() => ({ type: 'files/fetchFiles', payload: {} })),
+  fetchMoreFiles: jest.fn(() => ({ type: 'files/fetchMoreFiles', payload: {} })),
   deleteFile: jest.fn(() => ({ type: 'files/deleteFile', payload: {} })),
   updateFileComment: jest.fn(() => ({ type: 'files/updateFileComment', payload: {} })),
   renameFile: jest.fn(() => ({ type: 'files/renameFile', payload: {} }))
@@ -79,6 +80,9 @@ jest.mock('antd', () => ({
     <div data-testid="empty" style={style} {...props}>
       <div data-testid="empty-description">{description}</div>
     </div>
+  ),
+  Button: ({ children, onClick, loading }) => (
+    <button onClick={onClick} data-loading={Boolean(loading)}>{children}</button>
   )
 }));
 
@@ -90,7 +94,7 @@ jest.mock('react-router-dom', () => ({
 
 // Импортируем компонент ПОСЛЕ всех моков
 import StoragePage from '../StoragePage';
-import { fetchFiles, deleteFile, updateFileComment, renameFile } from '../../store/filesSlice';
+import { fetchFiles, fetchMoreFiles, deleteFile, updateFileComment, renameFile } from '../../store/filesSlice';
 import { useIsMobile } from '../../hooks/useIsMobile';
 
 describe('StoragePage', () => {
@@ -192,6 +196,24 @@ describe('StoragePage', () => {
     expect(fetchFiles).toHaveBeenCalled();
   });
 
+  it('loads the next page on demand', () => {
+    const testFiles = [
+      { id: 1, original_name: 'test.txt', uploaded_at: '2023-01-01T00:00:00Z', comment: 'Test file' }
+    ];
+
+    renderComponent({ files: testFiles, next: 'http://localhost/api/files/?cursor=abc' });
+
+    expect(fetchMoreFiles).not.toHaveBeenCalled();
+    fireEvent.click(screen.getByText('Показать ещё'));
+    expect(fetchMoreFiles).toHaveBeenCalled();
+  });
+
+  it('hides load more on the last page', () => {
+    renderComponent({ files: [{ id: 1, original_name: 'test.txt' }], next: null });
+
+    expect(screen.queryByText('Показать ещё')).not.toBeInTheDocument();
+  });
+
   it('handles file deletion', () => {
     const testFiles = [
       { id: 1, original_name: 'test.txt', uploaded_at: '2023-01-01T00:00:00Z', comment: 'Test file' }
@@ -1,5 +1,5 @@
 import { configureStore } from '@reduxjs/toolkit';
-import filesReducer, { fetchFiles, deleteFile, renameFile } from '../filesSlice';
+import filesReducer, { fetchFiles, fetchMoreFiles, deleteFile, renameFile } from '../filesSlice';
 import * as api from '../../utils/api';
 
 jest.mock('../../utils/api');
@@ -18,6 +18,32 @@ describe('filesSlice thunks', () => {
     expect(store.getState().files.files).toEqual([{ id: 1 }]);
   });
 
+  it('fetchFiles loads only the first page', async () => {
+    api.authorizedFetch.mockResolvedValue({ files: [{ id: 1 }], next: 'http://localhost/api/files/?cursor=abc' });
+    await store.dispatch(fetchFiles());
+    expect(api.authorizedFetch).toHaveBeenCalledTimes(1);
+    expect(store.getState().files.next).toBe('http://localhost/api/files/?cursor=abc');
+  });
+
+  it('fetchMoreFiles appends the next page', async () => {
+    store = configureStore({
+      reducer: { files: filesReducer },
+      preloadedState: {
+        files: { files: [{ id: 1 }], next: 'http://localhost/api/files/?cursor=abc', loadingIds: [], error: null }
+      }
+    });
+    api.authorizedFetch.mockResolvedValue({ files: [{ id: 1 }, { id: 2 }], next: null });
+    await store.dispatch(fetchMoreFiles());
+    expect(api.authorizedFetch).toHaveBeenCalledWith('/files/?cursor=abc');
+    expect(store.getState().files.files).toEqual([{ id: 1 }, { id: 2 }]);
+    expect(store.getState().files.next).toBeNull();
+  });
+
+  it('fetchMoreFiles does nothing on the last page', async () => {
+    await store.dispatch(fetchMoreFiles());
+    expect(api.authorizedFetch).not.toHaveBeenCalled();
+  });
+
   it('fetchFiles.rejected sets error', async () => {
     api.authorizedFetch.mockRejectedValue(new Error('fail'));
     await store.dispatch(fetchFiles());
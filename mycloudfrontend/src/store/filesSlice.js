@@ -1,18 +1,45 @@
 import { createSlice, createAsyncThunk } from '@reduxjs/toolkit';
 import { authorizedFetch, renameFileApi } from '../utils/api';
 
+// Файлов на странице списка: остальные подгружаются по кнопке «Показать ещё»
+export const FILES_PAGE_SIZE = 50;
+
+// Ответ списка: { files, next } при пагинации по курсору или массив (старый API)
+const pageOf = data => (
+  Array.isArray(data) ? { files: data, next: null } : { files: data.files || [], next: data.next || null }
+);
+
 export const fetchFiles = createAsyncThunk(
   'files/fetchFiles',
   async (_, { rejectWithValue }) => {
     try {
-      const data = await authorizedFetch('/files/');
-      return data.files || data;
+      // Только первая страница — следующие загружает fetchMoreFiles по ссылке next
+      return pageOf(await authorizedFetch(`/files/?page_size=${FILES_PAGE_SIZE}`));
     } catch (error) {
       return rejectWithValue(error.message);
     }
   }
 );
 
+export const fetchMoreFiles = createAsyncThunk(
+  'files/fetchMoreFiles',
+  async (_, { getState, rejectWithValue }) => {
+    try {
+      const { next } = getState().files;
+      return pageOf(await authorizedFetch(`/files/${new URL(next).search}`));
+    } catch (error) {
+      return rejectWithValue(error.message);
+    }
+  },
+  {
+    // Нечего догружать или страница уже загружается
+    condition: (_, { getState }) => {
+      const { next, loadingMore } = getState().files;
+      return Boolean(next) && !loadingMore;
+    },
+  }
+);
+
 export const deleteFile = createAsyncThunk(
   'files/deleteFile',
   async (fileId, { rejectWithValue }) => {
@@ -75,7 +102,9 @@ const filesSlice = createSlice({
   name: 'files',
   initialState: {
     files: [],
+    next: null,  // ссылка на следующую страницу списка
     loading: false,
+    loadingMore: false,
     error: null,
     loadingIds: [],  // для гранулированных загрузок
   },
@@ -88,7 +117,8 @@ const filesSlice = createSlice({
         state.error = null;
       })
       .addCase(fetchFiles.fulfilled, (state, action) => {
-        state.files = action.payload;
+        state.files = action.payload.files;
+        state.next = action.payload.next;
         state.loading = false;
       })
       .addCase(fetchFiles.rejected, (state, action) => {
@@ -96,6 +126,23 @@ const filesSlice = createSlice({
         state.loading = false;
       })
 
+      // fetchMoreFiles
+      .addCase(fetchMoreFiles.pending, state => {
+        state.loadingMore = true;
+        state.error = null;
+      })
+      .addCase(fetchMoreFiles.fulfilled, (state, action) => {
+        // Файл, загруженный после первой страницы, может прийти повторно
+        const known = new Set(state.files.map(f => f.id));
+        state.files.push(...action.payload.files.filter(f => !known.has(f.id)));
+        state.next = action.payload.next;
+        state.loadingMore = false;
+      })
+      .addCase(fetchMoreFiles.rejected, (state, action) => {
+        state.error = action.payload;
+        state.loadingMore = false;
+      })
+
       // deleteFile
       .addCase(deleteFile.pending, (state, action) => {
         state.loadingIds.push(action.meta.arg);